@@ -1,53 +1,71 @@
 """
 E-commerce Backend API with User Verification System
 Handles orders, authentication, and verification for both guests and signed-in users.
+
+The application is built by ``create_app``; integrations (Redis, SMTP,
+Africa's Talking, notification workers) connect lazily on first use so
+importing this module and creating an app stay cheap.
 """
 
 import os
+import base64
+import functools
+import hashlib
 import random
 import json
 import logging
-import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 
 # Flask imports
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 from flask_cors import CORS
 from flask_migrate import Migrate
 import sqlalchemy
-from sqlalchemy import text, inspect
-
-# Redis import with error handling
-try:
-    import redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    print("Redis not installed. Run: pip install redis")
-    REDIS_AVAILABLE = False
-
-# Africa's Talking import with error handling
-AFRICASTALKING_AVAILABLE = False
-AFRICASTALKING_SMS = None
-try:
-    import africastalking
-    AFRICASTALKING_AVAILABLE = True
-    print("✅ Africa's Talking imported successfully")
-except ImportError as e:
-    print(f"❌ Africa's Talking import failed: {e}")
-    print("📱 SMS will use console fallback")
-
-# Initialize Flask app
-app = Flask(__name__)
-
-# Configure CORS
-CORS(app, 
-     origins=["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:5174"],
-     supports_credentials=True,
-     allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+from sqlalchemy import text, inspect, and_, or_, select
+from sqlalchemy.orm import selectinload
+
+from catalog_cache import CatalogCache, SharedCatalogVersion, track_table_writes
+from db_engine import configure_engine, engine_options, pool_stats
+import instrumentation
+from instrumentation import instrument_engine, timed_external
+from json_provider import FastJSONProvider
+import query_audit
+from models import db, User, Order, OrderItem, Product, ORDER_ITEM_SCHEMA, ORDER_SCHEMA
+from notifications import FailoverJobBackend, MemoryJobBackend, NotificationQueue
+from redis_client import REDIS_AVAILABLE, ManagedRedis
+from serializers import Field, Schema
+from sms_batcher import SMSBatcher
+from smtp_pool import SMTPConnectionPool
+from ttl_cache import TTLCache
+from verification_store import (
+    EXPIRED,
+    LOCKED,
+    VERIFIED,
+    FailoverVerificationStore,
+    MemoryVerificationStore,
+)
+from order_idempotency import (
+    COMPLETE,
+    FailoverIdempotencyStore,
+    MemoryIdempotencyStore,
+    complete_record,
+    request_fingerprint,
+)
+from order_intake import (
+    FailoverIntakeStatus,
+    MemoryIntakeStatus,
+    OrderIntake,
+    OrderJournal,
+)
+from order_rate_limits import MemoryOrderCounter, OrderRateCounter
+from order_writer import is_duplicate_order_number, parse_order_number, write_order
+from stock_reservation import InsufficientStockError, reserve_stock
+from stock_events import StockBroadcaster, StockEvents
+from stock_snapshot import MemoryStockLevels, StockSnapshot, track_stock_writes
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -56,9 +74,10 @@ logger = logging.getLogger(__name__)
 # Configuration
 JWT_SECRET = os.getenv('JWT_SECRET_KEY', 'fallback-secret-key')
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///app.db')
-REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
-REDIS_PORT_STR = os.getenv('REDIS_PORT', '6379')
-REDIS_DB_STR = os.getenv('REDIS_DB', '0')
+AUTO_CREATE_SCHEMA = os.getenv('AUTO_CREATE_SCHEMA', 'false').lower() == 'true'
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+# Bearer token Prometheus must present to scrape /metrics; unset disables it
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
 
 # Email configuration
 SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
@@ -66,192 +85,131 @@ SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
 SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
 FROM_EMAIL = os.getenv('FROM_EMAIL', '')
+SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '4'))
+
+# In-memory store configuration
+MEMORY_STORE_MAX_ENTRIES = int(os.getenv('MEMORY_STORE_MAX_ENTRIES', '50000'))
+IDEMPOTENCY_STORE_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_STORE_MAX_ENTRIES', '20000'))
 
 # SMS configuration
 AT_API_KEY = os.getenv('AT_API_KEY', '')
 AT_USERNAME = os.getenv('AT_USERNAME', 'sandbox')
 AT_SENDER_ID = os.getenv('AT_SENDER_ID', '')
 SMS_ENABLED = os.getenv('SMS_ENABLED', 'false').lower() == 'true'
+SMS_BATCH_SIZE = int(os.getenv('SMS_BATCH_SIZE', '100'))
+
+# Notification queue configuration
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '2'))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', '4'))
+
+# Stock snapshot configuration
+STOCK_SNAPSHOT_TTL = int(os.getenv('STOCK_SNAPSHOT_TTL', '300'))
+STOCK_SNAPSHOT_MEMORY_MAX_AGE = float(os.getenv('STOCK_SNAPSHOT_MEMORY_MAX_AGE', '5'))
+STOCK_LONG_POLL_MAX = float(os.getenv('STOCK_LONG_POLL_MAX', '25'))
+# Each open stream holds a server thread; by default at most half of a
+# gunicorn worker's threads may stream
+STOCK_STREAM_MAX_CLIENTS = int(os.getenv(
+    'STOCK_STREAM_MAX_CLIENTS', str(max(1, int(os.getenv('GUNICORN_THREADS', '4')) // 2))))
+STOCK_STREAM_MAX_SECONDS = float(os.getenv('STOCK_STREAM_MAX_SECONDS', '300'))
+STOCK_STREAM_HEARTBEAT = float(os.getenv('STOCK_STREAM_HEARTBEAT', '15'))
+STOCK_STREAM_RESYNC = float(os.getenv('STOCK_STREAM_RESYNC', '30'))
+
+# Order idempotency: how long responses are replayed, and how long an
+# unfinished submission blocks its retries
+ORDER_IDEMPOTENCY_TTL = int(os.getenv('ORDER_IDEMPOTENCY_TTL', '86400'))
+ORDER_IDEMPOTENCY_LOCK_TTL = int(os.getenv('ORDER_IDEMPOTENCY_LOCK_TTL', '30'))
+
+# Order intake: 'direct' writes each order in its request; 'queued' holds
+# stock, journals the order and writes it in batches (see order_intake)
+ORDER_INTAKE_MODE = os.getenv('ORDER_INTAKE_MODE', 'direct').lower()
+ORDER_JOURNAL_DIR = os.getenv('ORDER_JOURNAL_DIR', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'instance', 'order-journal'))
+ORDER_JOURNAL_FSYNC = os.getenv('ORDER_JOURNAL_FSYNC', 'true').lower() == 'true'
+ORDER_BATCH_SIZE = int(os.getenv('ORDER_BATCH_SIZE', '50'))
+ORDER_BATCH_WINDOW_MS = int(os.getenv('ORDER_BATCH_WINDOW_MS', '50'))
+ORDER_HOLD_TTL = int(os.getenv('ORDER_HOLD_TTL', '3600'))
+
+DEFAULT_CONFIG = {
+    'JWT_SECRET_KEY': JWT_SECRET,
+    'SQLALCHEMY_DATABASE_URI': DATABASE_URL,
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    # Check for (and create) missing tables when the app is created
+    'AUTO_CREATE_SCHEMA': AUTO_CREATE_SCHEMA,
+    # Server-Timing headers and the Prometheus /metrics endpoint
+    'INSTRUMENTATION_ENABLED': INSTRUMENTATION_ENABLED,
+    'METRICS_TOKEN': METRICS_TOKEN,
+    # Log N+1 patterns and slow SQL per request (QUERY_AUDIT_* settings)
+    'QUERY_AUDIT': query_audit.QUERY_AUDIT
+}
+
+CORS_ORIGINS = ["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:5174"]
+
+# Initialize extensions (bound to an app in create_app)
+jwt = JWTManager()
+migrate = Migrate()
+
+api = Blueprint('api', __name__)
+
+# Redis connects lazily on first use; while it is unreachable the circuit
+# breaker routes callers to the in-memory fallback (see REDIS_* settings)
+REDIS = ManagedRedis.from_env()
+REDIS.observer = instrumentation.record_redis
+if not REDIS_AVAILABLE:
+    logger.warning("⚠️ Redis not available - using in-memory fallback")
 
-app.config['JWT_SECRET_KEY'] = JWT_SECRET
-app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# In-memory fallback for development: bounded, with background expiry
+MEMORY_STORE = TTLCache(max_entries=MEMORY_STORE_MAX_ENTRIES)
 
-# Initialize extensions
-db = SQLAlchemy(app)
-jwt = JWTManager(app)
-migrate = Migrate(app, db)
+# Order idempotency claims get their own cache, so churn from verification
+# codes and rate-limit counters cannot evict a claim still being processed
+IDEMPOTENCY_STORE = TTLCache(max_entries=IDEMPOTENCY_STORE_MAX_ENTRIES)
 
-# Initialize Redis (with fallback for development)
-REDIS_CLIENT = None
-if REDIS_AVAILABLE:
-    try:
-        REDIS_CLIENT = redis.Redis(
-            host=REDIS_HOST,
-            port=int(REDIS_PORT_STR),
-            db=int(REDIS_DB_STR),
-            decode_responses=True
-        )
-        REDIS_CLIENT.ping()
-        logger.info("✅ Redis connection successful")
-    except (redis.ConnectionError, ValueError) as e:
-        logger.error("❌ Redis connection failed: %s", e)
-        REDIS_CLIENT = None
-else:
-    logger.warning("⚠️ Redis not available - using in-memory fallback")
+# Verification sessions: codes live 10 minutes, verified guests 1 hour
+CODE_TTL = 600
+GUEST_VERIFIED_TTL = 3600
+MAX_VERIFY_ATTEMPTS = 5
 
-# Initialize Africa's Talking if available
-if AFRICASTALKING_AVAILABLE and AT_API_KEY and AT_USERNAME and SMS_ENABLED:
-    try:
-        africastalking.initialize(AT_USERNAME, AT_API_KEY)
-        AFRICASTALKING_SMS = africastalking.SMS
-        logger.info("✅ Africa's Talking initialized successfully")
-    except Exception as e:  # pylint: disable=broad-except
-        logger.error("❌ Africa's Talking initialization failed: %s", e)
-        AFRICASTALKING_SMS = None
-else:
-    if not AFRICASTALKING_AVAILABLE:
-        logger.info("ℹ️ Africa's Talking package not available")
-    elif not SMS_ENABLED:
-        logger.info("ℹ️ SMS verification disabled via configuration")
-    else:
-        logger.warning("⚠️ Africa's Talking not fully configured")
-    AFRICASTALKING_SMS = None
-
-# In-memory fallback for development
-MEMORY_STORE = {}
-
-
-class User(db.Model):
-    """User model for authenticated users."""
-
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    phone = db.Column(db.String(20))
-    is_verified = db.Column(db.Boolean, default=False)
-    verified_at = db.Column(db.DateTime)
-    two_factor_secret = db.Column(db.String(32))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    # Relationship with orders
-    orders = db.relationship('Order', backref='user', lazy=True)
-
-    def to_dict(self):
-        """Convert user object to dictionary."""
-        return {
-            'id': self.id,
-            'email': self.email,
-            'phone': self.phone,
-            'is_verified': self.is_verified,
-            'verified_at': self.verified_at.isoformat() if self.verified_at else None
-        }
+VERIFICATION_STORE = FailoverVerificationStore(REDIS, MemoryVerificationStore(MEMORY_STORE))
 
 
-class Order(db.Model):
-    """Order model for both guest and user orders."""
-
-    id = db.Column(db.Integer, primary_key=True)
-    order_number = db.Column(db.String(50), unique=True, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
-    customer_email = db.Column(db.String(120), nullable=False)
-    customer_phone = db.Column(db.String(20), nullable=False)
-    customer_name = db.Column(db.String(100), nullable=False)
-    total_amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(50), default='pending')
-    is_guest_order = db.Column(db.Boolean, default=False)
-    user_verified = db.Column(db.Boolean, default=False)
-    verification_method = db.Column(db.String(50), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    # Order items relationship
-    items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
-
-    def to_dict(self):
-        """Convert order object to dictionary."""
-        return {
-            'id': self.id,
-            'order_number': self.order_number,
-            'customer_email': self.customer_email,
-            'customer_name': self.customer_name,
-            'total_amount': self.total_amount,
-            'status': self.status,
-            'is_guest_order': self.is_guest_order,
-            'user_verified': self.user_verified,
-            'created_at': self.created_at.isoformat()
-        }
+# Serialized product list, invalidated whenever a product write commits
+# (in any worker process while Redis is reachable)
+CATALOG_CACHE = CatalogCache(SharedCatalogVersion(REDIS))
+track_table_writes(CATALOG_CACHE, Product.__table__)
 
 
-class OrderItem(db.Model):
-    """Order items model."""
-
-    id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    product_id = db.Column(db.Integer, nullable=False)
-    product_name = db.Column(db.String(200), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    size = db.Column(db.String(50), nullable=True)
-    color = db.Column(db.String(50), nullable=True)
-
-    def to_dict(self):
-        """Convert order item object to dictionary."""
-        return {
-            'id': self.id,
-            'product_id': self.product_id,
-            'product_name': self.product_name,
-            'quantity': self.quantity,
-            'price': self.price,
-            'size': self.size,
-            'color': self.color
-        }
+def load_stock_levels():
+    """Load {product id: stock quantity} for the whole catalog."""
+    rows = db.session.execute(select(Product.id, Product.stock_quantity)).all()
+    return {row.id: row.stock_quantity or 0 for row in rows}
 
 
-class Product(db.Model):
-    """Product model for stock management."""
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    stock_quantity = db.Column(db.Integer, default=0)
-    description = db.Column(db.Text)
-    category = db.Column(db.String(100))
-    material = db.Column(db.String(100))
-    color = db.Column(db.String(50))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        """Convert product object to dictionary."""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'price': self.price,
-            'stock_quantity': self.stock_quantity,
-            'description': self.description,
-            'category': self.category,
-            'material': self.material,
-            'color': self.color,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+# Stock change events for the stock stream, fanned out through Redis pub/sub
+STOCK_EVENTS = StockEvents(REDIS, StockBroadcaster())
 
+# Stock levels for stock checks, kept current by committed orders
+STOCK_SNAPSHOT = StockSnapshot(REDIS, MemoryStockLevels(STOCK_SNAPSHOT_MEMORY_MAX_AGE),
+                               load_stock_levels, ttl=STOCK_SNAPSHOT_TTL,
+                               on_change=STOCK_EVENTS.on_change, hold_ttl=ORDER_HOLD_TTL)
+track_stock_writes(STOCK_SNAPSHOT, Product.__table__)
 
-def send_verification_email(email, code):
-    """
-    Send verification email using SMTP.
 
-    Args:
-        email (str): Recipient email address
-        code (str): Verification code to send
+# Persistent, authenticated SMTP sessions shared by all email sends
+SMTP_POOL = SMTPConnectionPool(
+    SMTP_SERVER,
+    SMTP_PORT,
+    username=SMTP_USERNAME,
+    password=SMTP_PASSWORD,
+    use_tls=SMTP_USE_TLS,
+    max_connections=SMTP_POOL_SIZE
+)
 
-    Returns:
-        bool: True if email sent successfully, False otherwise
-    """
-    if not SMTP_USERNAME or not SMTP_PASSWORD:
-        logger.warning("SMTP not configured - printing code to console: %s", code)
-        return True
 
-    try:
-        subject = "Your Verification Code"
-        body = f"""
+def build_verification_email(email, code):
+    """Build the verification email message for ``email``."""
+    subject = "Your Verification Code"
+    body = f"""
         Hello,
 
         Your verification code is: {code}
@@ -264,15 +222,31 @@ def send_verification_email(email, code):
         Your Store Team
         """
 
-        msg = MIMEText(body)
-        msg['Subject'] = subject
-        msg['From'] = FROM_EMAIL
-        msg['To'] = email
+    msg = MIMEText(body)
+    msg['Subject'] = subject
+    msg['From'] = FROM_EMAIL
+    msg['To'] = email
+    return msg
+
+
+def send_verification_email(email, code):
+    """
+    Send verification email over a pooled SMTP connection.
 
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
+    Args:
+        email (str): Recipient email address
+        code (str): Verification code to send
+
+    Returns:
+        bool: True if email sent successfully, False otherwise
+    """
+    if not SMTP_USERNAME or not SMTP_PASSWORD:
+        logger.warning("SMTP not configured - printing code to console: %s", code)
+        return True
+
+    try:
+        with timed_external('smtp'):
+            SMTP_POOL.send_message(build_verification_email(email, code))
 
         logger.info("Verification email sent to %s", email)
         return True
@@ -282,6 +256,63 @@ def send_verification_email(email, code):
         return False
 
 
+# SMS dispatch; recipients of the same message share multi-recipient API calls.
+# Africa's Talking is imported and initialized on the first SMS send.
+SMS_BATCHER = None
+_SMS_INIT_LOCK = threading.Lock()
+_SMS_INITIALIZED = False
+
+
+def get_sms_batcher():
+    """
+    Return the SMS batcher, initializing Africa's Talking on first use.
+
+    Returns:
+        SMSBatcher: Batcher bound to the Africa's Talking SMS service, or
+        None if SMS is disabled or unavailable
+    """
+    global SMS_BATCHER, _SMS_INITIALIZED  # pylint: disable=global-statement
+
+    if _SMS_INITIALIZED:
+        return SMS_BATCHER
+
+    with _SMS_INIT_LOCK:
+        if _SMS_INITIALIZED:
+            return SMS_BATCHER
+        _SMS_INITIALIZED = True
+
+        if not (AT_API_KEY and AT_USERNAME and SMS_ENABLED):
+            if not SMS_ENABLED:
+                logger.info("ℹ️ SMS verification disabled via configuration")
+            else:
+                logger.warning("⚠️ Africa's Talking not fully configured")
+            return None
+
+        try:
+            import africastalking  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            logger.info("ℹ️ Africa's Talking package not available: %s", e)
+            return None
+
+        try:
+            africastalking.initialize(AT_USERNAME, AT_API_KEY)
+            SMS_BATCHER = SMSBatcher(
+                africastalking.SMS,
+                sender_id=AT_SENDER_ID,
+                max_recipients=SMS_BATCH_SIZE
+            )
+            logger.info("✅ Africa's Talking initialized successfully")
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("❌ Africa's Talking initialization failed: %s", e)
+            SMS_BATCHER = None
+        return SMS_BATCHER
+
+
+def verification_sms_text(code):
+    """Return the verification SMS body for ``code``."""
+    return f"Your verification code is: {code}. This code expires in 10 minutes."
+
+
 def send_verification_sms(phone, code):
     """
     Send verification SMS using Africa's Talking.
@@ -296,44 +327,36 @@ def send_verification_sms(phone, code):
     # Always log to console for backup
     logger.info("Verification code for phone %s: %s", phone, code)
 
-    if not AFRICASTALKING_SMS or not SMS_ENABLED:
+    batcher = get_sms_batcher()
+    if not batcher:
         logger.warning("SMS service not available - using console fallback")
         return True
 
     try:
-        # Format phone number for Kenya if needed
-        if phone.startswith('0'):
-            phone = '+254' + phone[1:]
-        elif not phone.startswith('+'):
-            phone = '+254' + phone
-
-        message = f"Your verification code is: {code}. This code expires in 10 minutes."
-
-        response = AFRICASTALKING_SMS.send(message, [phone], AT_SENDER_ID)
-        
-        # More robust response handling
-        if (response and 
-            response.get('SMSMessageData') and 
-            response['SMSMessageData'].get('Recipients') and 
-            len(response['SMSMessageData']['Recipients']) > 0):
-            
-            recipient_status = response['SMSMessageData']['Recipients'][0].get('status', 'Unknown')
-            if recipient_status == 'Success':
-                logger.info("SMS sent successfully to %s", phone)
-                return True
-            else:
-                logger.error("Failed to send SMS to %s: Status %s", phone, recipient_status)
-                return False
-        else:
-            logger.error("Unexpected response format from Africa's Talking: %s", response)
-            return False
+        with timed_external('sms'):
+            recipient_status = batcher.send_one(verification_sms_text(code), phone)
+        if recipient_status == 'Success':
+            logger.info("SMS sent successfully to %s", phone)
+            return True
+
+        logger.error("Failed to send SMS to %s: Status %s", phone, recipient_status)
+        return False
 
     except Exception as e:  # pylint: disable=broad-except
         logger.error("Failed to send SMS to %s: %s", phone, e)
         return False
 
 
-def init_database():
+# Verification codes are delivered in the background so handlers return immediately
+NOTIFICATIONS = NotificationQueue(
+    senders={'email': send_verification_email, 'sms': send_verification_sms},
+    backend=FailoverJobBackend(REDIS, MemoryJobBackend(MEMORY_STORE)),
+    workers=NOTIFY_WORKERS,
+    max_attempts=NOTIFY_MAX_ATTEMPTS
+)
+
+
+def init_database(app):
     """Initialize database tables safely."""
     with app.app_context():
         try:
@@ -353,44 +376,309 @@ def init_database():
             raise
 
 
-# Initialize database
-init_database()
+def create_app(config=None):
+    """
+    Build the Flask application.
+
+    Args:
+        config (dict): Settings overriding DEFAULT_CONFIG, e.g.
+            SQLALCHEMY_DATABASE_URI or AUTO_CREATE_SCHEMA
+
+    Returns:
+        Flask: Configured application
+    """
+    app = Flask(__name__)
+    # orjson-backed jsonify/get_json with ISO 8601 datetimes (see json_provider)
+    app.json = FastJSONProvider(app)
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
+    # Pooling and connection tuning for the configured backend (see db_engine)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    # Configure CORS
+    CORS(app,
+         origins=CORS_ORIGINS,
+         supports_credentials=True,
+         allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+         expose_headers=["ETag", "X-Stock-Version"],
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(engine)
+            if app.config['INSTRUMENTATION_ENABLED']:
+                instrument_engine(engine)
+    jwt.init_app(app)
+    migrate.init_app(app, db)
+
+    app.register_blueprint(api)
+
+    if app.config['INSTRUMENTATION_ENABLED']:
+        instrumentation.init_app(app)
+    if app.config['QUERY_AUDIT']:
+        query_audit.init_app(app)
+
+    if app.config['AUTO_CREATE_SCHEMA']:
+        init_database(app)
+
+    return app
+
+
+_DEFAULT_APP = None
+_DEFAULT_APP_LOCK = threading.Lock()
+
+
+def reset_after_fork(app=None):
+    """
+    Drop connections inherited from a parent process.
+
+    Called in every pre-forked server worker (see gunicorn.conf.py) so
+    workers never share database or Redis sockets with the master.
+
+    Args:
+        app (Flask): Application whose engines to reset; defaults to the
+            module-level app if it has been created
+    """
+    app = app or _DEFAULT_APP
+    if app is not None:
+        with app.app_context():
+            for engine in db.engines.values():
+                # close=False leaves the parent's connections untouched
+                engine.dispose(close=False)
+    REDIS.reset()
+
+
+def __getattr__(name):
+    """Build the module-level ``app`` on first access (``from app import app``)."""
+    global _DEFAULT_APP  # pylint: disable=global-statement
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _DEFAULT_APP_LOCK:
+        if _DEFAULT_APP is None:
+            _DEFAULT_APP = create_app()
+    return _DEFAULT_APP
+
+
+# Public product fields; aliases such as stock/stock_quantity read the same column
+CATALOG_SCHEMA = Schema(Product.__table__, [
+    'id',
+    'name',
+    Field('price', convert=float),
+    'stock_quantity',
+    Field('description', convert=lambda value: value or ''),
+    Field('category', convert=lambda value: value or 'Uncategorized'),
+    Field('inStock', 'stock_quantity', convert=lambda value: value is not None and value > 0),
+    Field('stock', 'stock_quantity'),
+    Field('images', constant=('/images/placeholder.jpg',)),
+    Field('imageUrl', constant='/images/placeholder.jpg'),
+    Field('rating', constant=0),
+    Field('reviewCount', constant=0),
+    Field('material', convert=lambda value: value or 'Unknown'),
+    Field('color', convert=lambda value: value or 'Various')
+])
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Query parameters that switch GET /api/products to the paginated response;
+# anything else (cache busters and the like) keeps the full list
+PRODUCT_PAGE_PARAMS = frozenset((
+    'limit', 'cursor', 'fields', 'category', 'material', 'color',
+    'minPrice', 'maxPrice', 'inStock',
+))
+DEFAULT_ORDER_PAGE_SIZE = 20
+MAX_ORDER_PAGE_SIZE = 100
+
+
+def encode_cursor(row):
+    """Encode the keyset position of ``row`` as an opaque cursor."""
+    created_at = row.created_at.isoformat() if row.created_at else None
+    raw = json.dumps([created_at, row.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if created_at is not None:
+            created_at = datetime.fromisoformat(created_at)
+        return created_at, int(product_id)
+    except (TypeError, ValueError, UnicodeEncodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_product_fields(raw_fields):
+    """
+    Parse the ``fields`` query parameter.
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    if not raw_fields:
+        return CATALOG_SCHEMA.names
+
+    fields = [name.strip() for name in raw_fields.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in CATALOG_SCHEMA.fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def query_product_page(args):
+    """
+    Fetch one page of products using keyset pagination.
+
+    Only the columns needed by the requested fields are selected, so rows
+    come back as lightweight tuples rather than ORM instances.
 
+    Args:
+        args (MultiDict): Request query parameters
+
+    Returns:
+        dict: Page items and the cursor for the next page
 
-@app.route('/api/products', methods=['GET'])
+    Raises:
+        ValueError: If a query parameter is invalid
+    """
+    fields = parse_product_fields(args.get('fields'))
+    limit = min(max(int(args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+
+    # id and created_at are always selected for the next-page cursor
+    serializer = CATALOG_SCHEMA.compile(fields, extra_columns=('id', 'created_at'))
+    query = db.session.query(*serializer.columns)
+
+    for param in ('category', 'material', 'color'):
+        value = args.get(param)
+        if value:
+            query = query.filter(getattr(Product, param) == value)
+
+    if args.get('minPrice') is not None:
+        query = query.filter(Product.price >= float(args['minPrice']))
+    if args.get('maxPrice') is not None:
+        query = query.filter(Product.price <= float(args['maxPrice']))
+
+    in_stock = args.get('inStock')
+    if in_stock is not None:
+        if in_stock.lower() in ('true', '1'):
+            query = query.filter(Product.stock_quantity > 0)
+        elif in_stock.lower() in ('false', '0'):
+            query = query.filter(or_(Product.stock_quantity <= 0,
+                                     Product.stock_quantity.is_(None)))
+        else:
+            raise ValueError("inStock must be true or false")
+
+    cursor = args.get('cursor')
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        if cursor_created_at is None:
+            # Rows without a timestamp sort last
+            query = query.filter(Product.created_at.is_(None), Product.id < cursor_id)
+        else:
+            query = query.filter(or_(
+                Product.created_at < cursor_created_at,
+                and_(Product.created_at == cursor_created_at, Product.id < cursor_id),
+                Product.created_at.is_(None)
+            ))
+
+    rows = (query.order_by(Product.created_at.desc().nulls_last(), Product.id.desc())
+            .limit(limit + 1)
+            .all())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        'items': serializer.dump_many(rows),
+        'nextCursor': encode_cursor(rows[-1]) if has_more else None
+    }
+
+
+def build_catalog_body():
+    """Serialize the full product list to JSON bytes."""
+    serializer = CATALOG_SCHEMA.compile()
+    rows = db.session.execute(select(*serializer.columns).order_by(Product.id)).all()
+    products_data = serializer.dump_many(rows)
+
+    logger.info("Serialized %d products for catalog version %d",
+                len(products_data), CATALOG_CACHE.version)
+    return current_app.json.dumps_bytes(products_data)
+
+
+@api.route('/api/products', methods=['GET'])
 def get_products():
-    """Get all products."""
+    """
+    Get products.
+
+    Without any of the query parameters below the full catalog is served
+    from the in-process catalog cache; clients sending a matching
+    If-None-Match header receive 304 Not Modified. Unknown parameters are
+    ignored.
+
+    Query Parameters:
+        limit (int): Page size (default 50, max 200)
+        cursor (str): Cursor returned as nextCursor by the previous page
+        fields (str): Comma-separated list of fields to return
+        category (str): Filter by category
+        material (str): Filter by material
+        color (str): Filter by color
+        minPrice (float): Minimum price
+        maxPrice (float): Maximum price
+        inStock (bool): Only products in (or out of) stock
+
+    Returns:
+        JSON list of products, or a page object when any parameter above is given
+    """
     try:
-        products = Product.query.all()
-        products_data = []
-        
-        for product in products:
-            product_data = {
-                'id': product.id,
-                'name': product.name,
-                'price': float(product.price),
-                'stock_quantity': product.stock_quantity,
-                'description': product.description or '',
-                'category': product.category or 'Uncategorized',
-                'inStock': product.stock_quantity > 0,
-                'stock': product.stock_quantity,
-                'images': ['/images/placeholder.jpg'],
-                'imageUrl': '/images/placeholder.jpg',
-                'rating': 0,
-                'reviewCount': 0,
-                'material': product.material or 'Unknown',
-                'color': product.color or 'Various'
-            }
-            products_data.append(product_data)
-        
-        logger.info("Fetched %d products", len(products_data))
-        return jsonify(products_data)
+        if PRODUCT_PAGE_PARAMS.intersection(request.args):
+            return jsonify(query_product_page(request.args))
+
+        body, etag = CATALOG_CACHE.get(build_catalog_body)
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameters: {str(e)}"}), 400
     except Exception as e:
         logger.error("Error fetching products: %s", e)
         return jsonify({"error": "Failed to fetch products"}), 500
 
 
-@app.route('/api/auth/send-guest-verification', methods=['POST'])
+def generate_verification_code():
+    """Return a random 6-digit verification code."""
+    return ''.join([str(random.randint(0, 9)) for _ in range(6)])
+
+
+def verification_payload(result, success_message):
+    """Map a VerificationStore result to a (body, status code) pair."""
+    if result == VERIFIED:
+        return {"message": success_message}, 200
+    if result == LOCKED:
+        return {"error": "Too many attempts. Please request a new code."}, 400
+    if result == EXPIRED:
+        return {"error": "Verification session expired"}, 400
+    return {"error": "Invalid verification code"}, 400
+
+
+def verification_response(result, success_message):
+    """Map a VerificationStore result to the API response."""
+    body, status = verification_payload(result, success_message)
+    return jsonify(body), status
+
+
+@api.route('/api/auth/send-guest-verification', methods=['POST'])
 def send_guest_verification():
     """
     Send verification code to guest user's email or phone.
@@ -412,47 +700,28 @@ def send_guest_verification():
         return jsonify({"error": "Email or phone required"}), 400
 
     # Generate 6-digit code
-    verification_code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
+    verification_code = generate_verification_code()
 
     # Store with expiration (10 minutes)
-    storage_data = json.dumps({
-        "code": verification_code,
-        "attempts": 0,
-        "verified": False
-    })
-
-    if REDIS_CLIENT:
-        if method == 'email' and email:
-            REDIS_CLIENT.setex(f"guest_verify:email:{email}", 600, storage_data)
-        elif method == 'phone' and phone:
-            REDIS_CLIENT.setex(f"guest_verify:phone:{phone}", 600, storage_data)
-    else:
-        # Fallback to memory storage
-        if method == 'email' and email:
-            MEMORY_STORE[f"guest_verify:email:{email}"] = {
-                "data": storage_data,
-                "expires": datetime.now() + timedelta(minutes=10)
-            }
-        elif method == 'phone' and phone:
-            MEMORY_STORE[f"guest_verify:phone:{phone}"] = {
-                "data": storage_data,
-                "expires": datetime.now() + timedelta(minutes=10)
-            }
-
-    # Send verification code
-    success = True
     if method == 'email' and email:
-        success = send_verification_email(email, verification_code)
+        VERIFICATION_STORE.start(f"guest_verify:email:{email}", verification_code, CODE_TTL)
     elif method == 'phone' and phone:
-        success = send_verification_sms(phone, verification_code)
+        VERIFICATION_STORE.start(f"guest_verify:phone:{phone}", verification_code, CODE_TTL)
 
-    if not success:
-        return jsonify({"error": "Failed to send verification code. Please try again."}), 500
+    # Queue verification code for delivery
+    notification_id = None
+    if method == 'email' and email:
+        notification_id = NOTIFICATIONS.enqueue('email', email, verification_code)
+    elif method == 'phone' and phone:
+        notification_id = NOTIFICATIONS.enqueue('sms', phone, verification_code)
 
-    return jsonify({"message": f"Verification code sent via {method}"})
+    return jsonify({
+        "message": f"Verification code sent via {method}",
+        "notificationId": notification_id
+    })
 
 
-@app.route('/api/auth/verify-guest', methods=['POST'])
+@api.route('/api/auth/verify-guest', methods=['POST'])
 def verify_guest():
     """
     Verify guest user's verification code.
@@ -483,64 +752,14 @@ def verify_guest():
     else:
         return jsonify({"error": "Invalid verification method"}), 400
 
-    attempt_data = None
-
-    if REDIS_CLIENT:
-        attempt_data = REDIS_CLIENT.get(attempt_key)
-    else:
-        # Check memory storage
-        if attempt_key in MEMORY_STORE:
-            storage = MEMORY_STORE[attempt_key]
-            if datetime.now() < storage["expires"]:
-                attempt_data = storage["data"]
-            else:
-                del MEMORY_STORE[attempt_key]
-
-    if not attempt_data:
-        return jsonify({"error": "Verification session expired"}), 400
-
-    attempt_data = json.loads(attempt_data)
-
-    # Check attempt limits
-    if attempt_data["attempts"] >= 5:
-        if REDIS_CLIENT:
-            REDIS_CLIENT.delete(attempt_key)
-        else:
-            MEMORY_STORE.pop(attempt_key, None)
-        return jsonify({"error": "Too many attempts. Please request a new code."}), 400
-
-    # Verify code
-    if attempt_data["code"] == code:
-        # Mark as verified with shorter expiration (1 hour for order completion)
-        attempt_data["verified"] = True
-        verified_data = json.dumps(attempt_data)
-
-        if REDIS_CLIENT:
-            REDIS_CLIENT.setex(attempt_key, 3600, verified_data)
-        else:
-            MEMORY_STORE[attempt_key] = {
-                "data": verified_data,
-                "expires": datetime.now() + timedelta(hours=1)
-            }
-
-        return jsonify({"message": "Identity verified successfully"})
-    else:
-        # Increment attempts
-        attempt_data["attempts"] += 1
-        updated_data = json.dumps(attempt_data)
-
-        if REDIS_CLIENT:
-            REDIS_CLIENT.setex(attempt_key, 600, updated_data)
-        else:
-            MEMORY_STORE[attempt_key] = {
-                "data": updated_data,
-                "expires": datetime.now() + timedelta(minutes=10)
-            }
-
-        return jsonify({"error": "Invalid verification code"}), 400
+    # Check the code and count the attempt in one atomic step; a verified
+    # session is kept for 1 hour for order completion
+    result = VERIFICATION_STORE.verify(attempt_key, code, MAX_VERIFY_ATTEMPTS,
+                                       verified_ttl=GUEST_VERIFIED_TTL, retry_ttl=CODE_TTL)
+    return verification_response(result, "Identity verified successfully")
 
 
-@app.route('/api/auth/send-account-verification', methods=['POST'])
+@api.route('/api/auth/send-account-verification', methods=['POST'])
 @jwt_required()
 def send_account_verification():
     """
@@ -562,43 +781,41 @@ def send_account_verification():
         return jsonify({"error": "User not found"}), 404
 
     # Generate 6-digit code
-    verification_code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
+    verification_code = generate_verification_code()
 
     # Store with user context
-    storage_data = json.dumps({
-        "code": verification_code,
-        "attempts": 0,
-        "verified": False
-    })
-
-    if REDIS_CLIENT:
-        REDIS_CLIENT.setex(
-            f"account_verify:{user_id}:{method}",
-            600,  # 10 minutes
-            storage_data
-        )
-    else:
-        MEMORY_STORE[f"account_verify:{user_id}:{method}"] = {
-            "data": storage_data,
-            "expires": datetime.now() + timedelta(minutes=10)
-        }
+    VERIFICATION_STORE.start(f"account_verify:{user_id}:{method}", verification_code, CODE_TTL)
 
-    # Send via chosen method
-    success = True
+    # Queue via chosen method
     if method == 'email':
-        success = send_verification_email(user.email, verification_code)
+        notification_id = NOTIFICATIONS.enqueue('email', user.email, verification_code)
     elif method == 'phone' and user.phone:
-        success = send_verification_sms(user.phone, verification_code)
+        notification_id = NOTIFICATIONS.enqueue('sms', user.phone, verification_code)
     else:
         return jsonify({"error": "Phone number not available for this user"}), 400
 
-    if not success:
-        return jsonify({"error": "Failed to send verification code. Please try again."}), 500
+    return jsonify({
+        "message": f"Verification code sent via {method}",
+        "notificationId": notification_id
+    })
 
-    return jsonify({"message": f"Verification code sent via {method}"})
 
+@api.route('/api/notifications/<notification_id>', methods=['GET'])
+def notification_status(notification_id):
+    """
+    Get the delivery status of a queued verification code.
 
-@app.route('/api/auth/verify-account', methods=['POST'])
+    Returns:
+        JSON with status ('queued', 'sending', 'retrying', 'sent' or
+        'failed'), attempts and last error
+    """
+    status = NOTIFICATIONS.status(notification_id)
+    if not status:
+        return jsonify({"error": "Notification not found"}), 404
+    return jsonify(status)
+
+
+@api.route('/api/auth/verify-account', methods=['POST'])
 @jwt_required()
 def verify_account():
     """
@@ -621,63 +838,59 @@ def verify_account():
 
     # Check verification attempts
     attempt_key = f"account_verify:{user_id}:{method}"
-    attempt_data = None
 
-    if REDIS_CLIENT:
-        attempt_data = REDIS_CLIENT.get(attempt_key)
-    else:
-        if attempt_key in MEMORY_STORE:
-            storage = MEMORY_STORE[attempt_key]
-            if datetime.now() < storage["expires"]:
-                attempt_data = storage["data"]
-            else:
-                del MEMORY_STORE[attempt_key]
+    # The code stays usable until the user row is committed, so a failed
+    # commit can be retried with the same code
+    result = VERIFICATION_STORE.verify(attempt_key, code, MAX_VERIFY_ATTEMPTS,
+                                       verified_ttl=CODE_TTL, retry_ttl=CODE_TTL)
+    if result == VERIFIED:
+        try:
+            # Mark user as verified in database
+            user = User.query.get(user_id)
+            user.is_verified = True
+            user.verified_at = datetime.utcnow()
+            db.session.commit()
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Database error in verify_account: %s", e)
+            return jsonify({"error": f"Database error: {str(e)}"}), 500
+        VERIFICATION_STORE.delete(attempt_key)
 
-    if not attempt_data:
-        return jsonify({"error": "Verification session expired"}), 400
+    return verification_response(result, "Account verified successfully")
 
-    attempt_data = json.loads(attempt_data)
 
-    # Check attempt limits
-    if attempt_data["attempts"] >= 5:
-        if REDIS_CLIENT:
-            REDIS_CLIENT.delete(attempt_key)
-        else:
-            MEMORY_STORE.pop(attempt_key, None)
-        return jsonify({"error": "Too many attempts. Please request a new code."}), 400
+def load_recent_orders(field, value, since):
+    """
+    Load (order_id, timestamp) pairs for orders placed with ``field`` equal
+    to ``value`` since the ``since`` Unix timestamp.
+    """
+    column = Order.customer_email if field == 'email' else Order.customer_phone
+    since_dt = datetime.fromtimestamp(since, timezone.utc).replace(tzinfo=None)
+    rows = (db.session.query(Order.id, Order.created_at)
+            .filter(column == value, Order.created_at >= since_dt)
+            .all())
+    return [(row.id, row.created_at.replace(tzinfo=timezone.utc).timestamp()) for row in rows]
 
-    # Verify code
-    if attempt_data["code"] == code:
-        # Mark user as verified in database
-        user = User.query.get(user_id)
-        user.is_verified = True
-        user.verified_at = datetime.utcnow()
-        db.session.commit()
 
-        # Clear verification data
-        if REDIS_CLIENT:
-            REDIS_CLIENT.delete(attempt_key)
-        else:
-            MEMORY_STORE.pop(attempt_key, None)
+# Sliding-window order counts per guest email/phone, seeded from the database
+ORDER_COUNTER = OrderRateCounter(REDIS, MemoryOrderCounter(MEMORY_STORE), load_recent_orders)
 
-        return jsonify({"message": "Account verified successfully"})
-    else:
-        # Increment attempts
-        attempt_data["attempts"] += 1
-        updated_data = json.dumps(attempt_data)
+# Claims and stored responses of order submissions, keyed per customer
+ORDER_IDEMPOTENCY = FailoverIdempotencyStore(REDIS, MemoryIdempotencyStore(IDEMPOTENCY_STORE))
 
-        if REDIS_CLIENT:
-            REDIS_CLIENT.setex(attempt_key, 600, updated_data)
-        else:
-            MEMORY_STORE[attempt_key] = {
-                "data": updated_data,
-                "expires": datetime.now() + timedelta(minutes=10)
-            }
 
-        return jsonify({"error": "Invalid verification code"}), 400
+def guest_limits(email_orders, phone_orders):
+    """Build the guest limit response from 24-hour order counts."""
+    return {
+        "tooManyOrders": email_orders >= 3 or phone_orders >= 3,
+        "suspiciousActivity": email_orders >= 5 or phone_orders >= 5,
+        "field": "email" if email_orders >= 3 else "phone" if phone_orders >= 3 else None,
+        "emailOrderCount": email_orders,
+        "phoneOrderCount": phone_orders
+    }
 
 
-@app.route('/api/orders/check-guest-limits', methods=['POST'])
+@api.route('/api/orders/check-guest-limits', methods=['POST'])
 def check_guest_limits():
     """
     Check if guest user has exceeded order limits.
@@ -696,36 +909,41 @@ def check_guest_limits():
     if not email and not phone:
         return jsonify({"error": "Email or phone required"}), 400
 
-    # Query the database for recent orders
-    twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
+    # Count orders in the last 24 hours
+    email_orders = ORDER_COUNTER.count('email', email) if email else 0
+    phone_orders = ORDER_COUNTER.count('phone', phone) if phone else 0
 
-    email_orders = 0
-    phone_orders = 0
+    return jsonify(guest_limits(email_orders, phone_orders))
 
-    if email:
-        email_orders = Order.query.filter(
-            Order.customer_email == email,
-            Order.created_at >= twenty_four_hours_ago
-        ).count()
 
-    if phone:
-        phone_orders = Order.query.filter(
-            Order.customer_phone == phone,
-            Order.created_at >= twenty_four_hours_ago
-        ).count()
+def parse_product_ids(values):
+    """
+    Normalize requested product IDs to unique integers, keeping their order.
+
+    Raises:
+        ValueError: If an ID is not an integer
+    """
+    try:
+        return list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError) as e:
+        raise ValueError("Product IDs must be integers") from e
+
+
+def stock_etag(version, product_ids):
+    """ETag for the stock of ``product_ids`` at snapshot ``version``."""
+    digest = hashlib.sha1(','.join(map(str, sorted(product_ids))).encode('ascii'))
+    return f"{version}-{digest.hexdigest()[:12]}"
 
-    limits = {
-        "tooManyOrders": email_orders >= 3 or phone_orders >= 3,
-        "suspiciousActivity": email_orders >= 5 or phone_orders >= 5,
-        "field": "email" if email_orders >= 3 else "phone" if phone_orders >= 3 else None,
-        "emailOrderCount": email_orders,
-        "phoneOrderCount": phone_orders
-    }
 
-    return jsonify(limits)
+def stock_response(version, levels, product_ids):
+    """JSON object of stock per product ID, tagged with the snapshot version."""
+    response = jsonify({str(product_id): quantity for product_id, quantity in levels.items()})
+    response.set_etag(stock_etag(version, product_ids))
+    response.headers['X-Stock-Version'] = version
+    return response
 
 
-@app.route('/api/products/stock-check', methods=['POST'])
+@api.route('/api/products/stock-check', methods=['POST'])
 def stock_check():
     """
     Check stock availability for multiple products.
@@ -742,23 +960,327 @@ def stock_check():
     if not product_ids:
         return jsonify({"error": "Product IDs required"}), 400
 
-    # Query database for product stock
-    products = Product.query.filter(Product.id.in_(product_ids)).all()
+    try:
+        product_ids = parse_product_ids(product_ids)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Served from the stock snapshot; unknown products read as out of stock
+    version, levels = STOCK_SNAPSHOT.lookup(product_ids)
+    return stock_response(version, levels, product_ids)
+
+
+@api.route('/api/products/stock', methods=['GET'])
+def stock_levels():
+    """
+    Stock of several products, with conditional requests and long polling.
+
+    A request whose If-None-Match header (or ``since`` version) is current
+    gets 304 Not Modified; with ``wait`` it is held until the stock of the
+    requested products changes or the wait ends.
+
+    Query Parameters:
+        ids (str): Comma-separated product IDs
+        since (str): Version from a previous X-Stock-Version header
+        wait (float): Seconds to wait for a change (capped by STOCK_LONG_POLL_MAX)
+
+    Returns:
+        JSON object with product IDs as keys and available stock as values,
+        or 304 if nothing changed
+    """
+    try:
+        product_ids = parse_product_ids(
+            value for value in request.args.get('ids', '').split(',') if value.strip())
+        wait = min(max(float(request.args.get('wait', 0)), 0.0), STOCK_LONG_POLL_MAX)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameters: {str(e)}"}), 400
+
+    if not product_ids:
+        return jsonify({"error": "Product IDs required"}), 400
+
+    version, levels = STOCK_SNAPSHOT.lookup(product_ids)
+    unchanged = (request.if_none_match.contains_weak(stock_etag(version, product_ids))
+                 or request.args.get('since') == version)
+    if unchanged and wait:
+        version, levels, changed = STOCK_SNAPSHOT.watch(product_ids, version, levels, wait)
+        unchanged = not changed
+
+    if unchanged:
+        response = Response(status=304)
+        response.set_etag(stock_etag(version, product_ids))
+        response.headers['X-Stock-Version'] = version
+        return response
+    return stock_response(version, levels, product_ids)
+
+
+def read_stock(product_ids):
+    """
+    Look up stock for a long-lived request, releasing the database
+    connection a snapshot reload may have checked out.
+    """
+    try:
+        return STOCK_SNAPSHOT.lookup(product_ids)
+    finally:
+        db.session.remove()
+
+
+def stock_event(version, levels):
+    """Format stock levels as a server-sent ``stock`` event."""
+    data = current_app.json.dumps({str(product_id): quantity
+                                   for product_id, quantity in levels.items()})
+    return f"id: {version}\nevent: stock\ndata: {data}\n\n"
+
+
+def stream_stock_changes(product_ids):
+    """
+    Yield stock events for ``product_ids`` until the stream's lifetime ends.
+
+    The first event carries every requested product; later events carry
+    only products whose stock changed. Levels are re-read from the snapshot
+    on each relevant change event and every STOCK_STREAM_RESYNC seconds.
+    """
+    subscription = STOCK_EVENTS.subscribe()
+    try:
+        watched = set(product_ids)
+        version, levels = read_stock(product_ids)
+        yield f"retry: 3000\n\n{stock_event(version, levels)}"
+
+        now = time.monotonic()
+        deadline = now + STOCK_STREAM_MAX_SECONDS
+        next_resync = now + STOCK_STREAM_RESYNC
+        while now < deadline:
+            event = subscription.get(min(STOCK_STREAM_HEARTBEAT, next_resync - now,
+                                         deadline - now))
+            events = ([event] if event else []) + subscription.drain()
+            now = time.monotonic()
+
+            relevant = subscription.overflowed or now >= next_resync or any(
+                item['products'] is None or watched.intersection(item['products'])
+                for item in events)
+            if not relevant:
+                if not events:
+                    # Comment line; keeps proxies from closing the idle stream
+                    yield ": keep-alive\n\n"
+                continue
+
+            subscription.overflowed = False
+            next_resync = now + STOCK_STREAM_RESYNC
+            version, current = read_stock(product_ids)
+            changed = {product_id: quantity for product_id, quantity in current.items()
+                       if levels.get(product_id) != quantity}
+            levels = current
+            if changed:
+                yield stock_event(version, changed)
+    finally:
+        subscription.close()
+
+
+@api.route('/api/products/stock/stream', methods=['GET'])
+def stock_stream():
+    """
+    Stream stock changes as server-sent events.
+
+    Sends a ``stock`` event with the current stock of every requested
+    product, then one whenever orders or catalog edits change any of them.
+    The server ends the stream after STOCK_STREAM_MAX_SECONDS and clients
+    (EventSource) reconnect on their own.
+
+    Query Parameters:
+        ids (str): Comma-separated product IDs
+
+    Returns:
+        text/event-stream response, 503 when the worker's stream slots are full
+    """
+    try:
+        product_ids = parse_product_ids(
+            value for value in request.args.get('ids', '').split(',') if value.strip())
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameters: {str(e)}"}), 400
+
+    if not product_ids:
+        return jsonify({"error": "Product IDs required"}), 400
+
+    if STOCK_EVENTS.subscribers >= STOCK_STREAM_MAX_CLIENTS:
+        response = jsonify({"error": "Too many open stock streams, use /api/products/stock"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '10'
+        return response
+
+    return Response(stream_with_context(stream_stock_changes(product_ids)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def write_queued_order(session, entry):
+    """Write one queued order inside the committer's batch transaction."""
+    reserved = reserve_stock(session, Product.__table__, entry['items'])
+    STOCK_SNAPSHOT.stage(session, reserved, held=entry['held'])
+    return write_order(session, Order.__table__, OrderItem.__table__,
+                       entry['order'], entry['items'])
+
+
+def find_queued_order(session, entry):
+    """ID of an order already written for a queued entry, or None."""
+    order = entry['order']
+    user_match = (Order.user_id.is_(None) if order['user_id'] is None
+                  else Order.user_id == order['user_id'])
+    return session.execute(
+        select(Order.id).where(Order.order_number == order['order_number'],
+                               Order.customer_email == order['customer_email'],
+                               user_match)
+    ).scalar()
+
+
+def record_queued_order(entry, order_id):
+    """Count a committed queued order towards the guest limits."""
+    ORDER_COUNTER.record(order_id, email=entry['order']['customer_email'],
+                         phone=entry['order']['customer_phone'])
+
+
+# Write-behind intake used when ORDER_INTAKE_MODE is 'queued'
+ORDER_INTAKE = OrderIntake(
+    STOCK_SNAPSHOT,
+    OrderJournal(ORDER_JOURNAL_DIR, fsync=ORDER_JOURNAL_FSYNC),
+    FailoverIntakeStatus(REDIS, MemoryIntakeStatus(MEMORY_STORE)),
+    write_queued_order,
+    lambda: db.session,
+    on_committed=record_queued_order,
+    find_order=find_queued_order,
+    batch_size=ORDER_BATCH_SIZE,
+    batch_window=ORDER_BATCH_WINDOW_MS / 1000
+)
+
+
+def queue_order(order_values, items):
+    """Accept an order for the batched committer; responds 202 with its intake ID."""
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    intake_id = ORDER_INTAKE.submit(app, order_values, items)
+    return jsonify({
+        "message": "Order received",
+        "intakeId": intake_id,
+        "orderNumber": order_values['order_number'],
+        "status": "queued",
+        "statusUrl": f"/api/orders/intake/{intake_id}"
+    }), 202
+
+
+def account_order_owner(data):  # pylint: disable=unused-argument
+    """Idempotency scope of an account order, and a test for orders it owns."""
+    user_id = str(get_jwt_identity())
+    return f"user:{user_id}", lambda order: str(order.user_id) == user_id
+
 
-    stock_data = {}
-    for product in products:
-        stock_data[product.id] = product.stock_quantity
+def guest_order_owner(data):
+    """
+    Idempotency scope of a guest order, and a test for orders it owns.
+
+    Returns None for unverified guests, so they cannot replay orders.
+    """
+    email = data['customerInfo']['email']
+    if not VERIFICATION_STORE.is_verified(f"guest_verify:email:{email}"):
+        return None
+    return f"guest:{email}", lambda order: order.user_id is None and order.customer_email == email
 
-    # Include products that weren't found (out of stock)
-    for product_id in product_ids:
-        if product_id not in stock_data:
-            stock_data[product_id] = 0
 
-    return jsonify(stock_data)
+def replay_response(body, status=200):
+    """Response for a retried submission that already succeeded."""
+    response = jsonify(body)
+    response.status_code = status
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
 
 
-@app.route('/api/orders', methods=['POST'])
+def idempotent_order(owner, message):
+    """
+    Make an order view safe to retry.
+
+    Before the view runs (and so before any stock is reserved), the
+    submission claims its ``Idempotency-Key`` header, or its order number,
+    within the customer's scope. A retry of a submission that succeeded
+    gets the original response back. A retry that arrives while the first
+    attempt is still running gets 409. Reusing a key for a different body
+    gets 422. Orders whose record has expired are found by their unique
+    order number instead.
+
+    Args:
+        owner (callable): Maps the request body to (scope, owns) where
+            ``owns(order_row)`` tells whether an existing order is the
+            caller's, or to None if the caller may not place orders (the
+            view then rejects the request); may raise KeyError/TypeError
+            for malformed bodies
+        message (str): Success message of the view, used for orders
+            replayed from the database
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True)
+            try:
+                ownership = owner(data)
+                order_number = data.get('orderNumber')
+            except (KeyError, TypeError, AttributeError):
+                # Malformed bodies are rejected by the view itself
+                return view(*args, **kwargs)
+            if ownership is None:
+                # Unauthorized callers get the view's error, never a replay
+                return view(*args, **kwargs)
+            scope, owns = ownership
+            key = request.headers.get('Idempotency-Key') or order_number
+            if not key:
+                return view(*args, **kwargs)
+
+            key = f"order:{scope}:{key}"
+            fingerprint = request_fingerprint(data)
+            record = ORDER_IDEMPOTENCY.claim(key, fingerprint, ORDER_IDEMPOTENCY_LOCK_TTL)
+            if record is not None:
+                if record['fingerprint'] != fingerprint:
+                    return jsonify({"error": "Idempotency key was already used "
+                                             "for a different order"}), 422
+                if record['state'] == COMPLETE:
+                    return replay_response(record['body'], record['status'])
+                response = jsonify({"error": "Order is already being processed"})
+                response.status_code = 409
+                response.headers['Retry-After'] = '1'
+                return response
+
+            response = None
+            try:
+                existing = db.session.execute(
+                    select(Order.id, Order.order_number, Order.user_id, Order.customer_email)
+                    .where(Order.order_number == order_number)
+                ).first() if order_number else None
+                if existing is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                elif owns(existing):
+                    response = replay_response({"message": message, "orderId": existing.id,
+                                                "orderNumber": existing.order_number})
+                else:
+                    response = current_app.make_response(
+                        (jsonify({"error": "Order number already exists"}), 409))
+            finally:
+                if response is not None and 200 <= response.status_code < 300:
+                    ORDER_IDEMPOTENCY.complete(
+                        key, complete_record(fingerprint, response.status_code,
+                                             response.get_json()),
+                        ORDER_IDEMPOTENCY_TTL)
+                else:
+                    ORDER_IDEMPOTENCY.release(key)
+            return response
+        return wrapper
+    return decorator
+
+
+def item_name(data, product_id):
+    """Return the client-supplied name of the order line for ``product_id``."""
+    for item_data in data.get('items', []):
+        if str(item_data.get('id')) == str(product_id):
+            return item_data.get('name', product_id)
+    return product_id
+
+
+@api.route('/api/orders', methods=['POST'])
 @jwt_required()
+@idempotent_order(account_order_owner, "Order created successfully")
 def create_order():
     """
     Create a new order for authenticated user.
@@ -782,57 +1304,53 @@ def create_order():
         if not user.is_verified:
             return jsonify({"error": "Account verification required to place orders"}), 403
 
-        # Create order
-        order = Order(
-            order_number=data.get('orderNumber'),
-            user_id=user_id,
-            customer_email=data['customerInfo']['email'],
-            customer_phone=data['customerInfo']['phone'],
-            customer_name=data['customerInfo']['fullName'],
-            total_amount=data['totalAmount'],
-            is_guest_order=False,
-            user_verified=True,
-            verification_method='account',
-            status='pending'
-        )
-
-        db.session.add(order)
-        db.session.flush()  # Get order ID
-
-        # Add order items
-        for item_data in data['items']:
-            item = OrderItem(
-                order_id=order.id,
-                product_id=item_data['id'],
-                product_name=item_data['name'],
-                quantity=item_data['quantity'],
-                price=item_data['price'],
-                size=item_data.get('size'),
-                color=item_data.get('color')
-            )
-            db.session.add(item)
+        order_values = {
+            'order_number': parse_order_number(data.get('orderNumber')),
+            'user_id': user_id,
+            'customer_email': data['customerInfo']['email'],
+            'customer_phone': data['customerInfo']['phone'],
+            'customer_name': data['customerInfo']['fullName'],
+            'total_amount': data['totalAmount'],
+            'is_guest_order': False,
+            'user_verified': True,
+            'verification_method': 'account',
+            'status': 'pending'
+        }
+        if ORDER_INTAKE_MODE == 'queued':
+            return queue_order(order_values, data['items'])
 
-            # Update product stock
-            product = Product.query.get(item_data['id'])
-            if product:
-                if product.stock_quantity < item_data['quantity']:
-                    db.session.rollback()
-                    return jsonify({"error": f"Insufficient stock for {item_data['name']}"}), 400
-                product.stock_quantity -= item_data['quantity']
+        # Reserve stock for all lines, then create the order and its items
+        reserved = reserve_stock(db.session, Product.__table__, data['items'])
+        STOCK_SNAPSHOT.stage(db.session, reserved)
+        order_id = write_order(db.session, Order.__table__, OrderItem.__table__,
+                               order_values, data['items'])
 
         db.session.commit()
+        ORDER_COUNTER.record(order_id, email=order_values['customer_email'],
+                             phone=order_values['customer_phone'])
 
         return jsonify({
             "message": "Order created successfully",
-            "orderId": order.id,
-            "orderNumber": order.order_number
+            "orderId": order_id,
+            "orderNumber": order_values['order_number']
         })
 
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Insufficient stock for {item_name(data, e.product_id)}"}), 400
     except (ValueError, KeyError, TypeError) as e:
         # Handle data validation errors
         db.session.rollback()
         logger.warning("Data validation error in create_order: %s", e)
         return jsonify({"error": f"Invalid data provided: {str(e)}"}), 400
+    except sqlalchemy.exc.IntegrityError as e:
+        db.session.rollback()
+        if not is_duplicate_order_number(e):
+            logger.error("Database error in create_order: %s", e)
+            return jsonify({"error": f"Database error: {str(e)}"}), 500
+        # Lost a race with a concurrent submission of the same order number
+        logger.warning("Duplicate order in create_order: %s", e)
+        return jsonify({"error": "Order number already exists"}), 409
     except sqlalchemy.exc.SQLAlchemyError as e:
         # Handle database errors
         db.session.rollback()
@@ -845,7 +1363,8 @@ def create_order():
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route('/api/orders/guest', methods=['POST'])
+@api.route('/api/orders/guest', methods=['POST'])
+@idempotent_order(guest_order_owner, "Guest order created successfully")
 def create_guest_order():
     """
     Create a new order for guest user.
@@ -868,75 +1387,55 @@ def create_guest_order():
         phone = data['customerInfo']['phone']
 
         # Check if guest is verified
-        verification_key = f"guest_verify:email:{email}"
-        verification_data = None
-
-        if REDIS_CLIENT:
-            verification_data = REDIS_CLIENT.get(verification_key)
-        else:
-            if verification_key in MEMORY_STORE:
-                storage = MEMORY_STORE[verification_key]
-                if datetime.now() < storage["expires"]:
-                    verification_data = storage["data"]
-
-        if not verification_data:
-            return jsonify({"error": "Guest identity verification required"}), 403
-
-        verification_data = json.loads(verification_data)
-        if not verification_data.get("verified"):
+        if not VERIFICATION_STORE.is_verified(f"guest_verify:email:{email}"):
             return jsonify({"error": "Guest identity verification required"}), 403
 
-        # Create guest order
-        order = Order(
-            order_number=data.get('orderNumber'),
-            user_id=None,
-            customer_email=email,
-            customer_phone=phone,
-            customer_name=data['customerInfo']['fullName'],
-            total_amount=data['totalAmount'],
-            is_guest_order=True,
-            user_verified=True,
-            verification_method='guest',
-            status='pending'
-        )
-
-        db.session.add(order)
-        db.session.flush()
-
-        # Add order items
-        for item_data in data['items']:
-            item = OrderItem(
-                order_id=order.id,
-                product_id=item_data['id'],
-                product_name=item_data['name'],
-                quantity=item_data['quantity'],
-                price=item_data['price'],
-                size=item_data.get('size'),
-                color=item_data.get('color')
-            )
-            db.session.add(item)
+        order_values = {
+            'order_number': parse_order_number(data.get('orderNumber')),
+            'user_id': None,
+            'customer_email': email,
+            'customer_phone': phone,
+            'customer_name': data['customerInfo']['fullName'],
+            'total_amount': data['totalAmount'],
+            'is_guest_order': True,
+            'user_verified': True,
+            'verification_method': 'guest',
+            'status': 'pending'
+        }
+        if ORDER_INTAKE_MODE == 'queued':
+            return queue_order(order_values, data['items'])
 
-            # Update product stock
-            product = Product.query.get(item_data['id'])
-            if product:
-                if product.stock_quantity < item_data['quantity']:
-                    db.session.rollback()
-                    return jsonify({"error": f"Insufficient stock for {item_data['name']}"}), 400
-                product.stock_quantity -= item_data['quantity']
+        # Reserve stock for all lines, then create the guest order and its items
+        reserved = reserve_stock(db.session, Product.__table__, data['items'])
+        STOCK_SNAPSHOT.stage(db.session, reserved)
+        order_id = write_order(db.session, Order.__table__, OrderItem.__table__,
+                               order_values, data['items'])
 
         db.session.commit()
+        ORDER_COUNTER.record(order_id, email=email, phone=phone)
 
         return jsonify({
             "message": "Guest order created successfully",
-            "orderId": order.id,
-            "orderNumber": order.order_number
+            "orderId": order_id,
+            "orderNumber": order_values['order_number']
         })
 
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Insufficient stock for {item_name(data, e.product_id)}"}), 400
     except (ValueError, KeyError, TypeError) as e:
         # Handle data validation errors
         db.session.rollback()
         logger.warning("Data validation error in create_guest_order: %s", e)
         return jsonify({"error": f"Invalid data provided: {str(e)}"}), 400
+    except sqlalchemy.exc.IntegrityError as e:
+        db.session.rollback()
+        if not is_duplicate_order_number(e):
+            logger.error("Database error in create_guest_order: %s", e)
+            return jsonify({"error": f"Database error: {str(e)}"}), 500
+        # Lost a race with a concurrent submission of the same order number
+        logger.warning("Duplicate order in create_guest_order: %s", e)
+        return jsonify({"error": "Order number already exists"}), 409
     except sqlalchemy.exc.SQLAlchemyError as e:
         # Handle database errors
         db.session.rollback()
@@ -949,7 +1448,112 @@ def create_guest_order():
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route('/api/health', methods=['GET'])
+def serialize_order(order):
+    """Order with its items; load the items eagerly to avoid a query per order."""
+    data = ORDER_SCHEMA.dump_object(order)
+    data['items'] = [ORDER_ITEM_SCHEMA.dump_object(item) for item in order.items]
+    return data
+
+
+@api.route('/api/orders', methods=['GET'])
+@jwt_required()
+def list_orders():
+    """
+    List the signed-in user's orders, newest first, with their items.
+
+    Pages cost two queries however many orders and items they hold: one
+    for the orders (keyset on the user_id, created_at, id index) and one
+    selectinload query for their items.
+
+    Query Parameters:
+        limit (int): Page size (default 20, max 100)
+        cursor (str): nextCursor of the previous page
+
+    Returns:
+        JSON with items and nextCursor (null on the last page)
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_ORDER_PAGE_SIZE)), 1),
+                    MAX_ORDER_PAGE_SIZE)
+        query = (select(Order)
+                 .where(Order.user_id == get_jwt_identity())
+                 .options(selectinload(Order.items)))
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            if cursor_created_at is None:
+                # Rows without a timestamp sort last
+                query = query.where(Order.created_at.is_(None), Order.id < cursor_id)
+            else:
+                query = query.where(or_(
+                    Order.created_at < cursor_created_at,
+                    and_(Order.created_at == cursor_created_at, Order.id < cursor_id),
+                    Order.created_at.is_(None)
+                ))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameters: {str(e)}"}), 400
+
+    orders = db.session.scalars(
+        query.order_by(Order.created_at.desc().nulls_last(), Order.id.desc()).limit(limit + 1)
+    ).all()
+
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+
+    return jsonify({
+        'items': [serialize_order(order) for order in orders],
+        'nextCursor': encode_cursor(orders[-1]) if has_more else None
+    })
+
+
+@api.route('/api/orders/lookup', methods=['POST'])
+def lookup_order():
+    """
+    Look up an order by its order number and the email it was placed with.
+
+    Lets guests check an order without an account. Unknown order numbers
+    and wrong emails get the same 404.
+
+    Request Body:
+        orderNumber (str): Order number
+        email (str): Customer email of the order
+
+    Returns:
+        JSON order with its items
+    """
+    data = request.get_json(silent=True) or {}
+    order_number = data.get('orderNumber')
+    email = data.get('email')
+    if not isinstance(order_number, str) or not isinstance(email, str) \
+            or not order_number or not email:
+        return jsonify({"error": "Order number and email required"}), 400
+
+    order = db.session.scalars(
+        select(Order)
+        .where(Order.order_number == order_number)
+        .options(selectinload(Order.items))
+    ).first()
+    if order is None or order.customer_email.strip().lower() != email.strip().lower():
+        return jsonify({"error": "Order not found"}), 404
+    return jsonify(serialize_order(order))
+
+
+@api.route('/api/orders/intake/<intake_id>', methods=['GET'])
+def order_intake_status(intake_id):
+    """
+    Poll a queued order.
+
+    Returns:
+        JSON with status ('queued', 'committed' or 'failed'), orderNumber,
+        orderId once committed and error if rejected
+    """
+    status = ORDER_INTAKE.status(intake_id)
+    if not status:
+        return jsonify({"error": "Order not found"}), 404
+    return jsonify(status)
+
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint to verify API is running."""
     # Test database connection
@@ -964,17 +1568,22 @@ def health_check():
     email_status = "configured" if SMTP_USERNAME and SMTP_PASSWORD else "not configured"
 
     # Check SMS configuration
-    sms_status = "configured" if AFRICASTALKING_SMS and SMS_ENABLED else "not configured"
+    sms_status = "configured" if AT_API_KEY and AT_USERNAME and SMS_ENABLED else "not configured"
 
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "database": db_status,
+        "database_pool": pool_stats(db.engine),
         "email_service": email_status,
         "sms_service": sms_status,
-        "redis_available": REDIS_CLIENT is not None
+        "redis_available": bool(REDIS.run(lambda client: client.ping(), lambda: False)),
+        "redis": REDIS.stats(),
+        "memory_store": MEMORY_STORE.stats(),
+        "idempotency_store": IDEMPOTENCY_STORE.stats(),
+        "order_intake": {"mode": ORDER_INTAKE_MODE, "backlog": ORDER_INTAKE.backlog}
     })
 
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001, host='127.0.0.1')
\ No newline at end of file
+    create_app({'AUTO_CREATE_SCHEMA': True}).run(debug=True, port=5001, host='127.0.0.1')
\ No newline at end of file
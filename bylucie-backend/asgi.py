@@ -0,0 +1,10 @@
+"""
+ASGI entry point for the async verification and order API.
+
+Usage:
+    uvicorn asgi:app --workers 4
+"""
+
+from async_app import create_async_app
+
+app = create_async_app()
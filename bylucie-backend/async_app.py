@@ -0,0 +1,699 @@
+"""
+Async (ASGI) variant of the verification and order API.
+
+Serves the verification, notification and order routes of app.py on
+Starlette with async SQLAlchemy (aiosqlite/asyncpg), the redis.asyncio
+client and aiosmtplib, so one worker can keep thousands of OTP requests in
+flight instead of one per thread. Models, configuration, Redis circuit and
+in-memory fallbacks are shared with the sync app; the product catalog is
+still served by the sync app.
+
+Usage:
+    uvicorn asgi:app --workers 4
+"""
+
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+from datetime import datetime, timezone
+
+import jwt as pyjwt
+from sqlalchemy import select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+try:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.responses import JSONResponse as StarletteJSONResponse
+    from starlette.routing import Route
+    ASYNC_AVAILABLE = True
+except ImportError:
+    ASYNC_AVAILABLE = False
+
+try:
+    import aiosmtplib
+except ImportError:
+    aiosmtplib = None
+
+from app import (
+    CODE_TTL,
+    CORS_ORIGINS,
+    DATABASE_URL,
+    GUEST_VERIFIED_TTL,
+    JWT_SECRET,
+    MAX_VERIFY_ATTEMPTS,
+    MEMORY_STORE,
+    NOTIFY_MAX_ATTEMPTS,
+    ORDER_IDEMPOTENCY,
+    ORDER_IDEMPOTENCY_LOCK_TTL,
+    ORDER_IDEMPOTENCY_TTL,
+    REDIS,
+    SMTP_PASSWORD,
+    SMTP_PORT,
+    SMTP_SERVER,
+    SMTP_USE_TLS,
+    SMTP_USERNAME,
+    STOCK_SNAPSHOT,
+    build_verification_email,
+    generate_verification_code,
+    get_sms_batcher,
+    guest_limits,
+    item_name,
+    parse_product_ids,
+    send_verification_email,
+    stock_etag,
+    verification_payload,
+    verification_sms_text,
+)
+from db_engine import configure_engine, engine_options, pool_stats
+from instrumentation import timed_external
+from json_provider import dumps_bytes, loads
+from models import Order, OrderItem, Product, User
+from notifications import AsyncNotificationDispatcher, MemoryJobBackend
+from order_idempotency import COMPLETE, complete_record, request_fingerprint
+from order_rate_limits import AsyncOrderRateCounter, MemoryOrderCounter
+from order_writer import is_duplicate_order_number, parse_order_number, write_order
+from stock_reservation import InsufficientStockError, reserve_stock
+from stock_snapshot import LOAD_ATTEMPTS
+from verification_store import VERIFIED, AsyncFailoverVerificationStore, MemoryVerificationStore
+
+logger = logging.getLogger(__name__)
+
+if ASYNC_AVAILABLE:
+    class JSONResponse(StarletteJSONResponse):
+        """JSON response encoded like the sync app's (orjson, ISO 8601 datetimes)."""
+
+        def render(self, content):
+            return dumps_bytes(content)
+
+# Concurrent SMTP/SMS sends per worker; requests beyond it queue on the loop
+ASYNC_NOTIFY_MAX_IN_FLIGHT = int(os.getenv('ASYNC_NOTIFY_MAX_IN_FLIGHT', '100'))
+
+# Flask-SQLAlchemy resolves relative SQLite paths against the instance folder
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg'
+}
+
+VERIFICATION_STORE = AsyncFailoverVerificationStore(REDIS, MemoryVerificationStore(MEMORY_STORE))
+
+
+def async_database_url(url):
+    """
+    Translate a sync database URL to its asyncio driver.
+
+    Args:
+        url (str): URL as used by the sync app, e.g. ``sqlite:///app.db``
+
+    Returns:
+        sqlalchemy.engine.URL: URL for ``create_async_engine``
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    parsed = parsed.set(drivername=ASYNC_DRIVERS.get(backend, parsed.drivername))
+    database = parsed.database
+    if backend == 'sqlite' and database and database != ':memory:' and not os.path.isabs(database):
+        parsed = parsed.set(database=os.path.join(INSTANCE_PATH, database))
+    return parsed
+
+
+async def send_verification_email_async(email, code):
+    """
+    Send a verification email without blocking the event loop.
+
+    Uses aiosmtplib when installed and the pooled sync sender on a thread
+    otherwise.
+
+    Returns:
+        bool: True if email sent successfully, False otherwise
+    """
+    if not SMTP_USERNAME or not SMTP_PASSWORD:
+        logger.warning("SMTP not configured - printing code to console: %s", code)
+        return True
+
+    if aiosmtplib is None:
+        return await asyncio.to_thread(send_verification_email, email, code)
+
+    try:
+        with timed_external('smtp'):
+            await aiosmtplib.send(
+                build_verification_email(email, code),
+                hostname=SMTP_SERVER,
+                port=SMTP_PORT,
+                username=SMTP_USERNAME,
+                password=SMTP_PASSWORD,
+                start_tls=SMTP_USE_TLS,
+                timeout=10
+            )
+        logger.info("Verification email sent to %s", email)
+        return True
+    except (aiosmtplib.SMTPException, OSError) as e:
+        logger.error("Failed to send email to %s: %s", email, e)
+        logger.info("Verification code for email %s: %s", email, code)
+        return False
+
+
+async def send_verification_sms_async(phone, code):
+    """
+    Send a verification SMS on a worker thread without blocking the loop.
+
+    Returns:
+        bool: True if SMS sent successfully, False otherwise
+    """
+    logger.info("Verification code for phone %s: %s", phone, code)
+
+    batcher = get_sms_batcher()
+    if not batcher:
+        logger.warning("SMS service not available - using console fallback")
+        return True
+
+    try:
+        with timed_external('sms'):
+            recipient_status = await asyncio.wait_for(
+                asyncio.to_thread(batcher.send_one, verification_sms_text(code), phone),
+                timeout=30)
+        if recipient_status == 'Success':
+            logger.info("SMS sent successfully to %s", phone)
+            return True
+
+        logger.error("Failed to send SMS to %s: Status %s", phone, recipient_status)
+        return False
+
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error("Failed to send SMS to %s: %s", phone, e)
+        return False
+
+
+async def lookup_stock(request, product_ids):
+    """
+    Read ``product_ids`` from the stock snapshot, loading it through the
+    async session when it is missing.
+
+    Snapshot calls use the sync Redis client, so they run on worker threads.
+
+    Returns:
+        tuple: (version token, {product id: quantity})
+    """
+    result = await asyncio.to_thread(STOCK_SNAPSHOT.cached, product_ids)
+    for attempt in range(1, LOAD_ATTEMPTS + 1):
+        if result is not None:
+            break
+        version = await asyncio.to_thread(STOCK_SNAPSHOT.version)
+        async with request.app.state.sessions() as session:
+            rows = await session.execute(select(Product.id, Product.stock_quantity))
+            loaded = {row.id: row.stock_quantity or 0 for row in rows}
+        result = await asyncio.to_thread(STOCK_SNAPSHOT.install, loaded, version, product_ids,
+                                         attempt == LOAD_ATTEMPTS)
+    return result
+
+
+def place_order(session, order_values, items):
+    """Reserve stock and write the order in ``session``'s transaction."""
+    reserved = reserve_stock(session, Product.__table__, items)
+    STOCK_SNAPSHOT.stage(session, reserved)
+    return write_order(session, Order.__table__, OrderItem.__table__, order_values, items)
+
+
+def jwt_required(handler):
+    """
+    Require a valid access token issued by the sync app.
+
+    The identity is stored on ``request.state.jwt_identity``; error
+    responses mirror Flask-JWT-Extended.
+    """
+    @functools.wraps(handler)
+    async def wrapper(request):
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return JSONResponse({"msg": "Missing Authorization Header"}, status_code=401)
+        try:
+            claims = pyjwt.decode(header[len('Bearer '):], JWT_SECRET, algorithms=['HS256'])
+        except pyjwt.ExpiredSignatureError:
+            return JSONResponse({"msg": "Token has expired"}, status_code=401)
+        except pyjwt.InvalidTokenError as e:
+            return JSONResponse({"msg": str(e)}, status_code=422)
+        if claims.get('type', 'access') != 'access':
+            return JSONResponse({"msg": "Only non-refresh tokens are allowed"}, status_code=422)
+        request.state.jwt_identity = claims.get('sub')
+        return await handler(request)
+    return wrapper
+
+
+async def json_body(request):
+    """Return the parsed JSON body, or None if it is missing or malformed."""
+    try:
+        data = loads(await request.body())
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def invalid_body():
+    """Response for requests without a JSON object body."""
+    return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+
+
+async def send_guest_verification(request):
+    """Send verification code to guest user's email or phone."""
+    data = await json_body(request)
+    if data is None:
+        return invalid_body()
+    method = data.get('method', 'email')
+    email = data.get('email')
+    phone = data.get('phone')
+
+    if not email and not phone:
+        return JSONResponse({"error": "Email or phone required"}, status_code=400)
+
+    verification_code = generate_verification_code()
+    notifications = request.app.state.notifications
+
+    notification_id = None
+    if method == 'email' and email:
+        await VERIFICATION_STORE.start(f"guest_verify:email:{email}", verification_code, CODE_TTL)
+        notification_id = notifications.enqueue('email', email, verification_code)
+    elif method == 'phone' and phone:
+        await VERIFICATION_STORE.start(f"guest_verify:phone:{phone}", verification_code, CODE_TTL)
+        notification_id = notifications.enqueue('sms', phone, verification_code)
+
+    return JSONResponse({
+        "message": f"Verification code sent via {method}",
+        "notificationId": notification_id
+    })
+
+
+async def verify_guest(request):
+    """Verify guest user's verification code."""
+    data = await json_body(request)
+    if data is None:
+        return invalid_body()
+    code = data.get('code')
+    method = data.get('method', 'email')
+    email = data.get('email')
+    phone = data.get('phone')
+
+    if not code:
+        return JSONResponse({"error": "Verification code required"}, status_code=400)
+
+    if method == 'email' and email:
+        attempt_key = f"guest_verify:email:{email}"
+    elif method == 'phone' and phone:
+        attempt_key = f"guest_verify:phone:{phone}"
+    else:
+        return JSONResponse({"error": "Invalid verification method"}, status_code=400)
+
+    result = await VERIFICATION_STORE.verify(attempt_key, code, MAX_VERIFY_ATTEMPTS,
+                                             verified_ttl=GUEST_VERIFIED_TTL, retry_ttl=CODE_TTL)
+    body, status = verification_payload(result, "Identity verified successfully")
+    return JSONResponse(body, status_code=status)
+
+
+@jwt_required
+async def send_account_verification(request):
+    """Send verification code to authenticated user's email or phone."""
+    user_id = request.state.jwt_identity
+    data = await json_body(request)
+    if data is None:
+        return invalid_body()
+    method = data.get('method', 'email')
+
+    async with request.app.state.sessions() as session:
+        user = await session.get(User, user_id)
+    if not user:
+        return JSONResponse({"error": "User not found"}, status_code=404)
+
+    if method == 'email':
+        recipient, channel = user.email, 'email'
+    elif method == 'phone' and user.phone:
+        recipient, channel = user.phone, 'sms'
+    else:
+        return JSONResponse({"error": "Phone number not available for this user"}, status_code=400)
+
+    verification_code = generate_verification_code()
+    await VERIFICATION_STORE.start(f"account_verify:{user_id}:{method}", verification_code, CODE_TTL)
+    notification_id = request.app.state.notifications.enqueue(channel, recipient, verification_code)
+
+    return JSONResponse({
+        "message": f"Verification code sent via {method}",
+        "notificationId": notification_id
+    })
+
+
+async def notification_status(request):
+    """Get the delivery status of a queued verification code."""
+    status = request.app.state.notifications.status(request.path_params['notification_id'])
+    if not status:
+        return JSONResponse({"error": "Notification not found"}, status_code=404)
+    return JSONResponse(status)
+
+
+@jwt_required
+async def verify_account(request):
+    """Verify authenticated user's verification code."""
+    user_id = request.state.jwt_identity
+    data = await json_body(request)
+    if data is None:
+        return invalid_body()
+    code = data.get('code')
+    method = data.get('method', 'email')
+
+    if not code:
+        return JSONResponse({"error": "Verification code required"}, status_code=400)
+
+    attempt_key = f"account_verify:{user_id}:{method}"
+    # The code stays usable until the user row is committed
+    result = await VERIFICATION_STORE.verify(attempt_key, code, MAX_VERIFY_ATTEMPTS,
+                                             verified_ttl=CODE_TTL, retry_ttl=CODE_TTL)
+    if result == VERIFIED:
+        try:
+            async with request.app.state.sessions.begin() as session:
+                user = await session.get(User, user_id)
+                user.is_verified = True
+                user.verified_at = datetime.utcnow()
+        except SQLAlchemyError as e:
+            logger.error("Database error in account verification: %s", e)
+            return JSONResponse({"error": f"Database error: {str(e)}"}, status_code=500)
+        await VERIFICATION_STORE.delete(attempt_key)
+
+    body, status = verification_payload(result, "Account verified successfully")
+    return JSONResponse(body, status_code=status)
+
+
+async def check_guest_limits(request):
+    """Check if guest user has exceeded order limits."""
+    data = await json_body(request)
+    if data is None:
+        return invalid_body()
+    email = data.get('email')
+    phone = data.get('phone')
+
+    if not email and not phone:
+        return JSONResponse({"error": "Email or phone required"}, status_code=400)
+
+    counter = request.app.state.order_counter
+    email_orders = await counter.count('email', email) if email else 0
+    phone_orders = await counter.count('phone', phone) if phone else 0
+
+    return JSONResponse(guest_limits(email_orders, phone_orders))
+
+
+async def stock_check(request):
+    """Check stock availability for multiple products."""
+    data = await json_body(request)
+    if data is None:
+        return invalid_body()
+    product_ids = data.get('productIds', [])
+
+    if not product_ids:
+        return JSONResponse({"error": "Product IDs required"}, status_code=400)
+
+    try:
+        product_ids = parse_product_ids(product_ids)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    # Served from the shared stock snapshot; unknown products read as out of stock
+    version, levels = await lookup_stock(request, product_ids)
+    return JSONResponse({str(product_id): quantity for product_id, quantity in levels.items()},
+                        headers={'ETag': f'"{stock_etag(version, product_ids)}"',
+                                 'X-Stock-Version': version})
+
+
+async def submit_order(request, data, order_values, success_message):
+    """Place an order in one transaction and map failures to responses."""
+    try:
+        async with request.app.state.sessions.begin() as session:
+            order_id = await session.run_sync(place_order, order_values, data['items'])
+    except InsufficientStockError as e:
+        return JSONResponse({"error": f"Insufficient stock for {item_name(data, e.product_id)}"},
+                            status_code=400)
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning("Data validation error in order creation: %s", e)
+        return JSONResponse({"error": f"Invalid data provided: {str(e)}"}, status_code=400)
+    except IntegrityError as e:
+        if not is_duplicate_order_number(e):
+            logger.error("Database error in order creation: %s", e)
+            return JSONResponse({"error": f"Database error: {str(e)}"}, status_code=500)
+        logger.warning("Duplicate order in order creation: %s", e)
+        return JSONResponse({"error": "Order number already exists"}, status_code=409)
+    except SQLAlchemyError as e:
+        logger.error("Database error in order creation: %s", e)
+        return JSONResponse({"error": f"Database error: {str(e)}"}, status_code=500)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error("Unexpected error in order creation: %s", e)
+        return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+    await request.app.state.order_counter.record(order_id, email=order_values['customer_email'],
+                                                 phone=order_values['customer_phone'])
+    return JSONResponse({
+        "message": success_message,
+        "orderId": order_id,
+        "orderNumber": order_values['order_number']
+    })
+
+
+def owns_order(order, order_values):
+    """True if the existing ``order`` row was placed by the same customer."""
+    if order_values['user_id'] is None:
+        return order.user_id is None and order.customer_email == order_values['customer_email']
+    return str(order.user_id) == str(order_values['user_id'])
+
+
+def replay_response(body, status_code=200):
+    """Response for a retried submission that already succeeded."""
+    return JSONResponse(body, status_code=status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+async def submit_order_once(request, data, order_values, success_message, scope):
+    """
+    Place an order unless this submission was already made.
+
+    Mirrors the sync app's ``idempotent_order``: the submission claims its
+    Idempotency-Key header, or its order number, within ``scope`` before
+    any stock is reserved, and retries get the original response, 409
+    while it is still running or 422 for a different body. The claim
+    store uses the sync Redis client, so its calls run on worker threads.
+    """
+    order_number = order_values['order_number']
+    key = request.headers.get('Idempotency-Key') or order_number
+    if not key:
+        return await submit_order(request, data, order_values, success_message)
+
+    key = f"order:{scope}:{key}"
+    fingerprint = request_fingerprint(data)
+    record = await asyncio.to_thread(ORDER_IDEMPOTENCY.claim, key, fingerprint,
+                                     ORDER_IDEMPOTENCY_LOCK_TTL)
+    if record is not None:
+        if record['fingerprint'] != fingerprint:
+            return JSONResponse({"error": "Idempotency key was already used "
+                                          "for a different order"}, status_code=422)
+        if record['state'] == COMPLETE:
+            return replay_response(record['body'], record['status'])
+        return JSONResponse({"error": "Order is already being processed"}, status_code=409,
+                            headers={'Retry-After': '1'})
+
+    # Response to store for replays; the claim is released if none is set
+    body, status_code = None, None
+    try:
+        existing = None
+        if order_number:
+            async with request.app.state.sessions() as session:
+                existing = (await session.execute(
+                    select(Order.id, Order.user_id, Order.customer_email)
+                    .where(Order.order_number == order_number)
+                )).first()
+        if existing is None:
+            response = await submit_order(request, data, order_values, success_message)
+            status_code = response.status_code
+            if 200 <= status_code < 300:
+                body = loads(response.body)
+            return response
+        if owns_order(existing, order_values):
+            status_code = 200
+            body = {"message": success_message, "orderId": existing.id,
+                    "orderNumber": order_number}
+            return replay_response(body)
+        return JSONResponse({"error": "Order number already exists"}, status_code=409)
+    finally:
+        if body is not None:
+            await asyncio.to_thread(ORDER_IDEMPOTENCY.complete, key,
+                                    complete_record(fingerprint, status_code, body),
+                                    ORDER_IDEMPOTENCY_TTL)
+        else:
+            await asyncio.to_thread(ORDER_IDEMPOTENCY.release, key)
+
+
+@jwt_required
+async def create_order(request):
+    """Create a new order for authenticated user."""
+    user_id = request.state.jwt_identity
+    data = await json_body(request)
+    if data is None:
+        return invalid_body()
+
+    try:
+        async with request.app.state.sessions() as session:
+            user = await session.get(User, user_id)
+        if not user or not user.is_verified:
+            return JSONResponse({"error": "Account verification required to place orders"},
+                                status_code=403)
+
+        order_values = {
+            'order_number': parse_order_number(data.get('orderNumber')),
+            'user_id': user_id,
+            'customer_email': data['customerInfo']['email'],
+            'customer_phone': data['customerInfo']['phone'],
+            'customer_name': data['customerInfo']['fullName'],
+            'total_amount': data['totalAmount'],
+            'is_guest_order': False,
+            'user_verified': True,
+            'verification_method': 'account',
+            'status': 'pending'
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        return JSONResponse({"error": f"Invalid data provided: {str(e)}"}, status_code=400)
+
+    return await submit_order_once(request, data, order_values, "Order created successfully",
+                                   f"user:{user_id}")
+
+
+async def create_guest_order(request):
+    """Create a new order for guest user."""
+    data = await json_body(request)
+    if data is None:
+        return invalid_body()
+
+    try:
+        email = data['customerInfo']['email']
+        phone = data['customerInfo']['phone']
+        order_values = {
+            'order_number': parse_order_number(data.get('orderNumber')),
+            'user_id': None,
+            'customer_email': email,
+            'customer_phone': phone,
+            'customer_name': data['customerInfo']['fullName'],
+            'total_amount': data['totalAmount'],
+            'is_guest_order': True,
+            'user_verified': True,
+            'verification_method': 'guest',
+            'status': 'pending'
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        return JSONResponse({"error": f"Invalid data provided: {str(e)}"}, status_code=400)
+
+    if not await VERIFICATION_STORE.is_verified(f"guest_verify:email:{email}"):
+        return JSONResponse({"error": "Guest identity verification required"}, status_code=403)
+
+    return await submit_order_once(request, data, order_values,
+                                   "Guest order created successfully", f"guest:{email}")
+
+
+async def health_check(request):
+    """Health check endpoint to verify the async API is running."""
+    db_status = "healthy"
+    try:
+        async with request.app.state.sessions() as session:
+            await session.execute(text('SELECT 1'))
+    except SQLAlchemyError as e:
+        db_status = f"unhealthy: {str(e)}"
+        logger.error("Database health check failed: %s", e)
+
+    return JSONResponse({
+        "status": "healthy",
+        "mode": "async",
+        "timestamp": datetime.now().isoformat(),
+        "database": db_status,
+        "database_pool": pool_stats(request.app.state.engine.sync_engine),
+        "redis_available": bool(await REDIS.run_async(lambda client: client.ping(),
+                                                      lambda: False)),
+        "redis": REDIS.stats(),
+        "notifications_in_flight": request.app.state.notifications.in_flight
+    })
+
+
+ROUTES = [
+    ('/api/auth/send-guest-verification', send_guest_verification, ['POST']),
+    ('/api/auth/verify-guest', verify_guest, ['POST']),
+    ('/api/auth/send-account-verification', send_account_verification, ['POST']),
+    ('/api/notifications/{notification_id}', notification_status, ['GET']),
+    ('/api/auth/verify-account', verify_account, ['POST']),
+    ('/api/orders/check-guest-limits', check_guest_limits, ['POST']),
+    ('/api/products/stock-check', stock_check, ['POST']),
+    ('/api/orders', create_order, ['POST']),
+    ('/api/orders/guest', create_guest_order, ['POST']),
+    ('/api/health', health_check, ['GET'])
+]
+
+
+def create_async_app(config=None):
+    """
+    Build the ASGI application.
+
+    Args:
+        config (dict): Optional overrides: DATABASE_URL and
+            SQLALCHEMY_ENGINE_OPTIONS
+
+    Returns:
+        Starlette: Configured application
+
+    Raises:
+        RuntimeError: If the async dependencies are not installed
+    """
+    if not ASYNC_AVAILABLE:
+        raise RuntimeError("Async mode requires: pip install -r requirements-async.txt")
+
+    config = dict(config or {})
+    database_url = async_database_url(config.get('DATABASE_URL', DATABASE_URL))
+    options = config.get('SQLALCHEMY_ENGINE_OPTIONS', engine_options(database_url))
+
+    @contextlib.asynccontextmanager
+    async def lifespan(application):
+        engine = create_async_engine(database_url, **options)
+        configure_engine(engine.sync_engine)
+        application.state.engine = engine
+        application.state.sessions = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            yield
+        finally:
+            await application.state.notifications.aclose()
+            await engine.dispose()
+
+    application = Starlette(
+        routes=[Route(path, handler, methods=methods) for path, handler, methods in ROUTES],
+        middleware=[Middleware(CORSMiddleware,
+                               allow_origins=CORS_ORIGINS,
+                               allow_credentials=True,
+                               allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+                               allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])],
+        lifespan=lifespan
+    )
+
+    async def load_recent_orders(field, value, since):
+        column = Order.customer_email if field == 'email' else Order.customer_phone
+        since_dt = datetime.fromtimestamp(since, timezone.utc).replace(tzinfo=None)
+        async with application.state.sessions() as session:
+            rows = await session.execute(
+                select(Order.id, Order.created_at)
+                .where(column == value, Order.created_at >= since_dt)
+            )
+            return [(row.id, row.created_at.replace(tzinfo=timezone.utc).timestamp())
+                    for row in rows]
+
+    application.state.order_counter = AsyncOrderRateCounter(
+        REDIS, MemoryOrderCounter(MEMORY_STORE), load_recent_orders
+    )
+    application.state.notifications = AsyncNotificationDispatcher(
+        senders={'email': send_verification_email_async, 'sms': send_verification_sms_async},
+        backend=MemoryJobBackend(MEMORY_STORE),
+        max_attempts=NOTIFY_MAX_ATTEMPTS,
+        max_in_flight=ASYNC_NOTIFY_MAX_IN_FLIGHT
+    )
+    return application
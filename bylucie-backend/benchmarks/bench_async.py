@@ -0,0 +1,184 @@
+"""
+Compare the sync (gunicorn) and async (uvicorn) APIs under concurrency.
+
+Starts each server with a single worker against the same seeded
+throwaway SQLite database and drives OTP, guest-limit and stock-check
+requests from increasing numbers of concurrent keep-alive connections,
+reporting throughput, latency percentiles and errors.
+
+Usage:
+    python benchmarks/bench_async.py [--concurrency 10,100,1000]
+        [--duration 5] [--threads 8]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = tempfile.mkdtemp(prefix='bylucie-async-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'bench.db')}"
+sys.path.insert(0, BACKEND_DIR)
+
+import app as backend  # noqa: E402  pylint: disable=wrong-import-position
+
+HOST = '127.0.0.1'
+
+SCENARIOS = {
+    'send-guest-verification': lambda index: (
+        '/api/auth/send-guest-verification',
+        {'method': 'email', 'email': f'bench{index % 5000}@example.com'}
+    ),
+    'check-guest-limits': lambda index: (
+        '/api/orders/check-guest-limits',
+        {'email': f'bench{index % 500}@example.com'}
+    ),
+    'stock-check': lambda index: (
+        '/api/products/stock-check',
+        {'productIds': [index % 50 + 1, (index + 7) % 50 + 1]}
+    )
+}
+
+
+def seed(products=50):
+    """Create the schema and a few products."""
+    application = backend.create_app({'AUTO_CREATE_SCHEMA': True})
+    with application.app_context():
+        backend.db.session.add_all([
+            backend.Product(name=f'Product {index}', price=10, stock_quantity=100)
+            for index in range(products)
+        ])
+        backend.db.session.commit()
+
+
+def server_commands(port, threads):
+    """Command lines for the sync and async servers, one worker each."""
+    return {
+        'sync': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        'async': [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', HOST,
+                  '--port', str(port), '--workers', '1', '--log-level', 'warning',
+                  '--no-access-log', '--backlog', '4096']
+    }, dict(os.environ, WEB_CONCURRENCY='1', GUNICORN_THREADS=str(threads),
+            GUNICORN_BIND=f'{HOST}:{port}', GUNICORN_ACCESS_LOG='',
+            GUNICORN_LOG_LEVEL='warning', LOG_LEVEL='WARNING')
+
+
+async def request(reader, writer, path, payload):
+    """Send one POST over an open connection and return the status code."""
+    body = json.dumps(payload).encode('utf-8')
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {HOST}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _sep, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def drive(port, scenario, concurrency, duration):
+    """Run ``concurrency`` connections for ``duration`` seconds."""
+    latencies = []
+    errors = 0
+    counter = iter(range(10 ** 9))
+    stop_at = time.perf_counter() + duration
+
+    async def _connection():
+        nonlocal errors
+        try:
+            reader, writer = await asyncio.open_connection(HOST, port)
+        except OSError:
+            errors += 1
+            return
+        try:
+            while time.perf_counter() < stop_at:
+                path, payload = SCENARIOS[scenario](next(counter))
+                started = time.perf_counter()
+                status = await request(reader, writer, path, payload)
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    errors += 1
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            errors += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(_connection() for _ in range(concurrency)))
+
+    if len(latencies) < 2:
+        return {'rps': 0.0, 'p50': 0.0, 'p99': 0.0, 'errors': errors}
+    cuts = statistics.quantiles(latencies, n=100)
+    return {'rps': len(latencies) / duration, 'p50': cuts[49] * 1000,
+            'p99': cuts[98] * 1000, 'errors': errors}
+
+
+def wait_ready(port, timeout=30):
+    """Wait until the server accepts health checks."""
+    async def _probe():
+        reader, writer = await asyncio.open_connection(HOST, port)
+        writer.write(f"GET /api/health HTTP/1.1\r\nHost: {HOST}\r\nConnection: close\r\n\r\n"
+                     .encode('ascii'))
+        await writer.drain()
+        line = await reader.readline()
+        writer.close()
+        return line.startswith(b'HTTP/1.1 200')
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(_probe()):
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def main():
+    """Run every scenario at every concurrency level for both servers."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', default='10,100,1000',
+                        help='comma-separated concurrent connection counts')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per measurement')
+    parser.add_argument('--threads', type=int, default=8, help='threads of the sync worker')
+    parser.add_argument('--port', type=int, default=5097, help='port to bind servers to')
+    args = parser.parse_args()
+
+    seed()
+    commands, env = server_commands(args.port, args.threads)
+
+    print(f"{'mode':>6} {'scenario':>24} {'conns':>6} {'req/s':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>9} {'errors':>7}")
+    for mode, command in commands.items():
+        server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(args.port)
+            for scenario in SCENARIOS:
+                for concurrency in (int(value) for value in args.concurrency.split(',')):
+                    result = asyncio.run(drive(args.port, scenario, concurrency, args.duration))
+                    print(f"{mode:>6} {scenario:>24} {concurrency:>6} {result['rps']:>9.1f} "
+                          f"{result['p50']:>8.1f} {result['p99']:>9.1f} {result['errors']:>7}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare JSON encoders on the product catalog and order payloads.
+
+Builds a catalog of ``--products`` products (10,000 by default) with the
+same field formatters as ``GET /api/products`` and reports the time to
+encode it, and to decode a large order body, with:
+
+* Flask's default provider (stdlib json, sorted keys), used before;
+* json_provider with the stdlib fallback;
+* json_provider with orjson, when installed.
+
+Usage:
+    python benchmarks/bench_json.py [--products 10000] [--runs 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_DIR = tempfile.mkdtemp(prefix='bylucie-json-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402  pylint: disable=wrong-import-position
+
+import app as backend  # noqa: E402  pylint: disable=wrong-import-position
+import json_provider  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def build_catalog(products):
+    """Serialized product dicts, as the catalog endpoint builds them."""
+    now = datetime.utcnow()
+    serializer = backend.CATALOG_SCHEMA.compile()
+    values = {
+        'id': 0, 'name': '', 'price': 0.0, 'stock_quantity': 0, 'description': '',
+        'category': 'Rings', 'material': 'Silver', 'color': 'Gold', 'created_at': now
+    }
+    rows = []
+    for index in range(products):
+        values.update(id=index + 1, name=f'Product {index}', price=10.0 + index % 90,
+                      description=f'Handmade piece number {index}', stock_quantity=index % 40,
+                      created_at=now - timedelta(minutes=index))
+        rows.append(tuple(values[column.name] for column in serializer.columns))
+    return serializer.dump_many(rows)
+
+
+def build_order_body(lines=100):
+    """Encoded body of an order with ``lines`` lines."""
+    return json_provider.dumps_bytes({
+        'orderNumber': 'BENCH-1',
+        'items': [{'id': index, 'name': f'Product {index}', 'quantity': 1,
+                   'price': 25.0, 'size': 'M', 'color': 'Gold'} for index in range(lines)],
+        'customerInfo': {'email': 'bench@example.com', 'phone': '0700000000',
+                         'fullName': 'Bench Customer'},
+        'totalAmount': 2500.0
+    })
+
+
+def best_of(function, runs):
+    """Median and minimum wall time of ``runs`` calls, in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), min(timings)
+
+
+def encoders(application):
+    """(label, encode, decode) triples for each available encoder."""
+    flask_default = DefaultJSONProvider(application)
+    fast = json_provider.FastJSONProvider(application)
+    orjson_module = json_provider.orjson
+
+    def _stdlib(call):
+        def _run(*args):
+            json_provider.orjson = None
+            try:
+                return call(*args)
+            finally:
+                json_provider.orjson = orjson_module
+        return _run
+
+    options = [
+        ('flask default', lambda data: flask_default.dumps(data).encode('utf-8'),
+         flask_default.loads),
+        ('stdlib fallback', _stdlib(fast.dumps_bytes), _stdlib(fast.loads))
+    ]
+    if orjson_module is not None:
+        options.append(('orjson', fast.dumps_bytes, fast.loads))
+    return options
+
+
+def main():
+    """Run the comparison and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=10000, help='catalog size')
+    parser.add_argument('--runs', type=int, default=20, help='repetitions per measurement')
+    args = parser.parse_args()
+
+    application = backend.create_app()
+    catalog = build_catalog(args.products)
+    order_body = build_order_body()
+
+    print(f"{'encoder':>16} {'catalog ms':>11} {'(min)':>8} {'KiB':>7} "
+          f"{'order decode us':>16}")
+    for label, encode, decode in encoders(application):
+        median, fastest = best_of(lambda: encode(catalog), args.runs)
+        size = len(encode(catalog)) / 1024
+        decode_median, _ = best_of(lambda: [decode(order_body) for _ in range(100)], args.runs)
+        print(f"{label:>16} {median:>11.1f} {fastest:>8.1f} {size:>7.0f} "
+              f"{decode_median * 10:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare the per-object and bulk order write paths.
+
+Runs against a throwaway SQLite database and reports mean time and SQL
+statement count per order at 1, 10 and 100 lines.
+
+Usage:
+    python benchmarks/bench_order_writes.py [--orders 200]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+DB_DIR = tempfile.mkdtemp(prefix='bylucie-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402  pylint: disable=wrong-import-position
+
+import app as backend  # noqa: E402  pylint: disable=wrong-import-position
+from order_writer import write_order  # noqa: E402  pylint: disable=wrong-import-position
+
+LINE_COUNTS = (1, 10, 100)
+
+
+def make_items(lines):
+    """Build ``lines`` order items."""
+    return [
+        {'id': index + 1, 'name': f'Item {index}', 'quantity': 1, 'price': 9.5, 'size': 'M'}
+        for index in range(lines)
+    ]
+
+
+def order_values(number):
+    """Column values for a guest order."""
+    return {
+        'order_number': number,
+        'user_id': None,
+        'customer_email': 'bench@example.com',
+        'customer_phone': '0700000000',
+        'customer_name': 'Bench',
+        'total_amount': 100.0,
+        'is_guest_order': True,
+        'user_verified': True,
+        'verification_method': 'guest',
+        'status': 'pending'
+    }
+
+
+def per_object_write(number, items):
+    """The original path: ORM add, flush for the ID, then one add per line."""
+    order = backend.Order(**order_values(number))
+    backend.db.session.add(order)
+    backend.db.session.flush()
+    for item_data in items:
+        backend.db.session.add(backend.OrderItem(
+            order_id=order.id,
+            product_id=item_data['id'],
+            product_name=item_data['name'],
+            quantity=item_data['quantity'],
+            price=item_data['price'],
+            size=item_data.get('size'),
+            color=item_data.get('color')
+        ))
+    backend.db.session.commit()
+
+
+def bulk_write(number, items):
+    """The bulk path used by the order endpoints."""
+    write_order(backend.db.session, backend.Order.__table__, backend.OrderItem.__table__,
+                order_values(number), items)
+    backend.db.session.commit()
+
+
+def run(writer, label, orders, lines):
+    """Time ``orders`` writes of ``lines`` lines each and count statements."""
+    statements = [0]
+
+    def _count(*_args):
+        statements[0] += 1
+
+    engine = backend.db.engine
+    event.listen(engine, 'before_cursor_execute', _count)
+    items = make_items(lines)
+    started = time.perf_counter()
+    for index in range(orders):
+        writer(f'{label}-{lines}-{index}', items)
+    elapsed = time.perf_counter() - started
+    event.remove(engine, 'before_cursor_execute', _count)
+
+    return elapsed / orders * 1000, statements[0] / orders
+
+
+def main():
+    """Run the comparison and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--orders', type=int, default=200, help='orders per measurement')
+    args = parser.parse_args()
+
+    print(f"{'lines':>6} {'path':>11} {'ms/order':>10} {'stmts/order':>12}")
+    with backend.create_app({'AUTO_CREATE_SCHEMA': True}).app_context():
+        for lines in LINE_COUNTS:
+            for label, writer in (('per-object', per_object_write), ('bulk', bulk_write)):
+                ms, stmts = run(writer, label, args.orders, lines)
+                print(f"{lines:>6} {label:>11} {ms:>10.3f} {stmts:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Compare the ORM and compiled-schema catalog serialization paths.
+
+Seeds a throwaway SQLite database with ``--products`` products and times
+loading and serializing the full catalog (before JSON encoding) with:
+
+* ORM instances rendered through per-field formatter lambdas, the path
+  the catalog used before;
+* Core row tuples rendered by the compiled CATALOG_SCHEMA serializer.
+
+Usage:
+    python benchmarks/bench_serializers.py [--products 10000] [--runs 10]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DB_DIR = tempfile.mkdtemp(prefix='bylucie-serializers-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select  # noqa: E402  pylint: disable=wrong-import-position
+
+import app as backend  # noqa: E402  pylint: disable=wrong-import-position
+
+# The per-field formatters the catalog used before the compiled schemas
+LEGACY_FIELDS = {
+    'id': lambda row: row.id,
+    'name': lambda row: row.name,
+    'price': lambda row: float(row.price),
+    'stock_quantity': lambda row: row.stock_quantity,
+    'description': lambda row: row.description or '',
+    'category': lambda row: row.category or 'Uncategorized',
+    'inStock': lambda row: row.stock_quantity > 0,
+    'stock': lambda row: row.stock_quantity,
+    'images': lambda row: ['/images/placeholder.jpg'],
+    'imageUrl': lambda row: '/images/placeholder.jpg',
+    'rating': lambda row: 0,
+    'reviewCount': lambda row: 0,
+    'material': lambda row: row.material or 'Unknown',
+    'color': lambda row: row.color or 'Various'
+}
+
+
+def seed(products):
+    """Insert ``products`` products."""
+    backend.db.session.execute(insert(backend.Product.__table__), [
+        {'name': f'Product {index}', 'description': f'Handmade piece number {index}',
+         'price': 10 + index % 90, 'category': 'Rings', 'material': 'Silver',
+         'color': 'Gold', 'stock_quantity': index % 40}
+        for index in range(products)
+    ])
+    backend.db.session.commit()
+
+
+def orm_path():
+    """ORM instances through the legacy formatters."""
+    products = backend.Product.query.all()
+    data = [{name: render(product) for name, render in LEGACY_FIELDS.items()}
+            for product in products]
+    backend.db.session.remove()
+    return data
+
+
+def compiled_path():
+    """Core rows through the compiled catalog serializer."""
+    serializer = backend.CATALOG_SCHEMA.compile()
+    rows = backend.db.session.execute(
+        select(*serializer.columns).order_by(backend.Product.id)).all()
+    data = serializer.dump_many(rows)
+    backend.db.session.remove()
+    return data
+
+
+def timed(function, runs):
+    """Median wall time of ``runs`` calls, in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    """Run the comparison and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=10000, help='catalog size')
+    parser.add_argument('--runs', type=int, default=10, help='repetitions per measurement')
+    args = parser.parse_args()
+
+    with backend.create_app({'AUTO_CREATE_SCHEMA': True}).app_context():
+        seed(args.products)
+        legacy, compiled = orm_path(), compiled_path()
+        if [dict(item, images=list(item['images'])) for item in compiled] != legacy:
+            raise SystemExit("serializers disagree")
+
+        print(f"{'path':>22} {'ms':>8} {'us/product':>11}")
+        for label, function in (('orm + formatters', orm_path),
+                                ('core + compiled schema', compiled_path)):
+            ms = timed(function, args.runs)
+            print(f"{label:>22} {ms:>8.1f} {ms * 1000 / args.products:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
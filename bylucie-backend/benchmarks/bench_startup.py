@@ -0,0 +1,73 @@
+"""
+Measure application startup cost.
+
+Each run happens in a fresh interpreter against a throwaway SQLite
+database and reports the time to import ``app``, to build the application
+with ``create_app`` and to serve the first ``/api/health`` and
+``/api/products`` requests.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in a child interpreter so module import caches start cold
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app as backend
+imported = time.perf_counter()
+application = backend.create_app({'AUTO_CREATE_SCHEMA': True})
+created = time.perf_counter()
+client = application.test_client()
+client.get('/api/health')
+health = time.perf_counter()
+client.get('/api/products')
+products = time.perf_counter()
+json.dump({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first /api/health': health - created,
+    'first /api/products': products - health
+}, sys.stdout)
+"""
+
+
+def measure(database_url):
+    """Run the probe once and return its timings in milliseconds."""
+    env = dict(os.environ, DATABASE_URL=database_url)
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return {name: seconds * 1000 for name, seconds in json.loads(output).items()}
+
+
+def main():
+    """Run the probe ``--runs`` times and print median and worst timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to start')
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix='bylucie-bench-')
+    database_url = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+
+    runs = [measure(database_url) for _ in range(args.runs)]
+
+    print(f"{'phase':>20} {'median ms':>10} {'max ms':>10}")
+    for phase in runs[0]:
+        values = [run[phase] for run in runs]
+        print(f"{phase:>20} {statistics.median(values):>10.1f} {max(values):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+"""
+Benchmark the hot API endpoints and record the results.
+
+Seeds a throwaway SQLite database with a configurable catalog and order
+history, then measures the catalog, stock-check, guest-limit, verification,
+both order-creation and the order history and lookup endpoints. Requests go through the Flask test
+client by default; ``--http`` serves the same app over a real socket
+(werkzeug's threaded server, in process) and drives it from concurrent
+keep-alive clients, so request parsing and I/O are included.
+
+``--order-intake queued`` runs the order scenarios against the
+write-behind intake; their latency is then the time to accept an order, and
+the run reports how long the committer took to write the backlog.
+
+Each run prints latency percentiles and throughput per scenario and writes
+them, with the commit and settings, to a JSON file. Pass an earlier file
+with ``--compare`` to see the change per scenario.
+
+Usage:
+    python benchmarks/bench_suite.py [--products 1000] [--orders 5000]
+        [--requests 500] [--scenarios products,stock-check]
+        [--http] [--concurrency 4] [--order-intake queued]
+        [--output-dir benchmarks/results]
+        [--compare benchmarks/results/<earlier>.json]
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = tempfile.mkdtemp(prefix='bylucie-suite-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'suite.db')}"
+os.environ['ORDER_JOURNAL_DIR'] = os.path.join(DB_DIR, 'order-journal')
+sys.path.insert(0, BACKEND_DIR)
+
+from flask_jwt_extended import create_access_token  # noqa: E402  pylint: disable=wrong-import-position
+from sqlalchemy import insert  # noqa: E402  pylint: disable=wrong-import-position
+from werkzeug.serving import make_server  # noqa: E402  pylint: disable=wrong-import-position
+
+import app as backend  # noqa: E402  pylint: disable=wrong-import-position
+
+HOST = '127.0.0.1'
+VERIFICATION_CODE = '424242'
+CATEGORIES = ('Rings', 'Necklaces', 'Bracelets', 'Earrings')
+
+
+class Dataset:
+    """Identifiers of the seeded rows that scenarios draw from."""
+
+    def __init__(self, products, customers, token, lookups):
+        self.products = products
+        self.customers = customers
+        self.token = token
+        self.lookups = lookups
+
+
+def seed(application, products, orders, customers, seed_value):
+    """
+    Create the schema and fill it with products, order history and a
+    verified account.
+
+    Args:
+        application (Flask): App bound to the benchmark database
+        products (int): Catalog size
+        orders (int): Historical orders, spread over the last 30 days
+        customers (int): Distinct guest emails/phones in the history
+        seed_value (int): Random seed, so runs are comparable
+
+    Returns:
+        Dataset: What the scenarios need to build requests
+    """
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+
+    with application.app_context():
+        session = backend.db.session
+        session.execute(insert(backend.Product.__table__), [
+            {'name': f'Product {index}', 'description': f'Benchmark product {index}',
+             'price': 10 + index % 90, 'category': CATEGORIES[index % len(CATEGORIES)],
+             'material': 'Silver', 'color': 'Gold', 'stock_quantity': 10_000_000,
+             'created_at': now - timedelta(minutes=index)}
+            for index in range(products)
+        ])
+
+        user = backend.User(email='account@example.com', phone='0711111111', is_verified=True)
+        session.add(user)
+        session.flush()
+
+        # Every tenth historical order belongs to the account
+        order_rows = []
+        item_rows = []
+        lookups = []
+        for index in range(orders):
+            customer = rng.randrange(customers)
+            is_guest = index % 10 != 0
+            email = f'guest{customer}@example.com' if is_guest else user.email
+            order_rows.append({
+                'id': index + 1, 'order_number': f'HIST-{index}',
+                'user_id': None if is_guest else user.id, 'customer_email': email,
+                'customer_phone': f'07{customer:08d}', 'customer_name': 'Guest',
+                'total_amount': 50.0, 'is_guest_order': is_guest, 'user_verified': True,
+                'verification_method': 'guest' if is_guest else 'account',
+                'status': 'delivered',
+                'created_at': now - timedelta(seconds=rng.randrange(30 * 86400))
+            })
+            if is_guest:
+                lookups.append((f'HIST-{index}', email))
+            for _line in range(rng.randint(1, 3)):
+                item_rows.append({
+                    'order_id': index + 1, 'product_id': rng.randrange(products) + 1,
+                    'product_name': 'Product', 'quantity': 1, 'price': 25.0
+                })
+        if order_rows:
+            session.execute(insert(backend.Order.__table__), order_rows)
+            session.execute(insert(backend.OrderItem.__table__), item_rows)
+        session.commit()
+        token = create_access_token(identity=str(user.id), expires_delta=False)
+
+    # Guest orders require a verified session for the email
+    for customer in range(customers):
+        key = f"guest_verify:email:guest{customer}@example.com"
+        backend.VERIFICATION_STORE.start(key, VERIFICATION_CODE, backend.CODE_TTL)
+        backend.VERIFICATION_STORE.verify(key, VERIFICATION_CODE, backend.MAX_VERIFY_ATTEMPTS,
+                                          backend.GUEST_VERIFIED_TTL, backend.CODE_TTL)
+
+    return Dataset(products, customers, token, lookups)
+
+
+def order_payload(data, index, email):
+    """A three-line order body for ``email``."""
+    items = [
+        {'id': (index * 3 + line) % data.products + 1, 'name': f'Product {line}',
+         'quantity': 1, 'price': 25.0, 'size': 'M'}
+        for line in range(3)
+    ]
+    return {
+        'orderNumber': f'BENCH-{uuid.uuid4().hex[:16]}',
+        'items': items,
+        'customerInfo': {'email': email, 'phone': '0711111111', 'fullName': 'Bench Customer'},
+        'deliveryOption': 'standard',
+        'paymentMethod': 'mpesa',
+        'totalAmount': 75.0
+    }
+
+
+def products(client, _data, _index):
+    """Full catalog, as the storefront loads it."""
+    return [client('GET', '/api/products')]
+
+
+def products_page(client, _data, index):
+    """One filtered catalog page."""
+    category = CATEGORIES[index % len(CATEGORIES)]
+    return [client('GET', f'/api/products?category={category}&limit=50&inStock=true')]
+
+
+def stock_check(client, data, index):
+    """Cart stock check for five products."""
+    ids = [(index * 5 + offset) % data.products + 1 for offset in range(5)]
+    return [client('POST', '/api/products/stock-check', {'productIds': ids})]
+
+
+def check_guest_limits(client, data, index):
+    """Guest order limits for a customer with order history."""
+    customer = index % data.customers
+    return [client('POST', '/api/orders/check-guest-limits',
+                   {'email': f'guest{customer}@example.com', 'phone': f'07{customer:08d}'})]
+
+
+def verify_flow(client, _data, index):
+    """Request a guest code and verify it; both calls count as one operation."""
+    email = f'verify{index}@example.com'
+    return [
+        client('POST', '/api/auth/send-guest-verification', {'method': 'email', 'email': email}),
+        client('POST', '/api/auth/verify-guest',
+               {'method': 'email', 'email': email, 'code': VERIFICATION_CODE})
+    ]
+
+
+def guest_order(client, data, index):
+    """Guest checkout by a previously verified guest."""
+    email = f'guest{index % data.customers}@example.com'
+    return [client('POST', '/api/orders/guest', order_payload(data, index, email))]
+
+
+def account_order(client, data, index):
+    """Checkout by a verified account."""
+    return [client('POST', '/api/orders', order_payload(data, index, 'account@example.com'),
+                   {'Authorization': f'Bearer {data.token}'})]
+
+
+def order_history(client, data, _index):
+    """First page of the account's order history, with items."""
+    return [client('GET', '/api/orders?limit=20', None,
+                   {'Authorization': f'Bearer {data.token}'})]
+
+
+def order_lookup(client, data, index):
+    """Guest lookup of a historical order by number and email."""
+    order_number, email = data.lookups[index % len(data.lookups)]
+    return [client('POST', '/api/orders/lookup', {'orderNumber': order_number, 'email': email})]
+
+
+SCENARIOS = {
+    'products': products,
+    'products-page': products_page,
+    'stock-check': stock_check,
+    'check-guest-limits': check_guest_limits,
+    'verify-flow': verify_flow,
+    'guest-order': guest_order,
+    'account-order': account_order,
+    'order-history': order_history,
+    'order-lookup': order_lookup
+}
+
+
+def test_client_caller(application):
+    """Return a request function backed by the Flask test client."""
+    client = application.test_client()
+
+    def _call(method, path, payload=None, headers=None):
+        response = client.open(path, method=method, json=payload, headers=headers)
+        return response.status_code
+
+    return _call
+
+
+def http_caller(port):
+    """Return a request function using one keep-alive HTTP connection."""
+    connection = http.client.HTTPConnection(HOST, port, timeout=30)
+
+    def _call(method, path, payload=None, headers=None):
+        body = None
+        request_headers = dict(headers or {})
+        if payload is not None:
+            body = json.dumps(payload).encode('utf-8')
+            request_headers['Content-Type'] = 'application/json'
+        connection.request(method, path, body=body, headers=request_headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    return _call
+
+
+def summarize(latencies, errors, elapsed):
+    """Percentiles (ms) and throughput for one scenario."""
+    if len(latencies) < 2:
+        return {'requests': len(latencies), 'errors': errors, 'throughput': 0.0,
+                'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed,
+        'mean': statistics.fmean(latencies) * 1000,
+        'p50': cuts[49] * 1000,
+        'p95': cuts[94] * 1000,
+        'p99': cuts[98] * 1000
+    }
+
+
+def run_scenario(scenario, callers, data, requests, warmup):
+    """
+    Run ``requests`` operations of ``scenario`` spread over ``callers``
+    (one thread each) after ``warmup`` untimed operations.
+    """
+    counter = itertools.count()
+    for _ in range(warmup):
+        scenario(callers[0], data, next(counter))
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def _worker(caller):
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+                index = next(counter)
+            started = time.perf_counter()
+            try:
+                failed = any(status >= 400 for status in scenario(caller, data, index))
+            except (OSError, http.client.HTTPException):
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += failed
+
+    started = time.perf_counter()
+    if len(callers) == 1:
+        _worker(callers[0])
+    else:
+        threads = [threading.Thread(target=_worker, args=(caller,)) for caller in callers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def git_commit():
+    """Short hash of HEAD, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, baseline_path):
+    """Print the change of each scenario against an earlier results file."""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    print(f"{'scenario':>20} {'p50':>9} {'p95':>9} {'p99':>9} {'ops/s':>9}")
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if not previous:
+            continue
+        changes = [
+            (current[key] - previous[key]) / previous[key] * 100 if previous[key] else 0.0
+            for key in ('p50', 'p95', 'p99', 'throughput')
+        ]
+        print(f"{name:>20} " + ' '.join(f"{change:>+8.1f}%" for change in changes))
+
+
+def main():
+    """Seed the database, run the selected scenarios and store the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=1000, help='catalog size')
+    parser.add_argument('--orders', type=int, default=5000, help='historical orders to seed')
+    parser.add_argument('--customers', type=int, default=500,
+                        help='distinct guests in the order history')
+    parser.add_argument('--requests', type=int, default=500, help='timed operations per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed operations per scenario')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='comma-separated scenarios to run')
+    parser.add_argument('--http', action='store_true',
+                        help='serve the app over a real socket instead of the test client')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='concurrent connections in --http mode')
+    parser.add_argument('--port', type=int, default=0, help='port for --http mode (0: any)')
+    parser.add_argument('--order-intake', choices=('direct', 'queued'), default='direct',
+                        help='order intake mode (see ORDER_INTAKE_MODE)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the dataset')
+    parser.add_argument('--output-dir', default=os.path.join(BACKEND_DIR, 'benchmarks', 'results'),
+                        help='directory for the JSON results')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    logging.disable(logging.WARNING)
+    # Fixed codes let the verify flow complete without reading the mailbox
+    backend.generate_verification_code = lambda: VERIFICATION_CODE
+    backend.ORDER_INTAKE_MODE = args.order_intake
+
+    application = backend.create_app({'AUTO_CREATE_SCHEMA': True})
+    data = seed(application, args.products, args.orders, args.customers, args.seed)
+
+    server = None
+    if args.http:
+        server = make_server(HOST, args.port, application, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        callers = [http_caller(server.server_port) for _ in range(args.concurrency)]
+    else:
+        callers = [test_client_caller(application)]
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'settings': {
+            'mode': 'http' if args.http else 'test-client',
+            'concurrency': len(callers),
+            'order_intake': args.order_intake,
+            'products': args.products,
+            'orders': args.orders,
+            'customers': args.customers,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'seed': args.seed
+        },
+        'scenarios': {}
+    }
+
+    print(f"{'scenario':>20} {'ops':>6} {'errors':>7} {'ops/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    try:
+        for name in names:
+            result = run_scenario(SCENARIOS[name], callers, data, args.requests, args.warmup)
+            results['scenarios'][name] = result
+            print(f"{name:>20} {result['requests']:>6} {result['errors']:>7} "
+                  f"{result['throughput']:>9.1f} {result['p50']:>8.2f} "
+                  f"{result['p95']:>8.2f} {result['p99']:>8.2f}")
+        if backend.ORDER_INTAKE.backlog:
+            started = time.perf_counter()
+            while backend.ORDER_INTAKE.backlog:
+                time.sleep(0.01)
+            print(f"\nQueued orders written {time.perf_counter() - started:.2f}s after intake")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(args.output_dir, f"{stamp}-{results['commit'] or 'nogit'}.json")
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(results, output, indent=2)
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Load-test the production server at increasing worker counts.
+
+Starts gunicorn (gunicorn.conf.py) against a seeded throwaway SQLite
+database once per worker count, drives ``GET /api/products`` and
+``POST /api/orders/guest`` from concurrent keep-alive clients and reports
+throughput and latency percentiles.
+
+Guest orders need verified guest sessions that every worker can see, so
+that scenario runs only when Redis is reachable (REDIS_HOST/REDIS_PORT);
+sessions are created directly in Redis before the run.
+
+Usage:
+    python benchmarks/load_test.py [--workers 1,2,4] [--threads 4]
+        [--concurrency 32] [--duration 10]
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = tempfile.mkdtemp(prefix='bylucie-load-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'load.db')}"
+sys.path.insert(0, BACKEND_DIR)
+
+import app as backend  # noqa: E402  pylint: disable=wrong-import-position
+from verification_store import RedisVerificationStore  # noqa: E402  pylint: disable=wrong-import-position
+
+HOST = '127.0.0.1'
+GUEST_EMAILS = [f'load{index}@example.com' for index in range(50)]
+
+
+def seed(products):
+    """Create the schema and ``products`` well-stocked products."""
+    application = backend.create_app({'AUTO_CREATE_SCHEMA': True})
+    with application.app_context():
+        backend.db.session.add_all([
+            backend.Product(name=f'Product {index}', price=10 + index % 90,
+                            category='Rings', stock_quantity=1_000_000)
+            for index in range(products)
+        ])
+        backend.db.session.commit()
+
+
+def verify_guests():
+    """
+    Mark the load-test guest emails as verified in Redis.
+
+    Returns:
+        bool: False if Redis is unreachable
+    """
+    def _verify(client):
+        store = RedisVerificationStore(client)
+        for email in GUEST_EMAILS:
+            key = f"guest_verify:email:{email}"
+            store.start(key, '000000', backend.CODE_TTL)
+            store.verify(key, '000000', backend.MAX_VERIFY_ATTEMPTS,
+                         backend.GUEST_VERIFIED_TTL, backend.CODE_TTL)
+        return True
+
+    return backend.REDIS.run(_verify, lambda: False)
+
+
+def start_server(port, workers, threads):
+    """Start gunicorn and wait until it answers health checks."""
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               GUNICORN_BIND=f'{HOST}:{port}', GUNICORN_ACCESS_LOG='',
+               GUNICORN_LOG_LEVEL='warning')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(HOST, port, timeout=1)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"gunicorn did not start on port {port}")
+
+
+def products_request():
+    """Arguments for one catalog read."""
+    return 'GET', '/api/products', None
+
+
+def guest_order_request(sequence):
+    """Return a factory for guest order requests with unique order numbers."""
+    def _build():
+        index = next(sequence)
+        body = {
+            'orderNumber': f'LOAD-{uuid.uuid4().hex[:12]}',
+            'items': [{'id': index % 50 + 1, 'name': 'Load item', 'quantity': 1, 'price': 10}],
+            'customerInfo': {
+                'email': GUEST_EMAILS[index % len(GUEST_EMAILS)],
+                'phone': f'07{index % len(GUEST_EMAILS):08d}',
+                'fullName': 'Load Test'
+            },
+            'deliveryOption': 'pickup',
+            'paymentMethod': 'cash',
+            'totalAmount': 10
+        }
+        return 'POST', '/api/orders/guest', json.dumps(body)
+    return _build
+
+
+def drive(port, build_request, concurrency, duration):
+    """
+    Send requests from ``concurrency`` keep-alive clients for ``duration`` seconds.
+
+    Returns:
+        dict: Requests per second, latency percentiles in ms and error count
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def _client():
+        connection = http.client.HTTPConnection(HOST, port, timeout=10)
+        local, failed = [], 0
+        while time.perf_counter() < stop_at:
+            method, path, body = build_request()
+            headers = {'Content-Type': 'application/json'} if body else {}
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection(HOST, port, timeout=10)
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    clients = [threading.Thread(target=_client) for _ in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    if not latencies:
+        return {'rps': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'errors': errors[0]}
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        'rps': len(latencies) / duration,
+        'p50': cuts[49] * 1000,
+        'p95': cuts[94] * 1000,
+        'p99': cuts[98] * 1000,
+        'errors': errors[0]
+    }
+
+
+def main():
+    """Run every scenario at every worker count and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker')
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per measurement')
+    parser.add_argument('--products', type=int, default=200, help='products to seed')
+    parser.add_argument('--port', type=int, default=5099, help='port to bind gunicorn to')
+    args = parser.parse_args()
+
+    seed(args.products)
+    scenarios = [('GET /api/products', lambda: products_request)]
+    if verify_guests():
+        scenarios.append(('POST /api/orders/guest',
+                          lambda: guest_order_request(itertools.count())))
+    else:
+        print("Redis unreachable: skipping POST /api/orders/guest\n")
+
+    print(f"{'scenario':>24} {'workers':>8} {'req/s':>9} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers in (int(value) for value in args.workers.split(',')):
+        server = start_server(args.port, workers, args.threads)
+        try:
+            for label, make_builder in scenarios:
+                result = drive(args.port, make_builder(), args.concurrency, args.duration)
+                print(f"{label:>24} {workers:>8} {result['rps']:>9.1f} {result['p50']:>8.1f} "
+                      f"{result['p95']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
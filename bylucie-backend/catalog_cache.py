@@ -0,0 +1,177 @@
+"""
+Versioned in-process cache for the serialized product catalog.
+
+The catalog version is bumped whenever a transaction that wrote to the
+product table commits, so steady-state reads of the product list are served
+from pre-encoded JSON bytes without touching the database. When several
+worker processes serve the API, a version counter shared through Redis
+carries each bump to the other workers.
+"""
+
+import hashlib
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class SharedCatalogVersion:
+    """
+    Catalog version counter kept in Redis so bumps reach every process.
+
+    Reads are cached locally for ``refresh`` seconds, which bounds how long
+    another worker may keep serving a catalog this process has changed.
+    While Redis is unavailable the version reads as None and each process
+    relies on its local version alone.
+
+    Args:
+        managed_redis (ManagedRedis): Redis connection with circuit breaker
+        refresh (float): Seconds between reads of the shared counter
+    """
+
+    KEY = 'catalog:version'
+
+    def __init__(self, managed_redis, refresh=1.0):
+        self._redis = managed_redis
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._value = None
+        self._checked_at = float('-inf')
+
+    def _read(self, client):
+        value = client.get(self.KEY)
+        return int(value) if value is not None else 0
+
+    def current(self):
+        """Return the shared version, or None while Redis is unavailable."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.refresh:
+                return self._value
+        value = self._redis.run(self._read, lambda: None)
+        with self._lock:
+            self._value = value
+            self._checked_at = now
+        return value
+
+    def bump(self):
+        """Advance the shared version."""
+        value = self._redis.run(lambda client: client.incr(self.KEY), lambda: None)
+        with self._lock:
+            self._value = value
+            self._checked_at = time.monotonic()
+
+
+class CatalogCache:
+    """
+    Thread-safe holder for the encoded product list and its ETag.
+
+    Entries are keyed by catalog version; a stale entry is rebuilt on the
+    next read after :meth:`bump` has been called, here or (with a shared
+    version) in another process. The ETag is derived from the encoded body
+    so every process hands out the same tag for the same catalog.
+
+    Args:
+        shared_version (SharedCatalogVersion): Optional cross-process version
+    """
+
+    def __init__(self, shared_version=None):
+        self._lock = threading.Lock()
+        self._shared = shared_version
+        self._version = 0
+        self._cached_version = None
+        self._body = None
+        self._etag = None
+
+    @property
+    def version(self):
+        """Current catalog version."""
+        return self._version
+
+    def bump(self):
+        """Invalidate the cached catalog by advancing the version."""
+        with self._lock:
+            self._version += 1
+        if self._shared is not None:
+            self._shared.bump()
+
+    def get(self, build_body):
+        """
+        Return the encoded catalog, rebuilding it if the version moved.
+
+        Args:
+            build_body (callable): Returns the encoded catalog as bytes
+
+        Returns:
+            tuple: (body bytes, etag str)
+        """
+        shared = self._shared.current() if self._shared is not None else None
+        with self._lock:
+            version = (shared, self._version)
+            if self._cached_version == version:
+                return self._body, self._etag
+
+        body = build_body()
+        etag = f"c-{hashlib.sha1(body).hexdigest()[:16]}"
+
+        with self._lock:
+            # Only publish if no write landed while we were rebuilding
+            if version[1] == self._version:
+                self._cached_version = version
+                self._body = body
+                self._etag = etag
+        return body, etag
+
+
+def on_table_commit(table, callback):
+    """
+    Call ``callback(session)`` whenever a session commits a write to ``table``.
+
+    Covers ORM unit-of-work changes (inserts, updates and deletes of mapped
+    instances) as well as Core ``UPDATE``/``INSERT``/``DELETE`` statements
+    run through ``Session.execute``.
+
+    Args:
+        table (sqlalchemy.Table): Table to watch
+        callback (callable): Receives the committed session
+    """
+    flag = f"dirty:{table.name}:{id(callback)}"
+
+    def _touches_table(instances):
+        return any(getattr(obj, '__table__', None) is table for obj in instances)
+
+    @event.listens_for(Session, 'after_flush')
+    def _mark_flush(session, _flush_context):
+        if (_touches_table(session.new) or _touches_table(session.dirty)
+                or _touches_table(session.deleted)):
+            session.info[flag] = True
+
+    @event.listens_for(Session, 'do_orm_execute')
+    def _mark_statement(orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_insert
+                or orm_execute_state.is_delete):
+            return
+        target = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(target, 'name', None) == table.name:
+            orm_execute_state.session.info[flag] = True
+
+    @event.listens_for(Session, 'after_commit')
+    def _notify_on_commit(session):
+        if session.info.pop(flag, False):
+            callback(session)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _clear_on_rollback(session):
+        session.info.pop(flag, None)
+
+
+def track_table_writes(cache, table):
+    """
+    Bump ``cache`` whenever a session commits a write to ``table``.
+
+    Args:
+        cache (CatalogCache): Cache to invalidate
+        table (sqlalchemy.Table): Table whose writes invalidate the cache
+    """
+    on_table_commit(table, lambda _session: cache.bump())
@@ -0,0 +1,131 @@
+"""
+Engine tuning profiles per database backend.
+
+``engine_options`` returns the ``create_engine`` arguments for a database
+URL (used as SQLALCHEMY_ENGINE_OPTIONS) and ``configure_engine`` attaches
+the per-connection setup, so the sync and async apps pool and tune their
+connections the same way.
+
+SQLite runs in WAL mode with ``synchronous=NORMAL``, a busy timeout and a
+memory map, behind a small thread-shared pool. PostgreSQL gets a bounded
+pool with pre-ping, recycling and a server-side statement timeout. Every
+setting can be overridden through the environment.
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+SQLITE_PROFILE = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    # One connection per server thread is enough; SQLite serializes writers
+    'pool_size': int(os.getenv('SQLITE_POOL_SIZE', '8')),
+    'max_overflow': int(os.getenv('SQLITE_MAX_OVERFLOW', '8')),
+    'pool_timeout': float(os.getenv('SQLITE_POOL_TIMEOUT', '10'))
+}
+
+POSTGRES_PROFILE = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),
+    'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+    'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    'statement_timeout': int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '15000'))
+}
+
+
+def is_memory_sqlite(url):
+    """Return True for in-memory SQLite URLs, which use a static pool."""
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(database_url):
+    """
+    Build ``create_engine`` keyword arguments for ``database_url``.
+
+    Args:
+        database_url (str or URL): Sync or asyncio database URL
+
+    Returns:
+        dict: Engine options; empty for backends without a profile
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+
+    if backend == 'sqlite':
+        if is_memory_sqlite(url):
+            return {}
+        options = {
+            'pool_size': SQLITE_PROFILE['pool_size'],
+            'max_overflow': SQLITE_PROFILE['max_overflow'],
+            'pool_timeout': SQLITE_PROFILE['pool_timeout']
+        }
+        if url.get_driver_name() == 'aiosqlite':
+            # aiosqlite defaults to NullPool, reopening the file per checkout
+            options['poolclass'] = AsyncAdaptedQueuePool
+        return options
+
+    if backend == 'postgresql':
+        options = {
+            key: POSTGRES_PROFILE[key]
+            for key in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+        }
+        timeout = POSTGRES_PROFILE['statement_timeout']
+        if timeout:
+            if url.get_driver_name() == 'asyncpg':
+                options['connect_args'] = {'server_settings': {'statement_timeout': str(timeout)}}
+            else:
+                options['connect_args'] = {'options': f'-c statement_timeout={timeout}'}
+        return options
+
+    return {}
+
+
+def configure_engine(engine):
+    """
+    Attach per-connection setup to ``engine`` (a sync Engine; pass
+    ``AsyncEngine.sync_engine`` for async engines).
+    """
+    if engine.dialect.name != 'sqlite' or is_memory_sqlite(engine.url):
+        return
+
+    pragmas = (
+        f"PRAGMA journal_mode={SQLITE_PROFILE['journal_mode']}",
+        f"PRAGMA synchronous={SQLITE_PROFILE['synchronous']}",
+        f"PRAGMA busy_timeout={SQLITE_PROFILE['busy_timeout']}",
+        f"PRAGMA mmap_size={SQLITE_PROFILE['mmap_size']}"
+    )
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def pool_stats(engine):
+    """
+    Return the connection pool state of ``engine``.
+
+    Returns:
+        dict: Pool class plus size, checked-in, checked-out and overflow
+        counts where the pool exposes them
+    """
+    pool = engine.pool
+    stats = {'class': type(pool).__name__}
+    for name, method in (('size', 'size'), ('checked_in', 'checkedin'),
+                         ('checked_out', 'checkedout'), ('overflow', 'overflow')):
+        if hasattr(pool, method):
+            stats[name] = getattr(pool, method)()
+    max_overflow = getattr(pool, '_max_overflow', None)
+    if max_overflow is not None:
+        stats['max_overflow'] = max_overflow
+    return stats
@@ -0,0 +1,49 @@
+"""
+Gunicorn settings for serving the API in production.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden through the environment (WEB_CONCURRENCY,
+GUNICORN_THREADS, ...). With GUNICORN_PRELOAD enabled the app is imported
+once in the master and shared copy-on-write by the workers; each worker
+then drops the database and Redis connections it inherited (post_fork).
+
+Reloading:
+    kill -HUP <master pid>    restart workers gracefully with new settings;
+                              with preload, code changes need a full
+                              restart or a USR2 binary upgrade
+    kill -TERM <master pid>   finish in-flight requests and stop
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:5001')
+
+# Processes handle CPU-bound work in parallel; threads overlap I/O waits
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers periodically to contain slow leaks (0 disables)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Re-initialize per-process connection pools in a new worker."""
+    from app import reset_after_fork  # pylint: disable=import-outside-toplevel
+
+    reset_after_fork()
+    server.log.info("Worker %s: database engine and Redis pool reset", worker.pid)
@@ -0,0 +1,280 @@
+"""
+Request timing, query counts and Prometheus metrics.
+
+Every request gets a RequestMetrics record (held in a context variable, so
+it follows the request's thread or task) that SQL, Redis and external-call
+hooks add to. When the request finishes its breakdown is sent back as a
+``Server-Timing`` header and folded into process-wide histograms and
+counters, exposed in Prometheus text format at ``/metrics``. The endpoint
+is only served when a scrape token is configured, and only to requests
+that present it as a bearer token.
+
+Metrics are per process; with several server workers each worker reports
+its own series.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import hmac
+import threading
+import time
+
+from sqlalchemy import event
+
+# Upper bounds in seconds, Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        """Add ``amount`` to the series identified by ``labels``."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        """Return the counter in Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels."""
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, labels=()):
+        """Record ``value`` in the series identified by ``labels``."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        """Return the histogram in Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f'{self.name}_bucket'
+                             f'{_labels(self.label_names, labels, [("le", le)])} {cumulative}')
+            label_text = _labels(self.label_names, labels)
+            lines.append(f'{self.name}_sum{label_text} {series[-1]}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class RequestMetrics:
+    """Work attributed to one request."""
+
+    __slots__ = ('route', 'started', 'sql_count', 'sql_seconds',
+                 'redis_count', 'redis_seconds', 'external')
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.redis_count = 0
+        self.redis_seconds = 0.0
+        self.external = {}
+
+    def server_timing(self, total_seconds):
+        """Build the ``Server-Timing`` header value."""
+        parts = [f'app;dur={total_seconds * 1000:.1f}',
+                 f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} queries"',
+                 f'redis;dur={self.redis_seconds * 1000:.1f};desc="{self.redis_count} commands"']
+        for service, seconds in sorted(self.external.items()):
+            parts.append(f'{service};dur={seconds * 1000:.1f}')
+        return ', '.join(parts)
+
+
+BACKGROUND = 'background'
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Request latency by route.',
+                             ('method', 'route'))
+REQUESTS = Counter('http_requests_total', 'Requests by route and status.',
+                   ('method', 'route', 'status'))
+REQUEST_QUERIES = Histogram('http_request_db_queries', 'SQL statements per request.',
+                            ('route',), COUNT_BUCKETS)
+QUERY_DURATION = Histogram('db_query_duration_seconds', 'SQL statement latency.',
+                           buckets=QUERY_BUCKETS)
+REDIS_COMMANDS = Counter('redis_commands_total', 'Redis commands sent, by route.', ('route',))
+REDIS_DURATION = Histogram('redis_call_duration_seconds',
+                           'Latency of Redis commands and pipelines.', buckets=QUERY_BUCKETS)
+EXTERNAL_DURATION = Histogram('external_call_duration_seconds',
+                              'Latency of SMTP/SMS provider calls.', ('service', 'outcome'))
+
+REGISTRY = (REQUEST_DURATION, REQUESTS, REQUEST_QUERIES, QUERY_DURATION,
+            REDIS_COMMANDS, REDIS_DURATION, EXTERNAL_DURATION)
+
+
+def current():
+    """Return the RequestMetrics of the running request, or None."""
+    return _current.get()
+
+
+def record_query(seconds):
+    """Account one SQL statement."""
+    QUERY_DURATION.observe(seconds)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.sql_count += 1
+        metrics.sql_seconds += seconds
+
+
+def record_redis(commands, seconds):
+    """Account ``commands`` Redis commands sent in one round trip."""
+    REDIS_DURATION.observe(seconds)
+    metrics = _current.get()
+    REDIS_COMMANDS.inc((metrics.route if metrics else BACKGROUND,), commands)
+    if metrics is not None:
+        metrics.redis_count += commands
+        metrics.redis_seconds += seconds
+
+
+@contextlib.contextmanager
+def timed_external(service):
+    """Time a call to an external provider such as 'smtp' or 'sms'."""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        seconds = time.perf_counter() - started
+        EXTERNAL_DURATION.observe(seconds, (service, outcome))
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.external[service] = metrics.external.get(service, 0.0) + seconds
+
+
+def instrument_engine(engine):
+    """Time every statement executed through ``engine``."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, _cursor, _statement, _parameters, _context, _executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, _cursor, _statement, _parameters, _context, _executemany):
+        record_query(time.perf_counter() - conn.info['query_started'].pop())
+
+    @event.listens_for(engine, 'handle_error')
+    def _failed(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_started'):
+            conn.info['query_started'].pop()
+
+
+def start_request(route):
+    """Begin collecting metrics for a request; returns a token for finish_request."""
+    return _current.set(RequestMetrics(route))
+
+
+def finish_request(token, method, status):
+    """
+    Stop collecting for the request started with ``token``.
+
+    Returns:
+        str: ``Server-Timing`` header value
+    """
+    metrics = _current.get()
+    _current.reset(token)
+    total = time.perf_counter() - metrics.started
+    REQUEST_DURATION.observe(total, (method, metrics.route))
+    REQUESTS.inc((method, metrics.route, str(status)))
+    REQUEST_QUERIES.observe(metrics.sql_count, (metrics.route,))
+    return metrics.server_timing(total)
+
+
+def render_metrics():
+    """Return all metrics in Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """
+    Collect per-request metrics for a Flask app.
+
+    ``/metrics`` is registered only if ``METRICS_TOKEN`` is set in the app
+    config, and answers 401 unless the request carries
+    ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    # pylint: disable=import-outside-toplevel
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start():
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.metrics_token = start_request(route)
+
+    @app.after_request
+    def _finish(response):
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            response.headers['Server-Timing'] = finish_request(token, request.method,
+                                                               response.status_code)
+        return response
+
+    @app.teardown_request
+    def _discard(_error):
+        # after_request is skipped when a response could not be built
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    metrics_token = app.config.get('METRICS_TOKEN')
+    if not metrics_token:
+        return
+
+    def metrics_view():
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode('utf-8'), metrics_token.encode('utf-8')):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain',
+                            headers={'WWW-Authenticate': 'Bearer'})
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
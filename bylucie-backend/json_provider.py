@@ -0,0 +1,112 @@
+"""
+Fast JSON encoding and decoding for API requests and responses.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Both backends write dates and datetimes as ISO 8601 strings, so
+models and handlers can return them as they are, and both accept
+non-string dict keys such as integer product IDs.
+
+``FastJSONProvider`` plugs this into Flask (``jsonify``, ``request.get_json``
+and ``current_app.json``); ``dumps_bytes`` and ``loads`` serve the ASGI app.
+"""
+
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def default(obj):
+    """
+    Convert types neither backend encodes natively.
+
+    Raises:
+        TypeError: If ``obj`` cannot be represented as JSON
+    """
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj, indent=False, sort_keys=False):
+    """
+    Serialize ``obj`` to UTF-8 JSON.
+
+    Args:
+        obj: Data to serialize
+        indent (bool): Pretty-print with two-space indentation
+        sort_keys (bool): Sort dict keys
+
+    Returns:
+        bytes: Encoded JSON
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+
+    return json.dumps(obj, default=default, ensure_ascii=False, sort_keys=sort_keys,
+                      indent=2 if indent else None,
+                      separators=None if indent else (',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """
+    Parse JSON from ``str`` or UTF-8 ``bytes``.
+
+    Raises:
+        ValueError: If ``data`` is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by ``dumps_bytes`` and ``loads``."""
+
+    default = staticmethod(default)
+    # Key order carries no meaning for API clients and sorting costs time
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        """Serialize to a string; unusual json.dumps options use the stdlib."""
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, bool(kwargs.get('indent')), self.sort_keys).decode('utf-8')
+
+    def dumps_bytes(self, obj, indent=False):
+        """Serialize to UTF-8 bytes without a str round trip."""
+        return dumps_bytes(obj, indent, self.sort_keys)
+
+    def loads(self, s, **kwargs):
+        """Parse JSON; keyword arguments for json.loads use the stdlib."""
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        """Build a JSON response, as ``jsonify`` does, from encoded bytes."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n',
+                                        mimetype=self.mimetype)
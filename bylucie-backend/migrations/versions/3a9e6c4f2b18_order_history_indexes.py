@@ -0,0 +1,32 @@
+"""Order history indexes
+
+Revision ID: 3a9e6c4f2b18
+Revises: 7e2b5d8c1a64
+Create Date: 2026-10-17 15:26:07.918342
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3a9e6c4f2b18'
+down_revision = '7e2b5d8c1a64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_user_id_created_at_id',
+                              ['user_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.create_index('ix_order_item_order_id', ['order_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_item_order_id')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_user_id_created_at_id')
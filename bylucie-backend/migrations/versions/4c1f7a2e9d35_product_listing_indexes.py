@@ -0,0 +1,35 @@
+"""Product listing indexes
+
+Revision ID: 4c1f7a2e9d35
+Revises: 9b8ddedd360e
+Create Date: 2026-10-17 09:12:44.201533
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1f7a2e9d35'
+down_revision = '9b8ddedd360e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_category', ['category'], unique=False)
+        batch_op.create_index('ix_product_material', ['material'], unique=False)
+        batch_op.create_index('ix_product_color', ['color'], unique=False)
+        batch_op.create_index('ix_product_price', ['price'], unique=False)
+        batch_op.create_index('ix_product_stock_quantity', ['stock_quantity'], unique=False)
+        batch_op.create_index('ix_product_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_created_at_id')
+        batch_op.drop_index('ix_product_stock_quantity')
+        batch_op.drop_index('ix_product_price')
+        batch_op.drop_index('ix_product_color')
+        batch_op.drop_index('ix_product_material')
+        batch_op.drop_index('ix_product_category')
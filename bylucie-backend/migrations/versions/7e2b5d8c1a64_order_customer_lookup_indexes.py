@@ -0,0 +1,29 @@
+"""Order customer lookup indexes
+
+Revision ID: 7e2b5d8c1a64
+Revises: 4c1f7a2e9d35
+Create Date: 2026-10-17 11:40:18.564210
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b5d8c1a64'
+down_revision = '4c1f7a2e9d35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_customer_email_created_at',
+                              ['customer_email', 'created_at'], unique=False)
+        batch_op.create_index('ix_order_customer_phone_created_at',
+                              ['customer_phone', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_customer_phone_created_at')
+        batch_op.drop_index('ix_order_customer_email_created_at')
@@ -1,9 +1,21 @@
-from flask_sqlalchemy import SQLAlchemy
+"""
+Database models shared by the API and its migrations.
+
+``db`` is created unbound and attached to an application in ``create_app``.
+"""
+
 from datetime import datetime
 
+from flask_sqlalchemy import SQLAlchemy
+
+from serializers import Schema
+
 db = SQLAlchemy()
 
+
 class User(db.Model):
+    """User model for authenticated users."""
+
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     phone = db.Column(db.String(20))
@@ -11,11 +23,18 @@ class User(db.Model):
     verified_at = db.Column(db.DateTime)
     two_factor_secret = db.Column(db.String(32))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
+
     # Relationship with orders
     orders = db.relationship('Order', backref='user', lazy=True)
 
+    def to_dict(self):
+        """Convert user object to dictionary."""
+        return USER_SCHEMA.dump_object(self)
+
+
 class Order(db.Model):
+    """Order model for both guest and user orders."""
+
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(50), unique=True, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -28,16 +47,73 @@ class Order(db.Model):
     user_verified = db.Column(db.Boolean, default=False)
     verification_method = db.Column(db.String(50), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
+
     # Order items relationship
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
 
+    # Recent-order lookups for the guest limit check, and keyset pagination
+    # of a user's order history
+    __table_args__ = (
+        db.Index('ix_order_customer_email_created_at', 'customer_email', 'created_at'),
+        db.Index('ix_order_customer_phone_created_at', 'customer_phone', 'created_at'),
+        db.Index('ix_order_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
+
+    def to_dict(self):
+        """Convert order object to dictionary."""
+        return ORDER_SCHEMA.dump_object(self)
+
+
 class OrderItem(db.Model):
+    """Order items model."""
+
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, nullable=False)
     product_name = db.Column(db.String(200), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     size = db.Column(db.String(50), nullable=True)
-    color = db.Column(db.String(50), nullable=True)
\ No newline at end of file
+    color = db.Column(db.String(50), nullable=True)
+
+    def to_dict(self):
+        """Convert order item object to dictionary."""
+        return ORDER_ITEM_SCHEMA.dump_object(self)
+
+
+class Product(db.Model):
+    """Product model for stock management."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
+    stock_quantity = db.Column(db.Integer, default=0, index=True)
+    description = db.Column(db.Text)
+    category = db.Column(db.String(100), index=True)
+    material = db.Column(db.String(100), index=True)
+    color = db.Column(db.String(50), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Keyset pagination order for the product listing
+    __table_args__ = (
+        db.Index('ix_product_created_at_id', 'created_at', 'id'),
+    )
+
+    def to_dict(self):
+        """Convert product object to dictionary."""
+        return PRODUCT_SCHEMA.dump_object(self)
+
+
+# Column schemas behind to_dict; see serializers for the compiled row path
+USER_SCHEMA = Schema(User.__table__, ['id', 'email', 'phone', 'is_verified', 'verified_at'])
+ORDER_SCHEMA = Schema(Order.__table__, [
+    'id', 'order_number', 'customer_email', 'customer_name', 'total_amount', 'status',
+    'is_guest_order', 'user_verified', 'created_at'
+])
+ORDER_ITEM_SCHEMA = Schema(OrderItem.__table__, [
+    'id', 'product_id', 'product_name', 'quantity', 'price', 'size', 'color'
+])
+PRODUCT_SCHEMA = Schema(Product.__table__, [
+    'id', 'name', 'price', 'stock_quantity', 'description', 'category', 'material', 'color',
+    'created_at'
+])
@@ -0,0 +1,519 @@
+"""
+Background dispatch of verification emails and SMS.
+
+Request handlers enqueue a notification and return immediately; a small
+pool of worker threads delivers it with retries and exponential backoff.
+Jobs live in a Redis list while Redis is healthy (so they survive a
+restart) and in an in-memory queue otherwise. A job taken from Redis stays
+on a processing list until its delivery is acknowledged, so one held by a
+crashed worker is requeued when workers next start. Delivery status can be
+polled by job ID. The async API delivers on its event loop instead, with
+one task per notification (AsyncNotificationDispatcher).
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_SENDING = 'sending'
+STATUS_RETRYING = 'retrying'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+# Jobs on the processing list longer than this are presumed abandoned
+DEFAULT_VISIBILITY_TIMEOUT = 300
+
+# Move the oldest ready job to the processing list and lease it
+_POP_SCRIPT = """
+local payload = redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT')
+if payload then
+    redis.call('ZADD', KEYS[3], ARGV[1], payload)
+end
+return payload
+"""
+
+# Return jobs whose lease expired to the front of the ready list
+_RECOVER_SCRIPT = """
+local moved = 0
+for _, payload in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])) do
+    if redis.call('LREM', KEYS[2], 1, payload) > 0 then
+        redis.call('RPUSH', KEYS[1], payload)
+        moved = moved + 1
+    end
+    redis.call('ZREM', KEYS[3], payload)
+end
+return moved
+"""
+
+# Key under which a job popped from Redis carries its raw payload
+RECEIPT_KEY = '_receipt'
+
+
+class MemoryJobBackend:
+    """
+    In-process job queue with delayed retries.
+
+    Args:
+        cache (TTLCache): Cache holding delivery statuses, so they expire
+            and stay within its size bound
+    """
+
+    STATUS_PREFIX = 'notify:status:'
+
+    def __init__(self, cache):
+        self._condition = threading.Condition()
+        self._jobs = []
+        self._sequence = itertools.count()
+        self._cache = cache
+
+    def push(self, job, delay=0):
+        """Queue ``job`` to become available after ``delay`` seconds."""
+        with self._condition:
+            heapq.heappush(self._jobs, (time.time() + delay, next(self._sequence), job))
+            self._condition.notify()
+
+    def pop(self, timeout):
+        """Return the next due job, or None after ``timeout`` seconds."""
+        deadline = time.time() + timeout
+        with self._condition:
+            while True:
+                now = time.time()
+                if self._jobs and self._jobs[0][0] <= now:
+                    return heapq.heappop(self._jobs)[2]
+                if now >= deadline:
+                    return None
+                wait = deadline - now
+                if self._jobs:
+                    wait = min(wait, self._jobs[0][0] - now)
+                self._condition.wait(wait)
+
+    def ack(self, job):
+        """Acknowledge a finished job; memory jobs need no bookkeeping."""
+
+    def recover(self, visibility_timeout):
+        """Requeue abandoned jobs; memory jobs do not outlive their process."""
+        return 0
+
+    def set_status(self, job_id, status, ttl):
+        """Store the delivery status of a job."""
+        self._cache.set(f"{self.STATUS_PREFIX}{job_id}", status, ttl)
+
+    def get_status(self, job_id):
+        """Return the delivery status of a job, or None if unknown."""
+        return self._cache.get(f"{self.STATUS_PREFIX}{job_id}")
+
+
+class RedisJobBackend:
+    """
+    Redis-backed job queue: a ready list, a sorted set of delayed retries
+    and a processing list of jobs being delivered.
+
+    Workers poll with non-blocking LMOVE so they never hold a pooled
+    connection in a blocking command; jobs pushed from this process wake
+    them immediately. Each popped job is leased (lease time in a sorted set)
+    until ``ack`` removes it from the processing list.
+    """
+
+    QUEUE_KEY = 'notify:queue'
+    DELAYED_KEY = 'notify:delayed'
+    PROCESSING_KEY = 'notify:processing'
+    LEASES_KEY = 'notify:leases'
+    STATUS_PREFIX = 'notify:status:'
+
+    def __init__(self, client):
+        self.client = client
+        self._doorbell = threading.Condition()
+        self._pop = client.register_script(_POP_SCRIPT)
+        self._recover = client.register_script(_RECOVER_SCRIPT)
+
+    @property
+    def _keys(self):
+        return [self.QUEUE_KEY, self.PROCESSING_KEY, self.LEASES_KEY]
+
+    def push(self, job, delay=0):
+        """Queue ``job`` to become available after ``delay`` seconds."""
+        payload = json.dumps({key: value for key, value in job.items() if key != RECEIPT_KEY})
+        if delay > 0:
+            self.client.zadd(self.DELAYED_KEY, {payload: time.time() + delay})
+        else:
+            self.client.lpush(self.QUEUE_KEY, payload)
+            with self._doorbell:
+                self._doorbell.notify()
+
+    def _promote_due(self):
+        """Move retries whose backoff has elapsed onto the ready list."""
+        for payload in self.client.zrangebyscore(self.DELAYED_KEY, 0, time.time()):
+            # ZREM succeeds for exactly one worker, so each retry is promoted once
+            if self.client.zrem(self.DELAYED_KEY, payload):
+                self.client.lpush(self.QUEUE_KEY, payload)
+
+    def pop(self, timeout):
+        """
+        Return the next due job, or None after ``timeout`` seconds.
+
+        The job stays on the processing list until it is acknowledged.
+        """
+        self._promote_due()
+        payload = self._pop(keys=self._keys, args=[time.time()])
+        if payload is None:
+            with self._doorbell:
+                self._doorbell.wait(timeout)
+            payload = self._pop(keys=self._keys, args=[time.time()])
+        if not payload:
+            return None
+        job = json.loads(payload)
+        job[RECEIPT_KEY] = payload.decode('utf-8') if isinstance(payload, bytes) else payload
+        return job
+
+    def ack(self, job):
+        """Remove a finished job from the processing list."""
+        pipe = self.client.pipeline()
+        pipe.lrem(self.PROCESSING_KEY, 1, job[RECEIPT_KEY])
+        pipe.zrem(self.LEASES_KEY, job[RECEIPT_KEY])
+        pipe.execute()
+
+    def recover(self, visibility_timeout):
+        """
+        Requeue jobs leased more than ``visibility_timeout`` seconds ago.
+
+        Returns:
+            int: Number of jobs returned to the ready list
+        """
+        return self._recover(keys=self._keys, args=[time.time() - visibility_timeout])
+
+    def set_status(self, job_id, status, ttl):
+        """Store the delivery status of a job."""
+        self.client.setex(f"{self.STATUS_PREFIX}{job_id}", ttl, json.dumps(status))
+
+    def get_status(self, job_id):
+        """Return the delivery status of a job, or None if unknown."""
+        raw = self.client.get(f"{self.STATUS_PREFIX}{job_id}")
+        return json.loads(raw) if raw else None
+
+
+class FailoverJobBackend:
+    """
+    Uses Redis through a ManagedRedis while it is healthy and an in-memory
+    backend otherwise; jobs queued in memory during an outage are drained
+    first once Redis is back.
+    """
+
+    def __init__(self, managed_redis, fallback):
+        self._redis = managed_redis
+        self._fallback = fallback
+        self._primary = None
+
+    def _backend(self, client):
+        if self._primary is None or self._primary.client is not client:
+            self._primary = RedisJobBackend(client)
+        return self._primary
+
+    def push(self, job, delay=0):
+        """Queue ``job`` to become available after ``delay`` seconds."""
+        self._redis.run(lambda client: self._backend(client).push(job, delay),
+                        lambda: self._fallback.push(job, delay))
+
+    def pop(self, timeout):
+        """Return the next due job, or None after ``timeout`` seconds."""
+        job = self._fallback.pop(0)
+        if job:
+            return job
+        return self._redis.run(lambda client: self._backend(client).pop(timeout),
+                               lambda: self._fallback.pop(timeout))
+
+    def ack(self, job):
+        """Acknowledge a finished job on the backend it came from."""
+        if RECEIPT_KEY in job:
+            # Unacknowledged if Redis is down now; recovery redelivers it later
+            self._redis.run(lambda client: self._backend(client).ack(job), lambda: None)
+
+    def recover(self, visibility_timeout):
+        """Requeue jobs abandoned on the Redis processing list."""
+        return self._redis.run(lambda client: self._backend(client).recover(visibility_timeout),
+                               lambda: 0)
+
+    def set_status(self, job_id, status, ttl):
+        """Store the delivery status of a job."""
+        self._redis.run(lambda client: self._backend(client).set_status(job_id, status, ttl),
+                        lambda: self._fallback.set_status(job_id, status, ttl))
+
+    def get_status(self, job_id):
+        """Return the delivery status of a job, or None if unknown."""
+        status = self._redis.run(lambda client: self._backend(client).get_status(job_id),
+                                 lambda: None)
+        return status or self._fallback.get_status(job_id)
+
+
+class NotificationQueue:
+    """
+    Worker pool delivering notifications through per-channel sender functions.
+
+    Args:
+        senders (dict): Channel name -> callable(recipient, code) returning
+            True on successful delivery
+        backend: MemoryJobBackend, RedisJobBackend or FailoverJobBackend
+        workers (int): Number of worker threads
+        max_attempts (int): Deliveries tried before a job is marked failed
+        backoff_base (float): Delay in seconds before the first retry;
+            doubled for each further retry
+        backoff_max (float): Upper bound on the retry delay
+        status_ttl (int): Seconds a delivery status stays pollable
+        visibility_timeout (int): Seconds after which an unacknowledged job
+            is presumed abandoned and requeued on startup
+    """
+
+    def __init__(self, senders, backend, workers=2, max_attempts=4,
+                 backoff_base=2.0, backoff_max=60.0, status_ttl=3600,
+                 visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        self._senders = senders
+        self._backend = backend
+        self._worker_count = workers
+        self._max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._status_ttl = status_ttl
+        self._visibility_timeout = visibility_timeout
+        self._threads = []
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads if they are not already running."""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._recover()
+            for index in range(self._worker_count):
+                thread = threading.Thread(target=self._run, name=f"notify-worker-{index}",
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        """Signal the workers to exit and wait for them."""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, channel, recipient, code):
+        """
+        Queue a verification code for delivery.
+
+        Args:
+            channel (str): 'email' or 'sms'
+            recipient (str): Email address or phone number
+            code (str): Verification code to deliver
+
+        Returns:
+            str: Job ID for status polling
+        """
+        if channel not in self._senders:
+            raise ValueError(f"Unknown notification channel: {channel}")
+
+        self.start()
+        job = {'id': uuid.uuid4().hex, 'channel': channel, 'recipient': recipient,
+               'code': code, 'attempts': 0}
+        self._update_status(job, STATUS_QUEUED)
+        self._backend.push(job)
+        return job['id']
+
+    def status(self, job_id):
+        """
+        Return the delivery status of a job.
+
+        Returns:
+            dict: Status, channel, attempts and last error, or None if unknown
+        """
+        return self._backend.get_status(job_id)
+
+    def _recover(self):
+        try:
+            recovered = self._backend.recover(self._visibility_timeout)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to requeue abandoned notifications: %s", e)
+            return
+        if recovered:
+            logger.warning("⚠️ Requeued %d notifications abandoned by a stopped worker",
+                           recovered)
+
+    def _update_status(self, job, state, error=None):
+        self._backend.set_status(job['id'], {
+            'id': job['id'],
+            'channel': job['channel'],
+            'status': state,
+            'attempts': job['attempts'],
+            'lastError': error,
+            'updatedAt': time.time()
+        }, self._status_ttl)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._backend.pop(timeout=1)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Notification queue unavailable: %s", e)
+                self._stopping.wait(1)
+                continue
+            if job:
+                self._deliver(job)
+
+    def _deliver(self, job):
+        job['attempts'] += 1
+        error = None
+        try:
+            self._update_status(job, STATUS_SENDING)
+            delivered = self._senders[job['channel']](job['recipient'], job['code'])
+            if not delivered:
+                error = "Delivery rejected"
+        except Exception as e:  # pylint: disable=broad-except
+            delivered = False
+            error = str(e)
+
+        retry = not delivered and job['attempts'] < self._max_attempts
+        try:
+            if delivered:
+                self._update_status(job, STATUS_SENT)
+            elif retry:
+                delay = min(self._backoff_base * 2 ** (job['attempts'] - 1), self._backoff_max)
+                logger.warning("Notification %s failed (attempt %d), retrying in %.1fs: %s",
+                               job['id'], job['attempts'], delay, error)
+                self._update_status(job, STATUS_RETRYING, error)
+                self._backend.push(job, delay)
+            else:
+                logger.error("Notification %s failed after %d attempts: %s",
+                             job['id'], job['attempts'], error)
+                self._update_status(job, STATUS_FAILED, error)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to record notification %s: %s", job['id'], e)
+            if retry:
+                # Not rescheduled; leave it unacknowledged so recovery requeues it
+                return
+
+        try:
+            self._backend.ack(job)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to acknowledge notification %s: %s", job['id'], e)
+
+
+class AsyncNotificationDispatcher:
+    """
+    Event-loop counterpart of NotificationQueue.
+
+    Each notification is delivered by its own task with the same retry and
+    backoff policy; a semaphore bounds how many sends are in flight. Jobs
+    live only in this process, so pending deliveries are lost on restart.
+
+    Args:
+        senders (dict): Channel name -> coroutine function(recipient, code)
+            returning True on successful delivery
+        backend: Status store, e.g. MemoryJobBackend or FailoverJobBackend
+        max_attempts (int): Deliveries tried before a job is marked failed
+        backoff_base (float): Delay in seconds before the first retry;
+            doubled for each further retry
+        backoff_max (float): Upper bound on the retry delay
+        status_ttl (int): Seconds a delivery status stays pollable
+        max_in_flight (int): Concurrent sends allowed
+    """
+
+    def __init__(self, senders, backend, max_attempts=4, backoff_base=2.0,
+                 backoff_max=60.0, status_ttl=3600, max_in_flight=100):
+        self._senders = senders
+        self._backend = backend
+        self._max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._status_ttl = status_ttl
+        self._max_in_flight = max_in_flight
+        self._semaphore = None
+        self._tasks = set()
+
+    def enqueue(self, channel, recipient, code):
+        """
+        Schedule a verification code for delivery on the running loop.
+
+        Returns:
+            str: Job ID for status polling
+        """
+        if channel not in self._senders:
+            raise ValueError(f"Unknown notification channel: {channel}")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_in_flight)
+
+        job = {'id': uuid.uuid4().hex, 'channel': channel, 'recipient': recipient,
+               'code': code, 'attempts': 0}
+        self._update_status(job, STATUS_QUEUED)
+        task = asyncio.get_running_loop().create_task(self._deliver(job))
+        # Keep a reference until the task finishes so it is not collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job['id']
+
+    def status(self, job_id):
+        """Return the delivery status of a job, or None if unknown."""
+        return self._backend.get_status(job_id)
+
+    @property
+    def in_flight(self):
+        """Number of notifications not yet delivered or failed."""
+        return len(self._tasks)
+
+    async def aclose(self, timeout=5):
+        """Wait up to ``timeout`` seconds for pending deliveries, then cancel them."""
+        if not self._tasks:
+            return
+        _done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    def _update_status(self, job, state, error=None):
+        try:
+            self._backend.set_status(job['id'], {
+                'id': job['id'],
+                'channel': job['channel'],
+                'status': state,
+                'attempts': job['attempts'],
+                'lastError': error,
+                'updatedAt': time.time()
+            }, self._status_ttl)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to record notification %s: %s", job['id'], e)
+
+    async def _deliver(self, job):
+        while True:
+            job['attempts'] += 1
+            error = None
+            async with self._semaphore:
+                self._update_status(job, STATUS_SENDING)
+                try:
+                    delivered = await self._senders[job['channel']](job['recipient'], job['code'])
+                    if not delivered:
+                        error = "Delivery rejected"
+                except Exception as e:  # pylint: disable=broad-except
+                    delivered = False
+                    error = str(e)
+
+            if delivered:
+                self._update_status(job, STATUS_SENT)
+                return
+            if job['attempts'] >= self._max_attempts:
+                logger.error("Notification %s failed after %d attempts: %s",
+                             job['id'], job['attempts'], error)
+                self._update_status(job, STATUS_FAILED, error)
+                return
+
+            delay = min(self._backoff_base * 2 ** (job['attempts'] - 1), self._backoff_max)
+            logger.warning("Notification %s failed (attempt %d), retrying in %.1fs: %s",
+                           job['id'], job['attempts'], delay, error)
+            self._update_status(job, STATUS_RETRYING, error)
+            await asyncio.sleep(delay)
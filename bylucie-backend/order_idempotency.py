@@ -0,0 +1,147 @@
+"""
+Idempotency records for order submission.
+
+Clients retry order POSTs on flaky networks. Each submission claims a
+record keyed by its ``Idempotency-Key`` header (or its order number)
+before any stock is reserved. A retry then finds the record and gets one
+of two answers: the stored response if the first attempt succeeded, or
+"still processing" if it has not finished yet. Claiming is atomic: a Lua
+script on Redis and a lock-protected update in memory.
+
+Records are kept in Redis while it is healthy and in a per-process TTL
+cache otherwise. The unique order number in the database remains the
+authority for retries that outlive their record.
+"""
+
+import hashlib
+import json
+
+PENDING = 'pending'
+COMPLETE = 'complete'
+
+_CLAIM_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if raw then
+    return raw
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return false
+"""
+
+
+def request_fingerprint(data):
+    """Digest of a request body, used to detect a key reused for another request."""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def pending_record(fingerprint):
+    """Record of a request that is being processed."""
+    return {'state': PENDING, 'fingerprint': fingerprint}
+
+
+def complete_record(fingerprint, status, body):
+    """Record of a finished request and the response to replay."""
+    return {'state': COMPLETE, 'fingerprint': fingerprint, 'status': status, 'body': body}
+
+
+class RedisIdempotencyStore:
+    """Idempotency records stored as JSON strings in Redis."""
+
+    PREFIX = 'idempotency:'
+
+    def __init__(self, client):
+        self.client = client
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+
+    def claim(self, key, fingerprint, ttl):
+        """
+        Claim ``key`` for a new request.
+
+        Returns:
+            dict: The existing record, or None if the caller now owns the key
+        """
+        raw = self._claim(keys=[f"{self.PREFIX}{key}"],
+                          args=[json.dumps(pending_record(fingerprint)), ttl])
+        return json.loads(raw) if raw else None
+
+    def complete(self, key, record, ttl):
+        """Store the finished ``record`` under ``key``."""
+        self.client.setex(f"{self.PREFIX}{key}", ttl, json.dumps(record))
+
+    def release(self, key):
+        """Drop the claim on ``key`` so the request can be retried."""
+        self.client.delete(f"{self.PREFIX}{key}")
+
+
+class MemoryIdempotencyStore:
+    """
+    Idempotency records kept in a process-local TTL cache.
+
+    Args:
+        cache (TTLCache): Cache used for storage; its per-key lock makes
+            each claim atomic
+    """
+
+    PREFIX = 'idempotency:'
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def claim(self, key, fingerprint, ttl):
+        """
+        Claim ``key`` for a new request.
+
+        Returns:
+            dict: The existing record, or None if the caller now owns the key
+        """
+        cache_key = f"{self.PREFIX}{key}"
+        with self._cache.lock(cache_key):
+            record = self._cache.get(cache_key)
+            if record is None:
+                self._cache.set(cache_key, pending_record(fingerprint), ttl)
+            return record
+
+    def complete(self, key, record, ttl):
+        """Store the finished ``record`` under ``key``."""
+        self._cache.set(f"{self.PREFIX}{key}", record, ttl)
+
+    def release(self, key):
+        """Drop the claim on ``key`` so the request can be retried."""
+        self._cache.pop(f"{self.PREFIX}{key}")
+
+
+class FailoverIdempotencyStore:
+    """
+    Uses Redis through a ManagedRedis while it is healthy and falls back to
+    another store (normally memory) when Redis is unavailable.
+
+    Records written on one side are not visible on the other; retries
+    caught by a failover are answered from the order table instead.
+    """
+
+    def __init__(self, managed_redis, fallback):
+        self._redis = managed_redis
+        self._fallback = fallback
+        self._primary = None
+
+    def _store(self, client):
+        if self._primary is None or self._primary.client is not client:
+            self._primary = RedisIdempotencyStore(client)
+        return self._primary
+
+    def _run(self, method, *args):
+        return self._redis.run(lambda client: getattr(self._store(client), method)(*args),
+                               lambda: getattr(self._fallback, method)(*args))
+
+    def claim(self, key, fingerprint, ttl):
+        """Claim ``key``; returns the existing record, or None if claimed."""
+        return self._run('claim', key, fingerprint, ttl)
+
+    def complete(self, key, record, ttl):
+        """Store the finished ``record`` under ``key``."""
+        self._run('complete', key, record, ttl)
+
+    def release(self, key):
+        """Drop the claim on ``key``."""
+        self._run('release', key)
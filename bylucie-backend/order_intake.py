@@ -0,0 +1,593 @@
+"""
+Write-behind order intake for sale peaks.
+
+In queued mode the order endpoints do not write the order themselves.
+They hold the order's stock in the stock snapshot (one atomic Redis script
+or an in-memory update) and append the order to a local journal, fsynced
+before the client gets ``202 Accepted``. A committer thread per process
+then writes queued orders in batched transactions. For each order it
+reserves stock with the usual conditional UPDATEs, so the database still
+never oversells. Clients poll the order's status by intake ID.
+
+Each process journals to its own file and holds an exclusive ``flock`` on
+it while alive. A file whose lock can be taken therefore belongs to a dead
+process. Committers adopt such files and write their unfinished orders, so
+an accepted order survives a crash as long as the journal directory does.
+"""
+
+import glob
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+
+import sqlalchemy
+
+from order_writer import is_duplicate_order_number
+from stock_reservation import InsufficientStockError, aggregate_quantities
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals work, but crashed ones are not adopted
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_COMMITTED = 'committed'
+STATUS_FAILED = 'failed'
+
+# Errors that reject one order rather than the whole batch. StatementError
+# covers values the driver cannot bind; transient errors are checked first.
+ORDER_ERRORS = (InsufficientStockError, sqlalchemy.exc.IntegrityError,
+                sqlalchemy.exc.DataError, sqlalchemy.exc.StatementError,
+                ValueError, KeyError, TypeError)
+
+# Where an entry's holds live; holds in a dead process's memory are gone
+HELD_IN_REDIS = 'redis'
+HELD_IN_MEMORY = 'memory'
+
+ORDER_TEXT_COLUMNS = ('order_number', 'customer_email', 'customer_phone', 'customer_name')
+
+
+def is_transient(error):
+    """True for database errors that may pass on retry (lost connection, locks, pool)."""
+    if isinstance(error, (sqlalchemy.exc.OperationalError, sqlalchemy.exc.TimeoutError,
+                          sqlalchemy.exc.DisconnectionError)):
+        return True
+    return isinstance(error, sqlalchemy.exc.DBAPIError) and error.connection_invalidated
+
+
+def normalize_order(order_values, items):
+    """
+    Check a queued order's values and coerce them to their column types.
+
+    A direct order fails inside its request when a value does not fit; a
+    queued one is written later by the committer, so it is checked up front.
+
+    Args:
+        order_values (dict): Column values for the order row
+        items (list): Order items from the request body
+
+    Returns:
+        tuple: (order_values, items) with numeric fields coerced
+
+    Raises:
+        ValueError, TypeError, KeyError: If a value is missing or malformed
+    """
+    for column in ORDER_TEXT_COLUMNS:
+        if not isinstance(order_values.get(column), str):
+            raise TypeError(f"{column} must be a string")
+    if not isinstance(items, list) or not items:
+        raise ValueError("Order must have at least one item")
+
+    order_values = dict(order_values, total_amount=float(order_values['total_amount']))
+    normalized = []
+    for item in items:
+        if not isinstance(item['name'], str):
+            raise TypeError("Item name must be a string")
+        for field in ('size', 'color'):
+            if item.get(field) is not None and not isinstance(item[field], str):
+                raise TypeError(f"Item {field} must be a string")
+        normalized.append(dict(item, id=int(item['id']), quantity=int(item['quantity']),
+                               price=float(item['price'])))
+    return order_values, normalized
+
+
+class OrderJournal:
+    """
+    Append-only journal of accepted orders, one JSON record per line.
+
+    Records are ``{"order": entry}`` when an order is accepted and
+    ``{"done": intake_id}`` once it was committed or rejected. Appends from
+    concurrent requests share fsyncs: a writer whose record was covered by
+    another thread's fsync returns without its own.
+
+    Args:
+        directory (str): Directory shared by every process's journal
+        fsync (bool): fsync after each record; without it a power loss
+            (not a process crash) can drop the latest orders
+        max_bytes (int): Size at which a journal with no unfinished orders
+            is truncated
+    """
+
+    def __init__(self, directory, fsync=True, max_bytes=16 * 1024 * 1024):
+        self.directory = directory
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+        self._file = None
+        self._pid = None
+
+    def _open(self):
+        if self._file is not None and self._pid == os.getpid():
+            return self._file
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"orders-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl"
+        self._file = open(os.path.join(self.directory, name), 'a+', encoding='utf-8')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._pid = os.getpid()
+        return self._file
+
+    def _write(self, records):
+        with self._lock:
+            journal = self._open()
+            journal.write(''.join(json.dumps(record) + '\n' for record in records))
+            journal.flush()
+            self._written += 1
+            ticket = self._written
+        if self.fsync:
+            with self._sync_lock:
+                if self._synced < ticket:
+                    covered = self._written
+                    os.fsync(journal.fileno())
+                    self._synced = covered
+
+    def append(self, entry):
+        """Durably record an accepted order."""
+        self._write([{'order': entry}])
+
+    def mark_done(self, intake_ids):
+        """Record that orders no longer need committing."""
+        if intake_ids:
+            self._write([{'done': intake_id} for intake_id in intake_ids])
+
+    def compact(self):
+        """Truncate the journal; only call when no order is unfinished."""
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid() \
+                    and self._file.tell() > self.max_bytes:
+                self._file.truncate(0)
+                self._file.seek(0)
+
+    def adopt_orphans(self):
+        """
+        Take over the unfinished orders of journals left by dead processes.
+
+        Orders are copied into this process's journal before the orphan is
+        deleted, so a crash part-way through loses nothing.
+
+        Returns:
+            list: Unfinished order entries
+        """
+        if fcntl is None:
+            return []
+        own = self._open().name
+        adopted = []
+        for path in glob.glob(os.path.join(self.directory, 'orders-*.jsonl')):
+            if path == own:
+                continue
+            try:
+                orphan = open(path, 'r', encoding='utf-8')
+            except OSError:
+                continue  # Adopted by another process meanwhile
+            with orphan:
+                try:
+                    fcntl.flock(orphan, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # Owner is alive
+                try:
+                    if os.fstat(orphan.fileno()).st_ino != os.stat(path).st_ino:
+                        continue  # Adopted and replaced while we waited
+                except FileNotFoundError:
+                    continue  # Adopted and deleted by another process
+                entries = read_unfinished(orphan)
+                if entries:
+                    self._write([{'order': entry} for entry in entries])
+                os.unlink(path)
+            if entries:
+                logger.warning("⚠️ Adopted %d queued orders from %s", len(entries), path)
+            adopted.extend(entries)
+        return adopted
+
+
+def read_unfinished(journal):
+    """Return the entries of a journal file that were never marked done."""
+    entries = {}
+    for line in journal:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue  # Torn final line of a crashed write
+        if 'order' in record:
+            entries[record['order']['id']] = record['order']
+        elif 'done' in record:
+            entries.pop(record['done'], None)
+    for entry in entries.values():
+        # JSON object keys are strings
+        entry['held'] = {int(pid): quantity for pid, quantity in entry['held'].items()}
+    return list(entries.values())
+
+
+def adopted(entry):
+    """
+    Prepare an entry taken over from a dead process's journal.
+
+    Holds that process kept in its own memory died with it, so there is
+    nothing to apply or release for them here.
+    """
+    if entry.get('heldIn') != HELD_IN_REDIS:
+        entry['held'] = {}
+    return entry
+
+
+class RedisIntakeStatus:
+    """Order statuses stored as JSON strings in Redis."""
+
+    PREFIX = 'intake:status:'
+
+    def __init__(self, client):
+        self.client = client
+
+    def set(self, intake_id, status, ttl):
+        """Store the status of an order."""
+        self.client.setex(f"{self.PREFIX}{intake_id}", ttl, json.dumps(status))
+
+    def get(self, intake_id):
+        """Return the status of an order, or None if unknown."""
+        raw = self.client.get(f"{self.PREFIX}{intake_id}")
+        return json.loads(raw) if raw else None
+
+
+class MemoryIntakeStatus:
+    """
+    Order statuses kept in a process-local TTL cache.
+
+    Args:
+        cache (TTLCache): Cache used for storage
+    """
+
+    PREFIX = 'intake:status:'
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def set(self, intake_id, status, ttl):
+        """Store the status of an order."""
+        self._cache.set(f"{self.PREFIX}{intake_id}", status, ttl)
+
+    def get(self, intake_id):
+        """Return the status of an order, or None if unknown."""
+        return self._cache.get(f"{self.PREFIX}{intake_id}")
+
+
+class FailoverIntakeStatus:
+    """
+    Uses Redis through a ManagedRedis while it is healthy and falls back to
+    another store (normally memory) when Redis is unavailable.
+    """
+
+    def __init__(self, managed_redis, fallback):
+        self._redis = managed_redis
+        self._fallback = fallback
+        self._primary = None
+
+    def _store(self, client):
+        if self._primary is None or self._primary.client is not client:
+            self._primary = RedisIntakeStatus(client)
+        return self._primary
+
+    def set(self, intake_id, status, ttl):
+        """Store the status of an order."""
+        self._redis.run(lambda client: self._store(client).set(intake_id, status, ttl),
+                        lambda: self._fallback.set(intake_id, status, ttl))
+
+    def get(self, intake_id):
+        """Return the status of an order, or None if unknown."""
+        status = self._redis.run(lambda client: self._store(client).get(intake_id),
+                                 lambda: None)
+        return status or self._fallback.get(intake_id)
+
+
+class OrderIntake:
+    """
+    Accepts orders for later writing and commits them in batches.
+
+    Args:
+        snapshot (StockSnapshot): Holds stock for accepted orders
+        journal (OrderJournal): Durable record of accepted orders
+        statuses: FailoverIntakeStatus or another status store
+        place_order (callable): ``place_order(session, entry)`` writes one
+            order inside the batch transaction and returns its ID; it must
+            stage the reservation and ``entry['held']`` on the snapshot
+        session (callable): Returns the SQLAlchemy session of the current
+            app context
+        on_committed (callable): Called as ``on_committed(entry, order_id)``
+            after an order is committed
+        find_order (callable): ``find_order(session, entry)`` returns the ID
+            of an order already written for ``entry`` (same order number and
+            customer), or None; lets a replayed entry settle as committed
+        batch_size (int): Orders per transaction
+        batch_window (float): Seconds to wait for a batch to fill up
+        retry_delay (float): Seconds before retrying a batch after a
+            database error
+        status_ttl (int): Seconds an order status stays pollable
+        adopt_interval (float): Seconds between scans for orphaned journals
+    """
+
+    def __init__(self, snapshot, journal, statuses, place_order, session, on_committed=None,
+                 find_order=None, batch_size=50, batch_window=0.05, retry_delay=1.0,
+                 status_ttl=86400, adopt_interval=30.0):
+        self._snapshot = snapshot
+        self._journal = journal
+        self._statuses = statuses
+        self._place_order = place_order
+        self._session = session
+        self._on_committed = on_committed
+        self._find_order = find_order
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.retry_delay = retry_delay
+        self.status_ttl = status_ttl
+        self.adopt_interval = adopt_interval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._app = None
+        self._committer = None
+        self._committer_pid = None
+        self._outstanding = 0
+
+    @property
+    def backlog(self):
+        """Orders accepted by this process and not yet committed or rejected."""
+        return self._outstanding
+
+    def submit(self, app, order_values, items):
+        """
+        Hold stock for an order and queue it for writing.
+
+        Args:
+            app (Flask): Application the committer writes through
+            order_values (dict): Column values for the order row
+            items (list): Order items from the request body
+
+        Returns:
+            str: Intake ID for status polling
+
+        Raises:
+            InsufficientStockError: If a product lacks unheld stock
+            ValueError, TypeError, KeyError: If the order is malformed
+        """
+        order_values, items = normalize_order(order_values, items)
+        quantities = aggregate_quantities(items)
+        held, shared = self._snapshot.hold(quantities)
+        entry = {'id': uuid.uuid4().hex, 'order': order_values, 'items': items,
+                 'held': held, 'heldIn': HELD_IN_REDIS if shared else HELD_IN_MEMORY,
+                 'acceptedAt': time.time()}
+        # Counted before it is journaled, so the journal is never compacted
+        # between the append and the enqueue
+        with self._lock:
+            self._outstanding += 1
+        try:
+            self._journal.append(entry)
+        except Exception:
+            with self._lock:
+                self._outstanding -= 1
+            self._snapshot.release(held)
+            raise
+        self._set_status(entry, STATUS_QUEUED)
+        self._start(app)
+        self._queue.put(entry)
+        return entry['id']
+
+    def status(self, intake_id):
+        """
+        Return the status of an order.
+
+        Returns:
+            dict: Status, order number, order ID once committed and error if
+            rejected, or None if unknown
+        """
+        return self._statuses.get(intake_id)
+
+    def _set_status(self, entry, state, order_id=None, error=None):
+        try:
+            self._statuses.set(entry['id'], {
+                'intakeId': entry['id'],
+                'status': state,
+                'orderNumber': entry['order'].get('order_number'),
+                'orderId': order_id,
+                'error': error,
+                'updatedAt': time.time()
+            }, self.status_ttl)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to record status of queued order %s: %s", entry['id'], e)
+
+    def _enqueue(self, entries):
+        with self._lock:
+            self._outstanding += len(entries)
+        for entry in entries:
+            self._queue.put(entry)
+
+    def _start(self, app):
+        with self._lock:
+            # Threads do not survive fork; each worker starts its own
+            if self._committer is not None and self._committer_pid == os.getpid():
+                return
+            self._app = app
+            self._committer_pid = os.getpid()
+            self._committer = threading.Thread(target=self._run, name='order-committer',
+                                               daemon=True)
+            self._committer.start()
+
+    def _run(self):
+        next_adoption = 0.0
+        while True:
+            if time.monotonic() >= next_adoption:
+                next_adoption = time.monotonic() + self.adopt_interval
+                try:
+                    self._enqueue([adopted(entry) for entry in self._journal.adopt_orphans()])
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.error("Failed to adopt orphaned order journals: %s", e)
+
+            batch = self._next_batch()
+            if not batch:
+                continue
+            size = len(batch)
+            while True:
+                try:
+                    self._commit(batch)
+                    break
+                except Exception as e:  # pylint: disable=broad-except
+                    # Only transient errors get here; orders stay journaled
+                    # and queued, so retry the same batch
+                    logger.error("Failed to write %d queued orders, retrying: %s", len(batch), e)
+                    time.sleep(self.retry_delay)
+
+            self._finish_batch(size)
+
+    def _finish_batch(self, size):
+        """Count ``size`` orders as settled and compact the journal if none are left."""
+        with self._lock:
+            self._outstanding -= size
+            # Compact under the lock: submit() counts an order before journaling it
+            if self._outstanding == 0:
+                self._journal.compact()
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=1.0)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        """
+        Write ``batch`` in as few transactions as possible.
+
+        An order that fails on its own (no stock, duplicate order number,
+        bad data) is rejected, removed from ``batch`` and the transaction is
+        retried without it. If the commit itself fails with an error that is
+        not transient, the orders are written one per transaction so the one
+        at fault is rejected. Transient errors propagate with ``batch``
+        holding the orders still to write.
+        """
+        with self._app.app_context():
+            session = self._session()
+            one_by_one = False
+            while batch:
+                chunk = batch[:1] if one_by_one else list(batch)
+                placed = []
+                rejected = None
+                try:
+                    for entry in chunk:
+                        try:
+                            placed.append((entry, self._place_order(session, entry)))
+                        except ORDER_ERRORS as e:
+                            if is_transient(e):
+                                raise
+                            rejected = (entry, e)
+                            break
+                    if rejected is None:
+                        session.commit()
+                except Exception as e:
+                    session.rollback()
+                    if is_transient(e):
+                        raise
+                    if len(chunk) > 1:
+                        logger.warning("Batch of %d queued orders failed, writing them "
+                                       "one by one: %s", len(chunk), e)
+                        one_by_one = True
+                        continue
+                    rejected = (chunk[0], e)
+
+                if rejected is not None:
+                    session.rollback()
+                    entry, error = rejected
+                    batch.remove(entry)
+                    order_id = None
+                    if isinstance(error, sqlalchemy.exc.IntegrityError) \
+                            and is_duplicate_order_number(error) \
+                            and self._find_order is not None:
+                        order_id = self._find_order(session, entry)
+                    if order_id is not None:
+                        self._settle_written(entry, order_id)
+                    else:
+                        self._reject(entry, error)
+                    continue
+
+                try:
+                    self._journal.mark_done([entry['id'] for entry, _order_id in placed])
+                except Exception as e:  # pylint: disable=broad-except
+                    # Committed either way; adoption after a crash rejects them as duplicates
+                    logger.error("Failed to journal %d committed orders: %s", len(placed), e)
+                for entry, order_id in placed:
+                    self._set_status(entry, STATUS_COMMITTED, order_id=order_id)
+                    if self._on_committed is not None:
+                        try:
+                            self._on_committed(entry, order_id)
+                        except Exception as e:  # pylint: disable=broad-except
+                            logger.error("Post-commit hook failed for order %s: %s", order_id, e)
+                for entry, _order_id in placed:
+                    batch.remove(entry)
+
+    def _settle_written(self, entry, order_id):
+        """
+        Settle an entry whose order was already written, e.g. a journal
+        replayed after the order committed. Its holds were released by that
+        commit, so they are not released again.
+        """
+        logger.warning("Queued order %s was already written as order %s", entry['id'], order_id)
+        self._set_status(entry, STATUS_COMMITTED, order_id=order_id)
+        try:
+            self._journal.mark_done([entry['id']])
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to journal settled order %s: %s", entry['id'], e)
+
+    def _reject(self, entry, error):
+        status = self._statuses.get(entry['id'])
+        if status and status.get('status') == STATUS_COMMITTED:
+            # Replayed after it committed; keep the status and the holds released
+            self._settle_written(entry, status.get('orderId'))
+            return
+        if isinstance(error, InsufficientStockError):
+            message = f"Insufficient stock for product {error.product_id}"
+        elif isinstance(error, sqlalchemy.exc.IntegrityError) \
+                and is_duplicate_order_number(error):
+            message = "Order number already exists"
+        else:
+            message = f"Invalid data provided: {error}"
+        logger.warning("Queued order %s rejected: %s", entry['id'], message)
+        self._set_status(entry, STATUS_FAILED, error=message)
+        try:
+            self._snapshot.release(entry['held'])
+            self._journal.mark_done([entry['id']])
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to clean up rejected order %s: %s", entry['id'], e)
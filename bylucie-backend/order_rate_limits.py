@@ -0,0 +1,279 @@
+"""
+Sliding-window counters of recent orders per customer email and phone.
+
+Orders are recorded as they are created, so the guest limit check is a
+counter read instead of a ``COUNT(*)`` over the order table. Counters are
+Redis sorted sets (member = order ID, score = timestamp) with an in-memory
+equivalent used while Redis is unavailable. A key seen for the first time
+is seeded from the database, and because members are order IDs seeding and
+recording are idempotent with respect to each other. Orders are recorded
+in both tiers, and a key whose Redis write failed is re-seeded from the
+database on its next Redis read, so the tiers do not drift apart across an
+outage. The async API uses the awaitable variants at the end of this module.
+"""
+
+import time
+
+WINDOW_SECONDS = 24 * 3600
+
+
+class RedisOrderCounter:
+    """Counters stored as Redis sorted sets."""
+
+    PREFIX = 'order_count:'
+    SEEDED_PREFIX = 'order_count_seeded:'
+
+    def __init__(self, client, window=WINDOW_SECONDS):
+        self.client = client
+        self.window = window
+
+    def is_seeded(self, key):
+        """Return True if ``key`` was seeded from the database."""
+        return bool(self.client.exists(f"{self.SEEDED_PREFIX}{key}"))
+
+    def seed(self, key, orders):
+        """Load ``orders`` ((order_id, timestamp) pairs) and mark ``key`` seeded."""
+        pipe = self.client.pipeline()
+        if orders:
+            pipe.zadd(f"{self.PREFIX}{key}", {str(order_id): ts for order_id, ts in orders})
+            pipe.expire(f"{self.PREFIX}{key}", self.window)
+        pipe.setex(f"{self.SEEDED_PREFIX}{key}", self.window, 1)
+        pipe.execute()
+
+    def record(self, key, order_id, timestamp):
+        """Add an order to the window of ``key``."""
+        pipe = self.client.pipeline()
+        pipe.zadd(f"{self.PREFIX}{key}", {str(order_id): timestamp})
+        pipe.zremrangebyscore(f"{self.PREFIX}{key}", '-inf', timestamp - self.window)
+        pipe.expire(f"{self.PREFIX}{key}", self.window)
+        pipe.execute()
+
+    def count(self, key, now):
+        """Number of orders for ``key`` within the window ending at ``now``."""
+        return self.client.zcount(f"{self.PREFIX}{key}", now - self.window, '+inf')
+
+
+class MemoryOrderCounter:
+    """
+    Counters kept in a process-local TTL cache.
+
+    Args:
+        cache (TTLCache): Cache holding (seeded_at, {order_id: timestamp})
+            per key
+        refresh (int): Seconds before a key is re-seeded from the database,
+            which bounds drift when several processes take orders
+    """
+
+    PREFIX = 'order_count:'
+    UNSYNCED_PREFIX = 'order_count_unsynced:'
+
+    def __init__(self, cache, window=WINDOW_SECONDS, refresh=300):
+        self.cache = cache
+        self.window = window
+        self.refresh = min(refresh, window)
+
+    def is_seeded(self, key):
+        """Return True if ``key`` has a live window in the cache."""
+        return f"{self.PREFIX}{key}" in self.cache
+
+    def seed(self, key, orders):
+        """Load ``orders`` ((order_id, timestamp) pairs) into ``key``."""
+        cache_key = f"{self.PREFIX}{key}"
+        with self.cache.lock(cache_key):
+            _seeded_at, window = self.cache.get(cache_key) or (None, {})
+            window = dict(window)
+            window.update({str(order_id): ts for order_id, ts in orders})
+            self.cache.set(cache_key, (time.time(), window), self.refresh)
+
+    def record(self, key, order_id, timestamp):
+        """Add an order to the window of ``key`` if the key is tracked."""
+        cache_key = f"{self.PREFIX}{key}"
+        with self.cache.lock(cache_key):
+            current = self.cache.get(cache_key)
+            if current is None:
+                # Untracked keys are seeded from the database on first count
+                return
+            seeded_at, window = current
+            cutoff = timestamp - self.window
+            window = {member: ts for member, ts in window.items() if ts > cutoff}
+            window[str(order_id)] = timestamp
+            # Keep the original seeding deadline so the key is still refreshed
+            remaining = seeded_at + self.refresh - time.time()
+            if remaining > 0:
+                self.cache.set(cache_key, (seeded_at, window), remaining)
+
+    def count(self, key, now):
+        """Number of orders for ``key`` within the window ending at ``now``."""
+        cutoff = now - self.window
+        _seeded_at, window = self.cache.get(f"{self.PREFIX}{key}") or (None, {})
+        return sum(1 for ts in window.values() if ts >= cutoff)
+
+    def mark_unsynced(self, key):
+        """Remember that an order for ``key`` is missing from Redis."""
+        self.cache.set(f"{self.UNSYNCED_PREFIX}{key}", True, self.window)
+
+    def is_unsynced(self, key):
+        """Return True if ``key`` must be re-seeded before Redis is trusted."""
+        return f"{self.UNSYNCED_PREFIX}{key}" in self.cache
+
+    def mark_synced(self, key):
+        """Forget that ``key`` was missing an order in Redis."""
+        self.cache.pop(f"{self.UNSYNCED_PREFIX}{key}")
+
+
+class OrderRateCounter:
+    """
+    Counts recent orders per identity with Redis, memory and database tiers.
+
+    Args:
+        managed_redis (ManagedRedis): Redis connection with circuit breaker
+        memory (MemoryOrderCounter): Fallback while Redis is unavailable
+        load_orders (callable): (field, value, since_timestamp) -> list of
+            (order_id, timestamp) pairs from the database; used to seed
+            keys not yet tracked
+        window (int): Window length in seconds
+    """
+
+    def __init__(self, managed_redis, memory, load_orders, window=WINDOW_SECONDS):
+        self._redis = managed_redis
+        self._memory = memory
+        self._load_orders = load_orders
+        self._window = window
+        self._primary = None
+
+    def _counter(self, client):
+        if self._primary is None or self._primary.client is not client:
+            self._primary = RedisOrderCounter(client, self._window)
+        return self._primary
+
+    def _count(self, counter, field, value, now):
+        key = f"{field}:{value}"
+        if not counter.is_seeded(key):
+            counter.seed(key, self._load_orders(field, value, now - self._window))
+        return counter.count(key, now)
+
+    def _count_redis(self, counter, field, value, now):
+        key = f"{field}:{value}"
+        if self._memory.is_unsynced(key):
+            # An order was recorded while Redis was failing
+            counter.seed(key, self._load_orders(field, value, now - self._window))
+            self._memory.mark_synced(key)
+        return self._count(counter, field, value, now)
+
+    def count(self, field, value):
+        """
+        Number of orders placed with ``field`` ('email' or 'phone') equal to
+        ``value`` within the window.
+        """
+        now = time.time()
+        return self._redis.run(
+            lambda client: self._count_redis(self._counter(client), field, value, now),
+            lambda: self._count(self._memory, field, value, now)
+        )
+
+    def record(self, order_id, email=None, phone=None):
+        """Record a newly created order against its email and phone."""
+        now = time.time()
+        for field, value in (('email', email), ('phone', phone)):
+            if not value:
+                continue
+            key = f"{field}:{value}"
+            self._memory.record(key, order_id, now)
+            self._redis.run(
+                lambda client, key=key: self._counter(client).record(key, order_id, now),
+                lambda key=key: self._memory.mark_unsynced(key)
+            )
+
+
+class AsyncRedisOrderCounter(RedisOrderCounter):
+    """Awaitable RedisOrderCounter over a ``redis.asyncio`` client."""
+
+    async def is_seeded(self, key):
+        """Return True if ``key`` was seeded from the database."""
+        return bool(await self.client.exists(f"{self.SEEDED_PREFIX}{key}"))
+
+    async def seed(self, key, orders):
+        """Load ``orders`` ((order_id, timestamp) pairs) and mark ``key`` seeded."""
+        pipe = self.client.pipeline()
+        if orders:
+            pipe.zadd(f"{self.PREFIX}{key}", {str(order_id): ts for order_id, ts in orders})
+            pipe.expire(f"{self.PREFIX}{key}", self.window)
+        pipe.setex(f"{self.SEEDED_PREFIX}{key}", self.window, 1)
+        await pipe.execute()
+
+    async def record(self, key, order_id, timestamp):
+        """Add an order to the window of ``key``."""
+        pipe = self.client.pipeline()
+        pipe.zadd(f"{self.PREFIX}{key}", {str(order_id): timestamp})
+        pipe.zremrangebyscore(f"{self.PREFIX}{key}", '-inf', timestamp - self.window)
+        pipe.expire(f"{self.PREFIX}{key}", self.window)
+        await pipe.execute()
+
+    async def count(self, key, now):
+        """Number of orders for ``key`` within the window ending at ``now``."""
+        return await self.client.zcount(f"{self.PREFIX}{key}", now - self.window, '+inf')
+
+
+class AsyncOrderRateCounter:
+    """
+    Awaitable OrderRateCounter.
+
+    Args:
+        managed_redis (ManagedRedis): Redis connection with circuit breaker
+        memory (MemoryOrderCounter): Fallback while Redis is unavailable
+        load_orders (callable): Coroutine function (field, value,
+            since_timestamp) -> list of (order_id, timestamp) pairs
+        window (int): Window length in seconds
+    """
+
+    def __init__(self, managed_redis, memory, load_orders, window=WINDOW_SECONDS):
+        self._redis = managed_redis
+        self._memory = memory
+        self._load_orders = load_orders
+        self._window = window
+        self._primary = None
+
+    def _counter(self, client):
+        if self._primary is None or self._primary.client is not client:
+            self._primary = AsyncRedisOrderCounter(client, self._window)
+        return self._primary
+
+    async def _count_redis(self, counter, field, value, now):
+        key = f"{field}:{value}"
+        unsynced = self._memory.is_unsynced(key)
+        if unsynced or not await counter.is_seeded(key):
+            await counter.seed(key, await self._load_orders(field, value, now - self._window))
+        if unsynced:
+            self._memory.mark_synced(key)
+        return await counter.count(key, now)
+
+    async def count(self, field, value):
+        """
+        Number of orders placed with ``field`` ('email' or 'phone') equal to
+        ``value`` within the window.
+        """
+        now = time.time()
+        key = f"{field}:{value}"
+        count = await self._redis.run_async(
+            lambda client: self._count_redis(self._counter(client), field, value, now),
+            lambda: None
+        )
+        if count is not None:
+            return count
+
+        if not self._memory.is_seeded(key):
+            self._memory.seed(key, await self._load_orders(field, value, now - self._window))
+        return self._memory.count(key, now)
+
+    async def record(self, order_id, email=None, phone=None):
+        """Record a newly created order against its email and phone."""
+        now = time.time()
+        for field, value in (('email', email), ('phone', phone)):
+            if not value:
+                continue
+            key = f"{field}:{value}"
+            self._memory.record(key, order_id, now)
+            await self._redis.run_async(
+                lambda client, key=key: self._counter(client).record(key, order_id, now),
+                lambda key=key: self._memory.mark_unsynced(key)
+            )
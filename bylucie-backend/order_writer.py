@@ -0,0 +1,85 @@
+"""
+Bulk write path for orders and their line items.
+
+The order row is inserted with a single Core ``INSERT`` that returns its
+primary key, and every line item goes out in one executemany ``INSERT``,
+so an order costs the same number of round-trips regardless of its size.
+"""
+
+from sqlalchemy import insert
+
+# Length of the order.order_number column
+ORDER_NUMBER_MAX_LENGTH = 50
+
+
+def parse_order_number(value):
+    """
+    Validate a client-supplied order number.
+
+    Raises:
+        ValueError: If it is missing, not a string or too long
+    """
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("orderNumber is required")
+    if len(value) > ORDER_NUMBER_MAX_LENGTH:
+        raise ValueError(f"orderNumber must be at most {ORDER_NUMBER_MAX_LENGTH} characters")
+    return value
+
+
+def is_duplicate_order_number(error):
+    """True if an IntegrityError is the unique violation on order.order_number."""
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'order_number' in message and ('unique' in message or 'duplicate' in message)
+
+
+def order_item_rows(order_id, items):
+    """
+    Build order_item parameter rows from request items.
+
+    Args:
+        order_id (int): ID of the parent order
+        items (list): Order items from the request body
+
+    Returns:
+        list: Parameter dictionaries for an executemany insert
+    """
+    return [
+        {
+            'order_id': order_id,
+            'product_id': item_data['id'],
+            'product_name': item_data['name'],
+            'quantity': item_data['quantity'],
+            'price': item_data['price'],
+            'size': item_data.get('size'),
+            'color': item_data.get('color')
+        }
+        for item_data in items
+    ]
+
+
+def write_order(session, order_table, item_table, order_values, items):
+    """
+    Insert an order and all of its items inside the caller's transaction.
+
+    Args:
+        session: SQLAlchemy session holding the order transaction
+        order_table (sqlalchemy.Table): The order table
+        item_table (sqlalchemy.Table): The order_item table
+        order_values (dict): Column values for the order row
+        items (list): Order items from the request body
+
+    Returns:
+        int: ID of the new order
+    """
+    statement = insert(order_table)
+    if session.get_bind().dialect.insert_returning:
+        order_id = session.execute(
+            statement.returning(order_table.c.id), order_values).scalar_one()
+    else:
+        order_id = session.execute(statement, order_values).inserted_primary_key[0]
+
+    rows = order_item_rows(order_id, items)
+    if rows:
+        session.execute(insert(item_table), rows)
+
+    return order_id
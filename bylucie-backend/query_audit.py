@@ -0,0 +1,208 @@
+"""
+Query auditing for tests and staging.
+
+While a QueryRecorder is active, every SQL statement run in the current
+thread or task is recorded with its parameters, duration and the line of
+application code that triggered it. The resulting AuditReport flags:
+
+* repeated statements - the same SQL executed several times with
+  different parameters, the usual sign of an N+1 loop;
+* slow statements - anything above a configurable threshold.
+
+Enable per-request auditing with QUERY_AUDIT=true (problems are logged as
+warnings), or enforce budgets in tests with the ``query_budget`` fixture
+from ``tests/conftest.py``::
+
+    def test_guest_order(client, query_budget):
+        with query_budget(6):
+            client.post('/api/orders/guest', json=payload)
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+import traceback
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+QUERY_AUDIT = os.getenv('QUERY_AUDIT', 'false').lower() == 'true'
+QUERY_AUDIT_SLOW_MS = float(os.getenv('QUERY_AUDIT_SLOW_MS', '100'))
+QUERY_AUDIT_REPEAT_THRESHOLD = int(os.getenv('QUERY_AUDIT_REPEAT_THRESHOLD', '3'))
+
+_active = contextvars.ContextVar('query_recorders', default=())
+_install_lock = threading.Lock()
+_installed = False
+
+
+class QueryRecord:
+    """One executed statement."""
+
+    __slots__ = ('statement', 'parameters', 'executemany', 'seconds', 'location')
+
+    def __init__(self, statement, parameters, executemany, location):
+        self.statement = statement
+        self.parameters = parameters
+        self.executemany = executemany
+        self.seconds = 0.0
+        self.location = location
+
+
+def caller_location():
+    """Return 'file:line in function' of the innermost application frame."""
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(APP_DIR) and filename != os.path.abspath(__file__):
+            return f"{os.path.relpath(filename, APP_DIR)}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+def _install():
+    """Register the global engine listeners once."""
+    global _installed  # pylint: disable=global-statement
+    with _install_lock:
+        if _installed:
+            return
+
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def _before(conn, _cursor, statement, parameters, _context, executemany):
+            recorders = _active.get()
+            if not recorders:
+                return
+            record = QueryRecord(statement, parameters, executemany, caller_location())
+            for recorder in recorders:
+                recorder.queries.append(record)
+            conn.info.setdefault('audit_started', []).append((record, time.perf_counter()))
+
+        @event.listens_for(Engine, 'after_cursor_execute')
+        def _after(conn, _cursor, _statement, _parameters, _context, _executemany):
+            pending = conn.info.get('audit_started')
+            if pending:
+                record, started = pending.pop()
+                record.seconds = time.perf_counter() - started
+
+        @event.listens_for(Engine, 'handle_error')
+        def _failed(exception_context):
+            conn = exception_context.connection
+            if conn is not None and conn.info.get('audit_started'):
+                conn.info['audit_started'].pop()
+
+        _installed = True
+
+
+class AuditReport:
+    """
+    Analysis of recorded statements.
+
+    Attributes:
+        queries (list): Every QueryRecord, in execution order
+        repeated (list): (statement, executions, locations) for statements
+            run at least ``repeat_threshold`` times with different parameters
+        slow (list): QueryRecords slower than the threshold
+    """
+
+    def __init__(self, queries, slow_ms=QUERY_AUDIT_SLOW_MS,
+                 repeat_threshold=QUERY_AUDIT_REPEAT_THRESHOLD):
+        self.queries = list(queries)
+        self.slow = [query for query in self.queries if query.seconds * 1000 >= slow_ms]
+        self.slow_ms = slow_ms
+
+        groups = {}
+        for query in self.queries:
+            # executemany is already the batched form of a loop
+            if not query.executemany:
+                groups.setdefault(query.statement, []).append(query)
+        self.repeated = []
+        for statement, executions in groups.items():
+            distinct = {repr(query.parameters) for query in executions}
+            if len(executions) >= repeat_threshold and len(distinct) > 1:
+                locations = sorted({query.location for query in executions})
+                self.repeated.append((statement, len(executions), locations))
+
+    @property
+    def total_seconds(self):
+        """Combined time spent in SQL."""
+        return sum(query.seconds for query in self.queries)
+
+    @property
+    def has_problems(self):
+        """True if any N+1 pattern or slow statement was found."""
+        return bool(self.repeated or self.slow)
+
+    def format(self):
+        """Human-readable summary for logs and test failures."""
+        lines = [f"{len(self.queries)} statements, {self.total_seconds * 1000:.1f} ms in SQL"]
+        for statement, executions, locations in self.repeated:
+            lines.append(f"  N+1: {executions}x {_one_line(statement)}")
+            lines.extend(f"       at {location}" for location in locations)
+        for query in self.slow:
+            lines.append(f"  slow ({query.seconds * 1000:.1f} ms >= {self.slow_ms:g} ms): "
+                         f"{_one_line(query.statement)}")
+            lines.append(f"       at {query.location}")
+        return '\n'.join(lines)
+
+
+def _one_line(statement, limit=160):
+    text = ' '.join(statement.split())
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+class QueryRecorder:
+    """
+    Context manager recording statements run in the current context.
+
+    Recorders nest, and every active recorder receives the statements, so a
+    test budget still sees queries also audited per request.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._token = None
+
+    def __enter__(self):
+        _install()
+        self._token = _active.set(_active.get() + (self,))
+        return self
+
+    def __exit__(self, *_exc):
+        _active.reset(self._token)
+        self._token = None
+        return False
+
+    def report(self, slow_ms=QUERY_AUDIT_SLOW_MS, repeat_threshold=QUERY_AUDIT_REPEAT_THRESHOLD):
+        """Analyze the recorded statements."""
+        return AuditReport(self.queries, slow_ms, repeat_threshold)
+
+
+def init_app(app):
+    """Audit every request of a Flask app and log N+1 patterns and slow SQL."""
+    # pylint: disable=import-outside-toplevel
+    from flask import g, request
+
+    slow_ms = app.config.get('QUERY_AUDIT_SLOW_MS', QUERY_AUDIT_SLOW_MS)
+    repeat_threshold = app.config.get('QUERY_AUDIT_REPEAT_THRESHOLD',
+                                      QUERY_AUDIT_REPEAT_THRESHOLD)
+
+    @app.before_request
+    def _start_audit():
+        recorder = QueryRecorder()
+        recorder.__enter__()
+        g.query_recorder = recorder
+
+    @app.teardown_request
+    def _finish_audit(_error):
+        recorder = g.pop('query_recorder', None)
+        if recorder is None:
+            return
+        recorder.__exit__(None, None, None)
+        report = recorder.report(slow_ms, repeat_threshold)
+        if report.has_problems:
+            logger.warning("🐢 Query audit for %s %s: %s",
+                           request.method, request.path, report.format())
+
@@ -0,0 +1,328 @@
+"""
+Managed Redis connection with pooling and a circuit breaker.
+
+The client is built lazily on first use over an explicit ConnectionPool,
+so importing the app never blocks on Redis. Repeated failures open the
+circuit and callers fall back to in-memory storage until a probe after the
+recovery timeout finds Redis healthy again. An asyncio client for the
+async API shares the same settings and circuit.
+"""
+
+import logging
+import os
+import threading
+import time
+
+try:
+    import redis
+    import redis.asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+
+def _observe(client, commands, started):
+    """Report ``commands`` sent since ``started`` to the client's observer."""
+    if client.observer is not None:
+        client.observer(commands, time.perf_counter() - started)
+
+
+if REDIS_AVAILABLE:
+    class _ObservedRedis(redis.Redis):
+        """Redis client reporting every command (and pipeline) to ``observer``."""
+
+        observer = None
+
+        def execute_command(self, *args, **options):
+            started = time.perf_counter()
+            try:
+                return super().execute_command(*args, **options)
+            finally:
+                _observe(self, 1, started)
+
+        def pipeline(self, transaction=True, shard_hint=None):
+            pipe = super().pipeline(transaction, shard_hint)
+            execute = pipe.execute
+
+            def _execute(raise_on_error=True):
+                commands = len(pipe.command_stack)
+                started = time.perf_counter()
+                try:
+                    return execute(raise_on_error)
+                finally:
+                    _observe(self, commands, started)
+
+            pipe.execute = _execute
+            return pipe
+
+    class _ObservedAsyncRedis(redis.asyncio.Redis):
+        """asyncio counterpart of _ObservedRedis."""
+
+        observer = None
+
+        async def execute_command(self, *args, **options):
+            started = time.perf_counter()
+            try:
+                return await super().execute_command(*args, **options)
+            finally:
+                _observe(self, 1, started)
+
+        def pipeline(self, transaction=True, shard_hint=None):
+            pipe = super().pipeline(transaction, shard_hint)
+            execute = pipe.execute
+
+            async def _execute(raise_on_error=True):
+                commands = len(pipe.command_stack)
+                started = time.perf_counter()
+                try:
+                    return await execute(raise_on_error)
+                finally:
+                    _observe(self, commands, started)
+
+            pipe.execute = _execute
+            return pipe
+
+
+class ManagedRedis:
+    """
+    Lazily connected, pooled Redis client guarded by a circuit breaker.
+
+    Args:
+        host (str): Redis host
+        port (int): Redis port
+        db (int): Redis database number
+        max_connections (int): Pool size limit
+        socket_timeout (float): Read/write timeout in seconds
+        socket_connect_timeout (float): Connect timeout in seconds
+        health_check_interval (int): Seconds after which an idle pooled
+            connection is PINGed before reuse
+        failure_threshold (int): Consecutive failures that open the circuit
+        recovery_timeout (float): Seconds the circuit stays open before a
+            probe is allowed
+
+    Attributes:
+        observer (callable): Optional (commands, seconds) callback invoked
+            after every command or pipeline, e.g. for metrics
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, max_connections=20,
+                 socket_timeout=0.5, socket_connect_timeout=0.5,
+                 health_check_interval=30, failure_threshold=3, recovery_timeout=15):
+        self._pool_kwargs = {
+            'host': host,
+            'port': port,
+            'db': db,
+            'max_connections': max_connections,
+            'socket_timeout': socket_timeout,
+            'socket_connect_timeout': socket_connect_timeout,
+            'health_check_interval': health_check_interval,
+            'retry_on_timeout': False,
+            'decode_responses': True
+        }
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.observer = None
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self._client = None
+        self._pid = None
+        self._async_client = None
+        self._async_pid = None
+        self._state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @classmethod
+    def from_env(cls):
+        """Build a client from the REDIS_* environment variables."""
+        return cls(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', '6379')),
+            db=int(os.getenv('REDIS_DB', '0')),
+            max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', '20')),
+            socket_timeout=float(os.getenv('REDIS_SOCKET_TIMEOUT', '0.5')),
+            socket_connect_timeout=float(os.getenv('REDIS_CONNECT_TIMEOUT', '0.5')),
+            health_check_interval=int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', '30')),
+            failure_threshold=int(os.getenv('REDIS_FAILURE_THRESHOLD', '3')),
+            recovery_timeout=float(os.getenv('REDIS_RECOVERY_TIMEOUT', '15'))
+        )
+
+    @property
+    def state(self):
+        """Circuit state: 'closed', 'open' or 'half_open'."""
+        return self._state
+
+    def _build(self):
+        """Create the pool and client; caller holds the lock."""
+        self._pool = redis.ConnectionPool(**self._pool_kwargs)
+        self._client = _ObservedRedis(connection_pool=self._pool)
+        self._client.observer = self._notify
+        self._pid = os.getpid()
+
+    def _notify(self, commands, seconds):
+        if self.observer is not None:
+            self.observer(commands, seconds)
+
+    def _admit(self):
+        """Return True if a command may be sent now; caller holds the lock."""
+        if self._state == CIRCUIT_OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                return False
+            self._state = CIRCUIT_HALF_OPEN
+            self._probing = False
+
+        if self._state == CIRCUIT_HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def client(self):
+        """
+        Return the Redis client, or None while the circuit is open.
+
+        When the recovery timeout has elapsed a single caller gets the
+        client back to probe Redis; its outcome closes or re-opens the
+        circuit.
+        """
+        if not REDIS_AVAILABLE:
+            return None
+
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._build()
+            return self._client if self._admit() else None
+
+    def async_client(self):
+        """
+        Return the asyncio Redis client, or None while the circuit is open.
+
+        The client owns its own connection pool, which binds to the event
+        loop that first uses it.
+        """
+        if not REDIS_AVAILABLE:
+            return None
+
+        with self._lock:
+            if self._async_client is None or self._async_pid != os.getpid():
+                self._async_client = _ObservedAsyncRedis(**self._pool_kwargs)
+                self._async_client.observer = self._notify
+                self._async_pid = os.getpid()
+            return self._async_client if self._admit() else None
+
+    def record_success(self):
+        """Close the circuit after a successful command."""
+        with self._lock:
+            if self._state != CIRCUIT_CLOSED:
+                logger.info("✅ Redis recovered, leaving memory fallback")
+            self._state = CIRCUIT_CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, error):
+        """Count a failed command and open the circuit if needed."""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != CIRCUIT_OPEN:
+                    logger.error("❌ Redis unavailable, using memory fallback: %s", error)
+                self._state = CIRCUIT_OPEN
+                self._opened_at = time.monotonic()
+
+    def release_probe(self):
+        """
+        End a half-open probe without an outcome.
+
+        Used when a command fails for reasons unrelated to Redis (e.g. an
+        error raised by the caller's own code), so the next caller can probe.
+        """
+        with self._lock:
+            self._probing = False
+
+    def run(self, operation, fallback):
+        """
+        Run ``operation(client)`` against Redis, or ``fallback()`` if Redis is
+        unavailable or the command fails.
+
+        Exceptions other than ``redis.RedisError`` propagate to the caller
+        and leave the circuit state unchanged.
+        """
+        client = self.client()
+        if client is None:
+            return fallback()
+        try:
+            result = operation(client)
+        except redis.RedisError as e:
+            self.record_failure(e)
+            return fallback()
+        except BaseException:
+            self.release_probe()
+            raise
+        self.record_success()
+        return result
+
+    async def run_async(self, operation, fallback):
+        """
+        Await ``operation(client)`` against the asyncio client, or return
+        ``fallback()`` if Redis is unavailable or the command fails.
+
+        Other exceptions, including cancellation, propagate to the caller
+        and leave the circuit state unchanged.
+        """
+        client = self.async_client()
+        if client is None:
+            return fallback()
+        try:
+            result = await operation(client)
+        except redis.RedisError as e:
+            self.record_failure(e)
+            return fallback()
+        except BaseException:
+            self.release_probe()
+            raise
+        self.record_success()
+        return result
+
+    def is_available(self):
+        """Return True unless the circuit is open."""
+        return REDIS_AVAILABLE and self._state != CIRCUIT_OPEN
+
+    def reset(self):
+        """Drop pooled connections, e.g. in a freshly forked worker."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.disconnect()
+            self._pool = None
+            self._client = None
+            # Pooled asyncio connections belong to an event loop; drop them
+            # without awaiting a close
+            self._async_client = None
+
+    def stats(self):
+        """Return circuit and pool information."""
+        with self._lock:
+            pool = self._pool
+            stats = {
+                'installed': REDIS_AVAILABLE,
+                'circuit': self._state,
+                'consecutive_failures': self._failures
+            }
+        if pool is not None:
+            # pylint: disable=protected-access
+            stats['pool'] = {
+                'max_connections': pool.max_connections,
+                'created': pool._created_connections,
+                'idle': len(pool._available_connections),
+                'in_use': len(pool._in_use_connections)
+            }
+        return stats
@@ -0,0 +1,166 @@
+"""
+Precompiled row serializers.
+
+A Schema maps public field names to table columns, optional converters and
+constants. For each set of requested fields it compiles, once, plain Python
+functions that unpack Core result rows (from ``select`` over
+``Schema.columns``) straight into response dicts. Listings therefore never
+hydrate ORM instances or look up a formatter per field and row, and fields
+that share a column (aliases such as ``stock``/``stock_quantity``) read it
+once.
+
+Example::
+
+    serializer = PRODUCT_SCHEMA.compile(['id', 'name', 'price'])
+    rows = session.execute(select(*serializer.columns)).all()
+    data = serializer.dump_many(rows)
+"""
+
+import threading
+
+_MISSING = object()
+
+# Field selections come from query strings; past this many, compile without caching
+MAX_COMPILED = 256
+
+
+class Field:
+    """
+    One public field of a Schema.
+
+    Args:
+        name (str): Key in the serialized dict
+        column (str): Source column; defaults to ``name``
+        convert (callable): Applied to the column value, e.g. ``float``
+        constant: Fixed value instead of a column; shared between rows, so
+            it should be immutable (use tuples rather than lists)
+    """
+
+    __slots__ = ('name', 'column', 'convert', 'constant')
+
+    def __init__(self, name, column=None, convert=None, constant=_MISSING):
+        self.name = name
+        self.constant = constant
+        self.column = None if constant is not _MISSING else (column or name)
+        self.convert = convert
+
+
+class CompiledSerializer:
+    """
+    Serializer for one field selection.
+
+    Attributes:
+        fields (tuple): Field names in output order
+        columns (list): Table columns to select, in the order ``dump`` and
+            ``dump_many`` expect them
+        dump (callable): ``dump(row) -> dict`` for one row tuple
+        dump_many (callable): ``dump_many(rows) -> list`` for many rows
+        dump_object (callable): ``dump_object(obj) -> dict`` reading the
+            columns as attributes of an ORM instance
+    """
+
+    __slots__ = ('fields', 'columns', 'dump', 'dump_many', 'dump_object')
+
+    def __init__(self, fields, columns, dump, dump_many, dump_object):
+        self.fields = fields
+        self.columns = columns
+        self.dump = dump
+        self.dump_many = dump_many
+        self.dump_object = dump_object
+
+
+class Schema:
+    """
+    Public representation of a table.
+
+    Args:
+        table (Table): Source table, e.g. ``Product.__table__``
+        fields (list): Field instances, or column names for fields that
+            pass the column value through unchanged
+    """
+
+    def __init__(self, table, fields):
+        self.table = table
+        self.fields = {}
+        for field in fields:
+            field = Field(field) if isinstance(field, str) else field
+            self.fields[field.name] = field
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    @property
+    def names(self):
+        """All field names, in declaration order."""
+        return list(self.fields)
+
+    def compile(self, names=None, extra_columns=()):
+        """
+        Return the serializer for ``names`` (all fields by default).
+
+        Args:
+            names (list): Field names to output
+            extra_columns (tuple): Column names to select first even when no
+                field needs them, e.g. keyset pagination keys
+
+        Returns:
+            CompiledSerializer: Cached per field selection, up to MAX_COMPILED
+
+        Raises:
+            KeyError: If a field name is unknown
+        """
+        key = (tuple(names) if names is not None else None, tuple(extra_columns))
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(key)
+                if compiled is None:
+                    compiled = self._build(key[0] or tuple(self.fields), key[1])
+                    if len(self._compiled) < MAX_COMPILED:
+                        self._compiled[key] = compiled
+        return compiled
+
+    def dump_object(self, obj):
+        """Serialize an ORM instance with every field."""
+        return self.compile().dump_object(obj)
+
+    def _build(self, names, extra_columns):
+        fields = [self.fields[name] for name in names]
+
+        column_names = list(extra_columns)
+        for field in fields:
+            if field.column is not None and field.column not in column_names:
+                column_names.append(field.column)
+        if not column_names:
+            column_names.append(self.table.primary_key.columns.values()[0].name)
+
+        variables = {name: f'c{index}' for index, name in enumerate(column_names)}
+        namespace = {}
+        entries = []
+        for index, field in enumerate(fields):
+            if field.column is None:
+                namespace[f'k{index}'] = field.constant
+                expression = f'k{index}'
+            elif field.convert is not None:
+                namespace[f'f{index}'] = field.convert
+                expression = f'f{index}({variables[field.column]})'
+            else:
+                expression = variables[field.column]
+            entries.append(f'{field.name!r}: {expression}')
+
+        body = '{' + ', '.join(entries) + '}'
+        target = ', '.join(variables.values()) + ','
+        reads = '\n'.join(f'    {variable} = obj.{name}' for name, variable in variables.items())
+        source = (
+            f"def dump(row):\n    {target} = row\n    return {body}\n\n"
+            f"def dump_many(rows):\n    return [{body} for {target} in rows]\n\n"
+            f"def dump_object(obj):\n{reads}\n    return {body}\n"
+        )
+        exec(compile(source, f'<schema {self.table.name}>', 'exec'), namespace)  # pylint: disable=exec-used
+
+        return CompiledSerializer(
+            tuple(names),
+            [self.table.c[name] for name in column_names],
+            namespace['dump'],
+            namespace['dump_many'],
+            namespace['dump_object']
+        )
@@ -0,0 +1,97 @@
+"""
+Multi-recipient SMS sender for Africa's Talking.
+
+Recipients of the same message are coalesced and sent as multi-recipient
+API calls of up to ``max_recipients`` numbers. Per-recipient statuses from
+``SMSMessageData.Recipients`` are mapped back to the numbers the caller
+passed in.
+
+The provider takes one body per call, so only broadcast-style messages
+can share a request. Messages whose text differs per recipient, such as
+verification codes, go through ``send_one``.
+"""
+
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=4096)
+def normalize_phone(phone):
+    """Format a Kenyan phone number in international (+254) form."""
+    if phone.startswith('0'):
+        return '+254' + phone[1:]
+    if not phone.startswith('+'):
+        return '+254' + phone
+    return phone
+
+
+class SMSBatcher:
+    """
+    Sends one message to many recipients in as few provider calls as possible.
+
+    Args:
+        client: Object with a ``send(message, recipients, sender_id)``
+            method, e.g. ``africastalking.SMS``
+        sender_id (str): Sender ID passed to the provider
+        max_recipients (int): Recipients per provider call
+    """
+
+    def __init__(self, client, sender_id=None, max_recipients=100):
+        self._client = client
+        self._sender_id = sender_id or None
+        self._max_recipients = max_recipients
+
+    def send(self, message, phones):
+        """
+        Send ``message`` to every number in ``phones``.
+
+        Numbers that normalize to the same recipient share a single delivery.
+
+        Returns:
+            dict: Provider status string (e.g. 'Success') keyed by each
+            number as given in ``phones``
+
+        Raises:
+            Exception: Whatever the provider client raised
+        """
+        recipients = {}
+        for phone in phones:
+            recipients.setdefault(normalize_phone(phone), []).append(phone)
+
+        numbers = list(recipients)
+        statuses = {}
+        for start in range(0, len(numbers), self._max_recipients):
+            chunk = numbers[start:start + self._max_recipients]
+            for number, status in self._dispatch(message, chunk).items():
+                for phone in recipients[number]:
+                    statuses[phone] = status
+        return statuses
+
+    def send_one(self, message, phone):
+        """
+        Send ``message`` to ``phone`` in its own provider call.
+
+        Returns:
+            str: Provider status string for the recipient (e.g. 'Success')
+
+        Raises:
+            Exception: Whatever the provider client raised
+        """
+        return self.send(message, [phone])[phone]
+
+    def _dispatch(self, message, numbers):
+        """Send one provider request and return each number's status."""
+        try:
+            response = self._client.send(message, numbers, self._sender_id)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("SMS batch to %d recipients failed: %s", len(numbers), e)
+            raise
+
+        logger.info("Sent SMS batch to %d recipients", len(numbers))
+        statuses = {
+            entry.get('number'): entry.get('status', 'Unknown')
+            for entry in (response or {}).get('SMSMessageData', {}).get('Recipients', [])
+        }
+        return {number: statuses.get(number, 'Unknown') for number in numbers}
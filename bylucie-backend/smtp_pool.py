@@ -0,0 +1,173 @@
+"""
+Pool of persistent, authenticated SMTP connections.
+
+Connections are opened (TCP connect, STARTTLS, AUTH) once and reused across
+sends. Idle connections are health-checked with NOOP before reuse and
+transparently replaced when the server has dropped them.
+"""
+
+import logging
+import smtplib
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPPoolTimeout(Exception):
+    """Raised when no SMTP connection becomes free in time."""
+
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of SMTP sessions shared between threads.
+
+    Args:
+        host (str): SMTP server host
+        port (int): SMTP server port
+        username (str): Login user; AUTH is skipped when empty
+        password (str): Login password
+        use_tls (bool): Issue STARTTLS after connecting
+        max_connections (int): Upper bound on open sessions
+        timeout (float): Socket timeout for SMTP operations
+        acquire_timeout (float): Seconds to wait for a free session
+        health_check_after (float): Idle seconds after which a session is
+            verified with NOOP before reuse
+        max_idle (float): Idle seconds after which a session is closed
+            instead of reused
+    """
+
+    def __init__(self, host, port, username='', password='', use_tls=True,
+                 max_connections=4, timeout=10, acquire_timeout=10,
+                 health_check_after=5, max_idle=240):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_after = health_check_after
+        self.max_idle = max_idle
+
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._idle = []  # (connection, last_used) pairs, most recent last
+        self._closed = False
+
+    def _connect(self):
+        """Open and authenticate a new SMTP session."""
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                connection.starttls()
+            if self.username:
+                connection.login(self.username, self.password)
+        except Exception:
+            _quietly_close(connection)
+            raise
+        logger.debug("Opened SMTP connection to %s:%s", self.host, self.port)
+        return connection
+
+    def _is_alive(self, connection):
+        """Check a session with NOOP."""
+        try:
+            return connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _checkout(self):
+        """Take an idle session, verifying or replacing it as needed."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, last_used = self._idle.pop()
+
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.max_idle:
+                _quietly_close(connection)
+                continue
+            if idle_for > self.health_check_after and not self._is_alive(connection):
+                _quietly_close(connection)
+                continue
+            return connection
+
+        return self._connect()
+
+    def _checkin(self, connection):
+        with self._lock:
+            if not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                return
+        _quietly_close(connection)
+
+    def _send_once(self, connection, msg):
+        """Send on ``connection`` and return it to the pool unless it broke."""
+        try:
+            connection.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            _quietly_close(connection)
+            raise
+        except smtplib.SMTPException:
+            # Reset the session so a half-finished transaction is not reused
+            try:
+                connection.rset()
+            except (smtplib.SMTPException, OSError):
+                _quietly_close(connection)
+                raise
+            self._checkin(connection)
+            raise
+        self._checkin(connection)
+
+    def send_message(self, msg):
+        """
+        Send ``msg`` over a pooled session.
+
+        A session the server dropped since its last use is replaced and the
+        send retried once.
+
+        Args:
+            msg (email.message.Message): Message to send
+
+        Raises:
+            SMTPPoolTimeout: If no session became free in time
+            smtplib.SMTPException: If the send fails
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise SMTPPoolTimeout("No SMTP connection available")
+
+        try:
+            try:
+                self._send_once(self._checkout(), msg)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                logger.info("SMTP connection dropped, retrying on a new one")
+                self._send_once(self._connect(), msg)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """Return pool size information."""
+        with self._lock:
+            idle = len(self._idle)
+        return {'max_connections': self.max_connections, 'idle': idle}
+
+    def close(self):
+        """Close all idle sessions; sessions in use are closed on check-in."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection, _last_used in idle:
+            _quietly_close(connection)
+
+
+def _quietly_close(connection):
+    """QUIT a session, ignoring errors from an already-dead connection."""
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        try:
+            connection.close()
+        except OSError:
+            pass
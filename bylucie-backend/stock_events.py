@@ -0,0 +1,189 @@
+"""
+Fan-out of stock change events to streaming clients.
+
+Every committed change to the stock snapshot produces an event naming the
+products it touched (or none, when the whole snapshot was discarded).
+Events are published on a Redis pub/sub channel so streams in every worker
+hear about orders placed in any other; each process runs one listener
+thread that hands them to its local subscribers. While Redis is
+unavailable events go straight to the local subscribers, so streams still
+see changes made by their own worker.
+
+Events only say *what* changed; streams read the new levels from the
+stock snapshot, so a missed or duplicated event never leaves a client
+with wrong numbers.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    Event queue of one stream.
+
+    If the stream falls behind and its queue fills up, further events are
+    dropped and ``overflowed`` is set so the stream re-reads everything.
+    """
+
+    def __init__(self, broadcaster, maxsize):
+        self._broadcaster = broadcaster
+        self._queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        """Queue ``event`` without blocking the publisher."""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Return the next event, or None after ``timeout`` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """Return every event already queued."""
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        """Stop receiving events."""
+        self._broadcaster.unsubscribe(self)
+
+
+class StockBroadcaster:
+    """
+    In-process fan-out to stream subscriptions.
+
+    Args:
+        max_queue (int): Events buffered per subscription
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    @property
+    def subscribers(self):
+        """Number of open subscriptions."""
+        return len(self._subscriptions)
+
+    def subscribe(self):
+        """Open a subscription."""
+        subscription = Subscription(self, self.max_queue)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Close ``subscription``."""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        """Deliver ``event`` to every subscription."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+class StockEvents:
+    """
+    Stock events distributed through Redis pub/sub, or locally while Redis
+    is unavailable.
+
+    Args:
+        managed_redis (ManagedRedis): Redis connection with circuit breaker
+        broadcaster (StockBroadcaster): Local fan-out
+        retry_delay (float): Seconds between listener reconnection attempts
+    """
+
+    CHANNEL = 'stock:events'
+
+    def __init__(self, managed_redis, broadcaster, retry_delay=1.0):
+        self._redis = managed_redis
+        self._broadcaster = broadcaster
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listener_pid = None
+
+    @property
+    def subscribers(self):
+        """Number of open streams in this process."""
+        return self._broadcaster.subscribers
+
+    def publish(self, version, product_ids):
+        """
+        Announce a stock change.
+
+        Args:
+            version (str): Snapshot version after the change
+            product_ids (iterable): Products whose stock changed, or None if
+                any product may have changed
+        """
+        event = {
+            'version': version,
+            'products': sorted(product_ids) if product_ids is not None else None
+        }
+        payload = json.dumps(event)
+        self._redis.run(lambda client: client.publish(self.CHANNEL, payload),
+                        lambda: self._broadcaster.publish(event))
+
+    def on_change(self, version, products):
+        """StockSnapshot change callback; ``products`` is None on invalidation."""
+        self.publish(version, list(products) if products is not None else None)
+
+    def subscribe(self):
+        """Open a subscription, starting this process's listener if needed."""
+        self._ensure_listener()
+        return self._broadcaster.subscribe()
+
+    def _ensure_listener(self):
+        with self._lock:
+            # Threads do not survive fork; each worker starts its own
+            if self._listener is not None and self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name='stock-events',
+                                              daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        """Relay channel messages to local subscribers for the process lifetime."""
+        while True:
+            client = self._redis.client()
+            if client is None:
+                time.sleep(self.retry_delay)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.CHANNEL)
+                self._redis.record_success()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._broadcaster.publish(json.loads(message['data']))
+            except Exception as e:  # pylint: disable=broad-except
+                # Streams resynchronize periodically, so events missed here only delay updates
+                logger.warning("⚠️ Stock event listener lost Redis: %s", e)
+                self._redis.record_failure(e)
+                time.sleep(self.retry_delay)
+            finally:
+                pubsub.close()
@@ -0,0 +1,112 @@
+"""
+Atomic stock reservation shared by the order endpoints.
+
+All line products are read with a single ``IN`` query and stock is
+decremented with conditional ``UPDATE`` statements, so concurrent checkouts
+can never take ``stock_quantity`` below zero.
+"""
+
+from sqlalchemy import bindparam, select
+
+
+class InsufficientStockError(Exception):
+    """Raised when a product cannot cover the requested quantity."""
+
+    def __init__(self, product_id):
+        super().__init__(f"Insufficient stock for product {product_id}")
+        self.product_id = product_id
+
+
+def aggregate_quantities(items):
+    """
+    Sum requested quantities per product.
+
+    Args:
+        items (list): Order items with 'id' and 'quantity' keys
+
+    Returns:
+        dict: Product ID -> total requested quantity
+
+    Raises:
+        ValueError: If a quantity is not a positive integer
+    """
+    quantities = {}
+    for item in items:
+        product_id = int(item['id'])
+        quantity = int(item['quantity'])
+        if quantity <= 0:
+            raise ValueError(f"Quantity must be positive for product {product_id}")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def reserve_stock(session, product_table, items):
+    """
+    Decrement stock for every order line inside the caller's transaction.
+
+    Products that do not exist in the catalog are not stock-managed and are
+    skipped. The caller must roll back the session if this raises.
+
+    Args:
+        session: SQLAlchemy session holding the order transaction
+        product_table (sqlalchemy.Table): The product table
+        items (list): Order items with 'id' and 'quantity' keys
+
+    Returns:
+        dict: Product ID -> quantity reserved
+
+    Raises:
+        InsufficientStockError: If any product lacks stock
+        ValueError: If an item is malformed
+    """
+    quantities = aggregate_quantities(items)
+    if not quantities:
+        return {}
+
+    stock_column = product_table.c.stock_quantity
+    rows = session.execute(
+        select(product_table.c.id, stock_column)
+        .where(product_table.c.id.in_(list(quantities)))
+    ).all()
+    current = {row.id: row.stock_quantity or 0 for row in rows}
+
+    # Fail fast on the snapshot before taking any write locks
+    for product_id, quantity in quantities.items():
+        if product_id in current and current[product_id] < quantity:
+            raise InsufficientStockError(product_id)
+
+    reserved = {pid: qty for pid, qty in quantities.items() if pid in current}
+    if not reserved:
+        return {}
+
+    statement = (
+        product_table.update()
+        .where(product_table.c.id == bindparam('product_id'))
+        .where(stock_column >= bindparam('quantity'))
+        .values(stock_quantity=stock_column - bindparam('quantity'))
+    )
+    params = [{'product_id': pid, 'quantity': qty} for pid, qty in reserved.items()]
+
+    if session.get_bind().dialect.supports_sane_multi_rowcount:
+        result = session.execute(statement, params)
+        if result.rowcount != len(params):
+            raise InsufficientStockError(
+                _find_short_product(session, product_table, reserved))
+    else:
+        for param in params:
+            if session.execute(statement, param).rowcount != 1:
+                raise InsufficientStockError(param['product_id'])
+
+    return reserved
+
+
+def _find_short_product(session, product_table, reserved):
+    """Best-effort lookup of the product whose conditional update matched nothing."""
+    rows = session.execute(
+        select(product_table.c.id, product_table.c.stock_quantity)
+        .where(product_table.c.id.in_(list(reserved)))
+    ).all()
+    for row in rows:
+        if (row.stock_quantity or 0) < reserved[row.id]:
+            return row.id
+    return next(iter(reserved))
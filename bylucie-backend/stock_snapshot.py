@@ -0,0 +1,576 @@
+"""
+Hot snapshot of product stock levels.
+
+Stock checks are answered from a compact ``product id -> stock_quantity``
+map instead of the database: a Redis hash shared by every worker while
+Redis is healthy, and a per-process dict otherwise. The snapshot is loaded
+from the database on first use and kept current by the order endpoints,
+which stage their reservations on the session so the deltas are applied
+only when the order transaction commits. Any other committed write to the
+product table (restocking, catalog edits) discards the snapshot so it is
+reloaded.
+
+Queued order intake (see order_intake) can also *hold* stock for orders
+accepted but not yet written. Holds are kept apart from the levels, so
+reloading the levels never loses them. Reads report levels minus holds,
+and a hold is released in the same step that applies its order's
+committed delta.
+
+A load only replaces the snapshot if the version did not move while the
+database was read; otherwise an order may have committed in between and
+its delta would be missing, so the load is discarded and repeated.
+
+Every change advances an opaque version token. Clients can send back the
+version (or the ETag derived from it) and wait for the next change instead
+of polling.
+"""
+
+import threading
+import time
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from catalog_cache import on_table_commit
+from stock_reservation import InsufficientStockError
+
+# ARGV: 1 + 2 * (reserved pairs), reserved pairs, then held pairs to release.
+# Released holds never go below zero (the hash may have expired meanwhile).
+_ADJUST_SCRIPT = """
+local split = tonumber(ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    for i = 2, split, 2 do
+        redis.call('HINCRBY', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1]))
+    end
+end
+for i = split + 1, #ARGV, 2 do
+    if redis.call('HINCRBY', KEYS[3], ARGV[i], -tonumber(ARGV[i + 1])) <= 0 then
+        redis.call('HDEL', KEYS[3], ARGV[i])
+    end
+end
+return redis.call('INCR', KEYS[2])
+"""
+
+# ARGV: held pairs to release; fields reaching zero are removed
+_RELEASE_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call('HINCRBY', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1])) <= 0 then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+return redis.call('INCR', KEYS[2])
+"""
+
+# Returns false if the levels are not loaded, {0, product id} if a product
+# lacks stock, else {version, held product ids...}
+_HOLD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+for i = 2, #ARGV, 2 do
+    local level = redis.call('HGET', KEYS[1], ARGV[i])
+    if level then
+        local held = math.max(tonumber(redis.call('HGET', KEYS[2], ARGV[i]) or '0'), 0)
+        if tonumber(level) - held < tonumber(ARGV[i + 1]) then
+            return {0, tonumber(ARGV[i])}
+        end
+    end
+end
+local result = {0}
+for i = 2, #ARGV, 2 do
+    if redis.call('HEXISTS', KEYS[1], ARGV[i]) == 1 then
+        redis.call('HINCRBY', KEYS[2], ARGV[i], ARGV[i + 1])
+        table.insert(result, tonumber(ARGV[i]))
+    end
+end
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+result[1] = redis.call('INCR', KEYS[3])
+return result
+"""
+
+# ARGV: expected version counter, ttl, then product id/quantity pairs.
+# Returns 0 without writing if the version moved since the load began.
+_REPLACE_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if #ARGV == 2 then
+    -- Keep an (empty) snapshot so an empty catalog is not reloaded per request
+    redis.call('HSET', KEYS[1], '_', 0)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('INCR', KEYS[2])
+return 1
+"""
+
+# Database loads attempted per lookup before serving an unsaved load
+LOAD_ATTEMPTS = 3
+
+STAGED_KEY = 'stock_snapshot:reserved'
+HELD_KEY = 'stock_snapshot:held'
+
+
+class MemoryStockLevels:
+    """
+    Per-process stock map.
+
+    Other processes change stock without telling this one, so the map
+    expires ``max_age`` seconds after it was loaded.
+
+    Args:
+        max_age (float): Seconds before the map is reloaded
+    """
+
+    def __init__(self, max_age=5.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._levels = None
+        self._held = {}
+        self._loaded_at = 0.0
+        # Versions from different processes must never compare equal
+        self._prefix = f"m{uuid.uuid4().hex[:8]}."
+        self._version = 0
+
+    def version(self):
+        """Current version token."""
+        return f"{self._prefix}{self._version}"
+
+    def get(self, product_ids):
+        """
+        Return (version, {id: quantity}), or None if the map must be loaded.
+        """
+        with self._lock:
+            if self._levels is None or time.monotonic() - self._loaded_at > self.max_age:
+                return None
+            levels = {pid: self._levels.get(pid, 0) - max(self._held.get(pid, 0), 0)
+                      for pid in product_ids}
+            return f"{self._prefix}{self._version}", levels
+
+    def replace(self, levels, version):
+        """
+        Install levels loaded from the database while the version was
+        ``version``.
+
+        Returns:
+            bool: False if the version moved and the levels were not installed
+        """
+        with self._lock:
+            if f"{self._prefix}{self._version}" != version:
+                return False
+            self._levels = dict(levels)
+            self._loaded_at = time.monotonic()
+            self._version += 1
+            return True
+
+    def adjust(self, reserved, held=None):
+        """
+        Subtract reserved quantities and release ``held``; returns the new
+        version token.
+        """
+        with self._lock:
+            if self._levels is not None:
+                for product_id, quantity in reserved.items():
+                    if product_id in self._levels:
+                        self._levels[product_id] -= quantity
+            self._release(held or {})
+            self._version += 1
+            return f"{self._prefix}{self._version}"
+
+    def hold(self, quantities, ttl):  # pylint: disable=unused-argument
+        """
+        Hold stock for products in the map.
+
+        Returns:
+            tuple: (version token, {product id: quantity held}), or None if
+            the map must be loaded first
+
+        Raises:
+            InsufficientStockError: If a product lacks unheld stock
+        """
+        with self._lock:
+            if self._levels is None or time.monotonic() - self._loaded_at > self.max_age:
+                return None
+            for product_id, quantity in quantities.items():
+                if product_id in self._levels and (
+                        self._levels[product_id] - max(self._held.get(product_id, 0), 0)
+                        < quantity):
+                    raise InsufficientStockError(product_id)
+            held = {pid: qty for pid, qty in quantities.items() if pid in self._levels}
+            for product_id, quantity in held.items():
+                self._held[product_id] = self._held.get(product_id, 0) + quantity
+            self._version += 1
+            return f"{self._prefix}{self._version}", held
+
+    def release(self, held):
+        """Release held stock; returns the new version token."""
+        with self._lock:
+            self._release(held)
+            self._version += 1
+            return f"{self._prefix}{self._version}"
+
+    def _release(self, held):
+        # Holds never go below zero; a spent hold is dropped
+        for product_id, quantity in held.items():
+            remaining = self._held.get(product_id, 0) - quantity
+            if remaining > 0:
+                self._held[product_id] = remaining
+            else:
+                self._held.pop(product_id, None)
+
+    def clear(self):
+        """Drop the map so the next read reloads it; returns the new version token."""
+        with self._lock:
+            self._levels = None
+            self._version += 1
+            return f"{self._prefix}{self._version}"
+
+
+class RedisStockLevels:
+    """
+    Stock map in a Redis hash shared by all workers.
+
+    The hash expires after ``ttl`` seconds as a bound on drift from writes
+    made while Redis was unreachable; the version counter never expires.
+    """
+
+    LEVELS_KEY = 'stock:levels'
+    HELD_KEY = 'stock:held'
+    VERSION_KEY = 'stock:version'
+
+    def __init__(self, client, ttl=300):
+        self.client = client
+        self.ttl = ttl
+        self._adjust = client.register_script(_ADJUST_SCRIPT)
+        self._hold = client.register_script(_HOLD_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+        self._replace = client.register_script(_REPLACE_SCRIPT)
+
+    def version(self):
+        """Current version token."""
+        return f"r{int(self.client.get(self.VERSION_KEY) or 0)}"
+
+    def get(self, product_ids):
+        """
+        Return (version, {id: quantity}), or None if the hash must be loaded.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.exists(self.LEVELS_KEY)
+        pipe.get(self.VERSION_KEY)
+        if product_ids:
+            pipe.hmget(self.LEVELS_KEY, product_ids)
+            pipe.hmget(self.HELD_KEY, product_ids)
+        results = pipe.execute()
+        if not results[0]:
+            return None
+        values, held = (results[2], results[3]) if product_ids else ([], [])
+        levels = {pid: (int(value) if value is not None else 0) - max(int(hold or 0), 0)
+                  for pid, value, hold in zip(product_ids, values, held)}
+        return f"r{int(results[1] or 0)}", levels
+
+    def replace(self, levels, version):
+        """
+        Install levels loaded from the database while the version was
+        ``version``.
+
+        Returns:
+            bool: False if the version moved and the levels were not installed
+        """
+        if not version.startswith('r'):
+            # Loaded while reading from the memory fallback
+            return False
+        args = [version[1:], self.ttl]
+        for product_id, quantity in levels.items():
+            args.extend((product_id, quantity))
+        return bool(self._replace(keys=[self.LEVELS_KEY, self.VERSION_KEY], args=args))
+
+    def adjust(self, reserved, held=None):
+        """
+        Subtract reserved quantities (if the hash is loaded) and release
+        ``held``; returns the new version token.
+        """
+        args = [1 + 2 * len(reserved)]
+        for product_id, quantity in list(reserved.items()) + list((held or {}).items()):
+            args.extend((product_id, quantity))
+        version = self._adjust(keys=[self.LEVELS_KEY, self.VERSION_KEY, self.HELD_KEY],
+                               args=args)
+        return f"r{version}"
+
+    def hold(self, quantities, ttl):
+        """
+        Hold stock for products in the hash. Holds expire ``ttl`` seconds
+        after the last one, which bounds leaks from crashed processes.
+
+        Returns:
+            tuple: (version token, {product id: quantity held}), or None if
+            the hash must be loaded first
+
+        Raises:
+            InsufficientStockError: If a product lacks unheld stock
+        """
+        args = [ttl]
+        for product_id, quantity in quantities.items():
+            args.extend((product_id, quantity))
+        result = self._hold(keys=[self.LEVELS_KEY, self.HELD_KEY, self.VERSION_KEY], args=args)
+        if result is None:
+            return None
+        if result[0] == 0:
+            raise InsufficientStockError(result[1])
+        return f"r{result[0]}", {pid: quantities[pid] for pid in result[1:]}
+
+    def release(self, held):
+        """Release held stock; returns the new version token."""
+        args = []
+        for product_id, quantity in held.items():
+            args.extend((product_id, quantity))
+        return f"r{self._release(keys=[self.HELD_KEY, self.VERSION_KEY], args=args)}"
+
+    def clear(self):
+        """Drop the hash so the next read reloads it; returns the new version token."""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.LEVELS_KEY)
+        pipe.incr(self.VERSION_KEY)
+        return f"r{pipe.execute()[-1]}"
+
+
+class StockSnapshot:
+    """
+    Stock levels served from Redis or, while Redis is unavailable, memory.
+
+    Args:
+        managed_redis (ManagedRedis): Redis connection with circuit breaker
+        memory (MemoryStockLevels): Fallback map
+        load_levels (callable): Returns {product id: stock quantity} for the
+            whole catalog from the database
+        ttl (int): Lifetime of the Redis hash in seconds
+        poll_interval (float): Seconds between version checks while waiting
+        on_change (callable): Called as ``on_change(version, products)``
+            after each change; ``products`` is None when the snapshot was
+            discarded
+        hold_ttl (int): Seconds Redis keeps holds after the last new one
+    """
+
+    def __init__(self, managed_redis, memory, load_levels, ttl=300, poll_interval=0.5,
+                 on_change=None, hold_ttl=3600):
+        self._redis = managed_redis
+        self._memory = memory
+        self._load_levels = load_levels
+        self.ttl = ttl
+        self.hold_ttl = hold_ttl
+        self.poll_interval = poll_interval
+        self.on_change = on_change
+        self._primary = None
+        self._load_lock = threading.Lock()
+        self._changed = threading.Condition()
+
+    def _levels(self, client):
+        if self._primary is None or self._primary.client is not client:
+            self._primary = RedisStockLevels(client, self.ttl)
+        return self._primary
+
+    def _run(self, method, *args):
+        return self._redis.run(lambda client: getattr(self._levels(client), method)(*args),
+                               lambda: getattr(self._memory, method)(*args))
+
+    def _notify(self, version, reserved):
+        with self._changed:
+            self._changed.notify_all()
+        if self.on_change is not None:
+            self.on_change(version, reserved)
+
+    def lookup(self, product_ids):
+        """
+        Return stock for ``product_ids``, loading the snapshot if needed.
+
+        Products missing from the catalog read as 0.
+
+        Args:
+            product_ids (list): Integer product IDs
+
+        Returns:
+            tuple: (version token, {product id: quantity})
+        """
+        result = self.cached(product_ids)
+        if result is None:
+            with self._load_lock:
+                # Another thread may have loaded it while we waited
+                result = self.cached(product_ids)
+                for attempt in range(1, LOAD_ATTEMPTS + 1):
+                    if result is not None:
+                        break
+                    version = self.version()
+                    loaded = self._load_levels()
+                    result = self.install(loaded, version, product_ids,
+                                          last_attempt=attempt == LOAD_ATTEMPTS)
+        return result
+
+    def cached(self, product_ids):
+        """
+        Return stock for ``product_ids`` from the snapshot.
+
+        Returns:
+            tuple: (version token, {product id: quantity}), or None if the
+            snapshot must be loaded
+        """
+        return self._run('get', product_ids)
+
+    def install(self, levels, version, product_ids, last_attempt=False):
+        """
+        Install ``levels`` loaded from the database and read ``product_ids``.
+
+        Args:
+            levels (dict): Product ID -> stock quantity for the whole catalog
+            version (str): Version token read before the database load began
+            product_ids (list): Integer product IDs to return
+            last_attempt (bool): Serve ``levels`` directly if they cannot be
+                installed, instead of asking for another load
+
+        Returns:
+            tuple: (version token, {product id: quantity}), or None if the
+            version moved during the load and it should be repeated
+        """
+        if self._run('replace', levels, version):
+            result = self.cached(product_ids)
+            if result is not None:
+                return result
+        elif not last_attempt:
+            return None
+        return self.version(), {pid: levels.get(pid, 0) for pid in product_ids}
+
+    def version(self):
+        """Current version token."""
+        return self._run('version')
+
+    def stage(self, session, reserved, held=None):
+        """
+        Record reserved quantities on ``session``; they are applied when it
+        commits and discarded if it rolls back. ``held`` is stock held for
+        the same order, released when the reservation is applied.
+        """
+        for key, quantities in ((STAGED_KEY, reserved), (HELD_KEY, held)):
+            if not quantities:
+                continue
+            staged = session.info.setdefault(key, {})
+            for product_id, quantity in quantities.items():
+                staged[product_id] = staged.get(product_id, 0) + quantity
+
+    def record(self, reserved, held=None):
+        """Apply committed reservations and release the stock held for them."""
+        if reserved or held:
+            self._notify(self._run('adjust', reserved, held or {}),
+                         set(reserved) | set(held or {}))
+
+    def hold(self, quantities):
+        """
+        Hold stock for an order that will be written later.
+
+        Products missing from the catalog are not held.
+
+        Args:
+            quantities (dict): Product ID -> quantity
+
+        Returns:
+            tuple: ({product id: quantity held}, True if the holds are in
+            Redis and so visible to every process, False if they are in
+            this process's memory)
+
+        Raises:
+            InsufficientStockError: If a product lacks unheld stock
+        """
+        result = self._run('hold', quantities, self.hold_ttl)
+        if result is None:
+            self.lookup(list(quantities))
+            result = self._run('hold', quantities, self.hold_ttl)
+        if result is None:
+            # The map expired again before we could use it; hold nothing
+            return {}, False
+        version, held = result
+        if held:
+            self._notify(version, held)
+        return held, version.startswith('r')
+
+    def release(self, held):
+        """Release stock held for an order that will not be written."""
+        if held:
+            self._notify(self._run('release', held), held)
+
+    def invalidate(self):
+        """Discard the snapshot after a write the deltas do not describe."""
+        self._notify(self._run('clear'), None)
+
+    def watch(self, product_ids, version, levels, timeout):
+        """
+        Wait until the stock of ``product_ids`` differs from ``levels``.
+
+        Changes to other products advance the version without ending the
+        wait.
+
+        Args:
+            product_ids (list): Integer product IDs
+            version (str): Version token ``levels`` was read at
+            levels (dict): Quantities the caller already has
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            tuple: (version token, levels, True if the levels changed)
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.wait_for_change(version, remaining) == version:
+                return version, levels, False
+            version, current = self.lookup(product_ids)
+            if current != levels:
+                return version, current, True
+
+    def wait_for_change(self, version, timeout):
+        """
+        Block until the version differs from ``version`` or ``timeout``
+        seconds pass.
+
+        Returns:
+            str: The current version token
+        """
+        deadline = time.monotonic() + timeout
+        current = self.version()
+        while current == version:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._changed:
+                self._changed.wait(min(self.poll_interval, remaining))
+            current = self.version()
+        return current
+
+
+def track_stock_writes(snapshot, table):
+    """
+    Keep ``snapshot`` in step with committed writes to ``table``.
+
+    Sessions that staged reservations apply them as deltas (releasing any
+    stock held for them); any other committed write to the table
+    invalidates the snapshot.
+
+    Args:
+        snapshot (StockSnapshot): Snapshot to maintain
+        table (sqlalchemy.Table): The product table
+    """
+    def _committed(session):
+        reserved = session.info.pop(STAGED_KEY, None)
+        held = session.info.pop(HELD_KEY, None)
+        if reserved or held:
+            snapshot.record(reserved or {}, held)
+        else:
+            snapshot.invalidate()
+
+    on_table_commit(table, _committed)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_staged(session):
+        session.info.pop(STAGED_KEY, None)
+        session.info.pop(HELD_KEY, None)
+
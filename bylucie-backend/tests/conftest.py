@@ -0,0 +1,80 @@
+"""
+Shared fixtures for the backend tests.
+
+Each test gets an application bound to its own SQLite file, so requests
+served from several threads share one database the way workers do.
+"""
+
+import contextlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as backend  # noqa: E402  pylint: disable=wrong-import-position
+from query_audit import QueryRecorder  # noqa: E402  pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def application(tmp_path):
+    """Flask app with a fresh schema in a temporary SQLite database."""
+    backend.MEMORY_STORE.clear()
+    backend.IDEMPOTENCY_STORE.clear()
+    backend.STOCK_SNAPSHOT.invalidate()
+    application = backend.create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'AUTO_CREATE_SCHEMA': True,
+        'JWT_SECRET_KEY': 'test-secret-key-long-enough-for-hs256',
+        'TESTING': True,
+    })
+    yield application
+    with application.app_context():
+        backend.db.session.remove()
+        backend.db.engine.dispose()
+
+
+@pytest.fixture
+def client(application):
+    """Test client for ``application``."""
+    return application.test_client()
+
+
+@pytest.fixture
+def verified_guest():
+    """Email of a guest whose verification has already succeeded."""
+    email = 'guest@example.com'
+    key = f"guest_verify:email:{email}"
+    backend.VERIFICATION_STORE.start(key, '123456', 600)
+    backend.VERIFICATION_STORE.verify(key, '123456', 5, 3600, 600)
+    return email
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Fail the test if a block runs more statements than its budget.
+
+    Yields a context manager factory ``query_budget(max_queries,
+    allow_repeats=False, slow_ms=None)``; N+1 patterns fail the test
+    unless ``allow_repeats`` is set, and statements slower than
+    ``slow_ms`` fail it when a threshold is given.
+    """
+    @contextlib.contextmanager
+    def _budget(max_queries, allow_repeats=False, slow_ms=None):
+        with QueryRecorder() as recorder:
+            yield recorder
+        report = recorder.report(slow_ms=slow_ms if slow_ms is not None else float('inf'))
+
+        problems = []
+        if len(report.queries) > max_queries:
+            problems.append(f"Query budget exceeded: {len(report.queries)} > {max_queries}")
+        if report.repeated and not allow_repeats:
+            problems.append("Repeated statements (N+1) detected")
+        if report.slow:
+            problems.append(f"Statements slower than {slow_ms:g} ms")
+        if problems:
+            pytest.fail('\n'.join(problems) + '\n' + report.format(), pytrace=False)
+
+    return _budget
@@ -0,0 +1,37 @@
+"""Tests for request metrics and the /metrics endpoint."""
+
+import pytest
+
+import app as backend
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    def make(**config):
+        application = backend.create_app(dict({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+            'AUTO_CREATE_SCHEMA': True,
+            'JWT_SECRET_KEY': 'test-secret-key-long-enough-for-hs256',
+            'TESTING': True,
+        }, **config))
+        return application.test_client()
+    return make
+
+
+def test_metrics_are_not_served_without_a_token(make_client):
+    client = make_client()
+
+    assert client.get('/metrics').status_code == 404
+    assert 'Server-Timing' in client.get('/api/health').headers
+
+
+def test_metrics_require_the_configured_bearer_token(make_client):
+    client = make_client(METRICS_TOKEN='scrape-secret')
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics',
+                      headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert 'http_requests_total' in response.get_data(as_text=True)
@@ -0,0 +1,131 @@
+"""Tests for background notification delivery."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from notifications import (STATUS_FAILED, STATUS_QUEUED, STATUS_SENT,
+                           AsyncNotificationDispatcher, MemoryJobBackend, NotificationQueue)
+from ttl_cache import TTLCache
+
+
+class StubSender:
+    """Fails the first ``failures`` deliveries, then succeeds."""
+
+    def __init__(self, failures=0, error=None):
+        self.failures = failures
+        self.error = error
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, recipient, code):
+        self.release.wait(5)
+        self.calls.append((recipient, code))
+        if len(self.calls) <= self.failures:
+            if self.error is not None:
+                raise self.error
+            return False
+        return True
+
+
+def wait_for_status(queue, job_id, state, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.status(job_id)
+        if status and status['status'] == state:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"{job_id} never reached {state}: {queue.status(job_id)}")
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(sender, **kwargs):
+        queue = NotificationQueue({'sms': sender}, MemoryJobBackend(TTLCache()), workers=1,
+                                  backoff_base=0.01, **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop()
+
+
+def test_enqueued_job_is_queued_then_sent(make_queue):
+    sender = StubSender()
+    sender.release.clear()
+    queue = make_queue(sender)
+
+    job_id = queue.enqueue('sms', '0700000001', '123456')
+    assert queue.status(job_id)['status'] == STATUS_QUEUED
+
+    sender.release.set()
+    status = wait_for_status(queue, job_id, STATUS_SENT)
+    assert status['attempts'] == 1 and status['lastError'] is None
+    assert sender.calls == [('0700000001', '123456')]
+
+
+def test_failed_delivery_is_retried_until_it_succeeds(make_queue):
+    sender = StubSender(failures=2, error=ConnectionError('provider down'))
+    queue = make_queue(sender)
+
+    status = wait_for_status(queue, queue.enqueue('sms', '0700000001', '123456'), STATUS_SENT)
+
+    assert status['attempts'] == 3
+    assert len(sender.calls) == 3
+
+
+def test_job_fails_after_max_attempts(make_queue):
+    sender = StubSender(failures=10)
+    queue = make_queue(sender, max_attempts=2)
+
+    status = wait_for_status(queue, queue.enqueue('sms', '0700000001', '123456'), STATUS_FAILED)
+
+    assert status['attempts'] == 2 and status['lastError'] == "Delivery rejected"
+    assert len(sender.calls) == 2
+
+
+def test_unknown_channel_is_rejected(make_queue):
+    with pytest.raises(ValueError):
+        make_queue(StubSender()).enqueue('fax', '0700000001', '123456')
+
+
+def test_statuses_expire_and_stay_within_the_cache_bound():
+    backend = MemoryJobBackend(TTLCache(max_entries=2, stripes=1))
+
+    backend.set_status('a', {'status': STATUS_SENT}, 60)
+    backend.set_status('b', {'status': STATUS_SENT}, 60)
+    backend.set_status('c', {'status': STATUS_SENT}, 60)
+    backend.set_status('d', {'status': STATUS_SENT}, 0.01)
+    time.sleep(0.02)
+
+    assert backend.get_status('a') is None
+    assert backend.get_status('c') == {'status': STATUS_SENT}
+    assert backend.get_status('d') is None
+
+
+def test_async_dispatcher_retries_then_records_failure():
+    calls = []
+
+    async def sender(recipient, code):
+        calls.append((recipient, code))
+        raise ConnectionError('provider down')
+
+    async def run():
+        dispatcher = AsyncNotificationDispatcher({'email': sender}, MemoryJobBackend(TTLCache()),
+                                                 max_attempts=3, backoff_base=0.01)
+        job_id = dispatcher.enqueue('email', 'guest@example.com', '123456')
+        assert dispatcher.status(job_id)['status'] == STATUS_QUEUED
+        await dispatcher.aclose()
+        return dispatcher.status(job_id)
+
+    status = asyncio.run(run())
+
+    assert status['status'] == STATUS_FAILED
+    assert status['attempts'] == 3 and status['lastError'] == 'provider down'
+    assert len(calls) == 3
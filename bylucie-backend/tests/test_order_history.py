@@ -0,0 +1,78 @@
+"""Query-count tests for order history and guest order lookup."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import app as backend
+
+ORDERS = 40
+ITEMS_PER_ORDER = 3
+
+
+@pytest.fixture
+def account(application):
+    """Access token of a user with ORDERS orders of ITEMS_PER_ORDER items each."""
+    with application.app_context():
+        user = backend.User(email='buyer@example.com', phone='0712345678', is_verified=True)
+        backend.db.session.add(user)
+        backend.db.session.flush()
+        start = datetime(2026, 1, 1)
+        for index in range(ORDERS):
+            order = backend.Order(
+                order_number=f"HIST-{index}", user_id=user.id,
+                customer_email=user.email, customer_phone=user.phone,
+                customer_name='Buyer', total_amount=15.0 * ITEMS_PER_ORDER,
+                created_at=start + timedelta(hours=index))
+            order.items = [backend.OrderItem(product_id=line, product_name=f"Item {line}",
+                                             quantity=1, price=15.0)
+                           for line in range(ITEMS_PER_ORDER)]
+            backend.db.session.add(order)
+        backend.db.session.commit()
+        return create_access_token(identity=str(user.id))
+
+
+def test_order_history_query_count_is_independent_of_page_size(client, account,
+                                                               query_budget):
+    headers = {'Authorization': f"Bearer {account}"}
+    counts = {}
+    for limit in (2, 10, 30):
+        with query_budget(3) as recorder:
+            response = client.get(f"/api/orders?limit={limit}", headers=headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['items']) == limit
+        assert all(len(order['items']) == ITEMS_PER_ORDER for order in page['items'])
+        counts[limit] = len(recorder.queries)
+
+    assert len(set(counts.values())) == 1, counts
+
+
+def test_order_history_pages_cover_every_order(client, account, query_budget):
+    headers = {'Authorization': f"Bearer {account}"}
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/orders?limit=7' + (f"&cursor={cursor}" if cursor else '')
+        with query_budget(3):
+            page = client.get(url, headers=headers).get_json()
+        seen.extend(order['order_number'] for order in page['items'])
+        cursor = page['nextCursor']
+        if cursor is None:
+            break
+
+    assert seen == [f"HIST-{index}" for index in reversed(range(ORDERS))]
+
+
+def test_order_lookup_query_count(client, account, query_budget):  # pylint: disable=unused-argument
+    with query_budget(2):
+        response = client.post('/api/orders/lookup',
+                               json={'orderNumber': 'HIST-5', 'email': 'Buyer@Example.com'})
+    assert response.status_code == 200
+    assert len(response.get_json()['items']) == ITEMS_PER_ORDER
+
+    with query_budget(2):
+        response = client.post('/api/orders/lookup',
+                               json={'orderNumber': 'HIST-5', 'email': 'someone@example.com'})
+    assert response.status_code == 404
@@ -0,0 +1,83 @@
+"""Tests for retried order submissions."""
+
+import pytest
+import sqlalchemy.exc
+
+import app as backend
+from order_writer import is_duplicate_order_number
+
+
+def guest_payload(email, order_number='IDEM-1'):
+    return {
+        'orderNumber': order_number,
+        'items': [{'id': 1, 'name': 'Bangle', 'quantity': 1, 'price': 20}],
+        'customerInfo': {'email': email, 'phone': '0712345678', 'fullName': 'Guest'},
+        'totalAmount': 20,
+    }
+
+
+def add_product(application):
+    with application.app_context():
+        backend.db.session.add(backend.Product(name='Bangle', price=20, stock_quantity=5))
+        backend.db.session.commit()
+
+
+def test_retry_replays_without_reserving_stock_again(application, client, verified_guest):
+    add_product(application)
+
+    first = client.post('/api/orders/guest', json=guest_payload(verified_guest))
+    retry = client.post('/api/orders/guest', json=guest_payload(verified_guest))
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json()['orderId'] == first.get_json()['orderId']
+    with application.app_context():
+        assert backend.db.session.get(backend.Product, 1).stock_quantity == 4
+
+
+def test_unverified_guest_cannot_replay_an_order(application, client, verified_guest):
+    add_product(application)
+    assert client.post('/api/orders/guest', json=guest_payload(verified_guest)).status_code == 200
+
+    # Verification and idempotency records gone: only the order row remains
+    backend.MEMORY_STORE.clear()
+    backend.IDEMPOTENCY_STORE.clear()
+    response = client.post('/api/orders/guest', json=guest_payload(verified_guest))
+
+    assert response.status_code == 403
+    assert 'Idempotent-Replayed' not in response.headers
+
+
+def test_missing_order_number_is_rejected_as_bad_request(application, client, verified_guest):
+    add_product(application)
+    payload = guest_payload(verified_guest)
+    del payload['orderNumber']
+
+    response = client.post('/api/orders/guest', json=payload)
+
+    assert response.status_code == 400
+    assert 'orderNumber' in response.get_json()['error']
+    with application.app_context():
+        assert backend.db.session.get(backend.Product, 1).stock_quantity == 5
+
+
+def test_only_order_number_unique_violations_are_duplicates(application):
+    values = {'order_number': 'DUP-1', 'customer_email': 'a@example.com',
+              'customer_phone': '0712345678', 'customer_name': 'A', 'total_amount': 20}
+    with application.app_context():
+        backend.db.session.add(backend.Order(**values))
+        backend.db.session.commit()
+
+        backend.db.session.add(backend.Order(**values))
+        with pytest.raises(sqlalchemy.exc.IntegrityError) as duplicate:
+            backend.db.session.commit()
+        backend.db.session.rollback()
+
+        backend.db.session.add(backend.Order(**dict(values, order_number='DUP-2',
+                                                    customer_email=None)))
+        with pytest.raises(sqlalchemy.exc.IntegrityError) as not_null:
+            backend.db.session.commit()
+        backend.db.session.rollback()
+
+    assert is_duplicate_order_number(duplicate.value)
+    assert not is_duplicate_order_number(not_null.value)
@@ -0,0 +1,155 @@
+"""Tests for the write-behind order intake."""
+
+import glob
+import os
+import threading
+import uuid
+
+import pytest
+
+import app as backend
+from order_intake import (HELD_IN_MEMORY, HELD_IN_REDIS, STATUS_COMMITTED, STATUS_FAILED,
+                          MemoryIntakeStatus, OrderIntake, OrderJournal, adopted,
+                          read_unfinished)
+from ttl_cache import TTLCache
+
+
+def queued_entry(order_number, total_amount=30):
+    return {
+        'id': uuid.uuid4().hex,
+        'order': {
+            'order_number': order_number, 'user_id': None,
+            'customer_email': 'guest@example.com', 'customer_phone': '0712345678',
+            'customer_name': 'Guest', 'total_amount': total_amount,
+            'is_guest_order': True, 'user_verified': True,
+            'verification_method': 'guest', 'status': 'pending',
+        },
+        'items': [{'id': 1, 'name': 'Anklet', 'quantity': 1, 'price': 30}],
+        'held': {},
+        'acceptedAt': 0,
+    }
+
+
+@pytest.fixture
+def intake(application, tmp_path):
+    with application.app_context():
+        backend.db.session.add(backend.Product(name='Anklet', price=30, stock_quantity=10))
+        backend.db.session.commit()
+
+    order_intake = OrderIntake(backend.STOCK_SNAPSHOT,
+                               OrderJournal(str(tmp_path / 'journal'), max_bytes=0),
+                               MemoryIntakeStatus(TTLCache()), backend.write_queued_order,
+                               lambda: backend.db.session, find_order=backend.find_queued_order)
+    # Commit on the test thread instead of starting the committer
+    order_intake._app = application  # pylint: disable=protected-access
+    return order_intake
+
+
+def committed_orders(application):
+    with application.app_context():
+        return sorted(order.order_number for order in backend.Order.query.all())
+
+
+def test_unbindable_order_is_rejected_not_retried(application, intake):
+    batch = [queued_entry('GOOD-1'), queued_entry('BAD', total_amount={'x': 1}),
+             queued_entry('GOOD-2')]
+    bad = batch[1]
+
+    intake._commit(list(batch))  # pylint: disable=protected-access
+
+    assert committed_orders(application) == ['GOOD-1', 'GOOD-2']
+    assert intake.status(bad['id'])['status'] == STATUS_FAILED
+    assert intake.status(batch[0]['id'])['status'] == STATUS_COMMITTED
+
+
+def test_batch_failure_falls_back_to_one_order_per_transaction(application, intake,
+                                                               monkeypatch):
+    batch = [queued_entry('ONE'), queued_entry('BROKEN'), queued_entry('TWO')]
+
+    def place_order(session, entry):
+        if entry['order']['order_number'] == 'BROKEN':
+            raise RuntimeError("unexpected failure")
+        return backend.write_queued_order(session, entry)
+
+    monkeypatch.setattr(intake, '_place_order', place_order)
+    intake._commit(list(batch))  # pylint: disable=protected-access
+
+    assert committed_orders(application) == ['ONE', 'TWO']
+    assert intake.status(batch[1]['id'])['status'] == STATUS_FAILED
+
+
+def test_queued_submission_validates_total(application, client, verified_guest, monkeypatch):
+    monkeypatch.setattr(backend, 'ORDER_INTAKE_MODE', 'queued')
+    with application.app_context():
+        backend.db.session.add(backend.Product(name='Anklet', price=30, stock_quantity=10))
+        backend.db.session.commit()
+
+    response = client.post('/api/orders/guest', json={
+        'orderNumber': 'QUEUED-BAD',
+        'items': [{'id': 1, 'name': 'Anklet', 'quantity': 1, 'price': 30}],
+        'customerInfo': {'email': verified_guest, 'phone': '0712345678', 'fullName': 'Guest'},
+        'totalAmount': {'x': 1},
+    })
+
+    assert response.status_code == 400
+    assert backend.ORDER_INTAKE.backlog == 0
+
+
+def test_compaction_never_drops_an_order_being_accepted(application, intake, monkeypatch):
+    # Stand in for a running committer so submit() does not start one
+    intake._committer = threading.current_thread()  # pylint: disable=protected-access
+    intake._committer_pid = os.getpid()  # pylint: disable=protected-access
+
+    journal = intake._journal  # pylint: disable=protected-access
+    append = journal.append
+    appended = threading.Event()
+    proceed = threading.Event()
+
+    def paused_append(entry):
+        append(entry)
+        appended.set()
+        proceed.wait(5)
+
+    monkeypatch.setattr(journal, 'append', paused_append)
+    entry = queued_entry('ACCEPTED')
+
+    def submit():
+        with application.app_context():
+            intake.submit(application, entry['order'], entry['items'])
+
+    submitter = threading.Thread(target=submit)
+    submitter.start()
+    appended.wait(5)
+    # The committer settles an earlier batch while the new order is mid-accept
+    intake._finish_batch(0)  # pylint: disable=protected-access
+    proceed.set()
+    submitter.join(5)
+
+    [path] = glob.glob(os.path.join(journal.directory, 'orders-*.jsonl'))
+    with open(path, encoding='utf-8') as journal_file:
+        unfinished = read_unfinished(journal_file)
+    assert [e['order']['order_number'] for e in unfinished] == ['ACCEPTED']
+
+
+def test_replayed_entry_keeps_its_committed_status(application, intake, monkeypatch):
+    entry = queued_entry('REPLAYED')
+    intake._commit([entry])  # pylint: disable=protected-access
+    order_id = intake.status(entry['id'])['orderId']
+
+    released = []
+    monkeypatch.setattr(intake._snapshot, 'release', released.append)  # pylint: disable=protected-access
+    # The same journal entry written again, e.g. adopted twice
+    intake._commit([dict(entry, held={1: 1})])  # pylint: disable=protected-access
+
+    assert intake.status(entry['id'])['status'] == STATUS_COMMITTED
+    assert intake.status(entry['id'])['orderId'] == order_id
+    assert released == []
+    assert committed_orders(application) == ['REPLAYED']
+
+
+def test_adopted_entries_drop_holds_kept_in_dead_process_memory():
+    in_memory = dict(queued_entry('MEM'), held={1: 2}, heldIn=HELD_IN_MEMORY)
+    in_redis = dict(queued_entry('SHARED'), held={1: 2}, heldIn=HELD_IN_REDIS)
+
+    assert adopted(in_memory)['held'] == {}
+    assert adopted(in_redis)['held'] == {1: 2}
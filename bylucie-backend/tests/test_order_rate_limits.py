@@ -0,0 +1,76 @@
+"""Tests for the per-customer order counters across Redis outages."""
+
+import time
+
+import pytest
+import redis
+
+from order_rate_limits import MemoryOrderCounter, OrderRateCounter
+from ttl_cache import TTLCache
+
+fakeredis = pytest.importorskip('fakeredis')
+
+EMAIL = 'guest@example.com'
+
+
+class StubManagedRedis:
+    """ManagedRedis stand-in whose commands fail while ``server`` is down."""
+
+    def __init__(self):
+        self.server = fakeredis.FakeServer()
+        self.client = fakeredis.FakeStrictRedis(server=self.server)
+
+    def run(self, operation, fallback):
+        try:
+            return operation(self.client)
+        except redis.RedisError:
+            return fallback()
+
+
+@pytest.fixture
+def orders():
+    """Orders 'in the database', as (order_id, timestamp) pairs."""
+    return []
+
+
+@pytest.fixture
+def counter(orders):
+    managed = StubManagedRedis()
+    counter = OrderRateCounter(managed, MemoryOrderCounter(TTLCache()),
+                               lambda field, value, since: [o for o in orders if o[1] >= since])
+    return managed, counter
+
+
+def place_order(orders, counter, order_id):
+    orders.append((order_id, time.time()))
+    counter.record(order_id, email=EMAIL)
+
+
+def test_order_recorded_during_an_outage_is_counted_once_redis_is_back(orders, counter):
+    managed, counter = counter
+    place_order(orders, counter, 1)
+    place_order(orders, counter, 2)
+    assert counter.count('email', EMAIL) == 2
+
+    managed.server.connected = False
+    place_order(orders, counter, 3)  # crosses the limit of 3 while Redis is down
+    assert counter.count('email', EMAIL) == 3
+
+    managed.server.connected = True
+    assert counter.count('email', EMAIL) == 3
+    place_order(orders, counter, 4)
+    assert counter.count('email', EMAIL) == 4
+
+
+def test_orders_recorded_in_redis_are_counted_after_failover(orders, counter):
+    managed, counter = counter
+    managed.server.connected = False
+    assert counter.count('email', EMAIL) == 0  # seeds the memory window
+
+    managed.server.connected = True
+    place_order(orders, counter, 1)
+    place_order(orders, counter, 2)
+    place_order(orders, counter, 3)
+
+    managed.server.connected = False
+    assert counter.count('email', EMAIL) == 3
@@ -0,0 +1,24 @@
+"""Tests for conditional GETs on the product endpoints."""
+
+import pytest
+
+import app as backend
+
+
+@pytest.fixture
+def product(application):
+    with application.app_context():
+        backend.db.session.add(backend.Product(name='Bangle', price=20, stock_quantity=5))
+        backend.db.session.commit()
+
+
+@pytest.mark.parametrize('path', ['/api/products', '/api/products/stock?ids=1'])
+def test_strong_and_weak_validators_both_revalidate(client, product, path):
+    etag = client.get(path).headers['ETag']
+
+    for validator in (etag, f"W/{etag}", f'"other", W/{etag}'):
+        response = client.get(path, headers={'If-None-Match': validator})
+        assert response.status_code == 304, validator
+        assert response.headers['ETag'] == etag
+
+    assert client.get(path, headers={'If-None-Match': '"other"'}).status_code == 200
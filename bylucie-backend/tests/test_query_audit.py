@@ -0,0 +1,45 @@
+"""Tests for the query recorder and the ``query_budget`` fixture."""
+
+import pytest
+
+import app as backend
+from query_audit import QueryRecorder
+
+
+def test_recorder_flags_per_row_lookups(application):
+    with application.app_context():
+        backend.db.session.add_all(
+            [backend.Product(name=f"Bead {i}", price=5, stock_quantity=1) for i in range(4)])
+        backend.db.session.commit()
+        backend.db.session.expunge_all()
+
+        with QueryRecorder() as recorder:
+            for product_id in range(1, 5):
+                backend.db.session.get(backend.Product, product_id)
+
+    report = recorder.report()
+    assert len(report.queries) == 4
+    assert len(report.repeated) == 1
+    assert report.repeated[0][1] == 4
+
+
+@pytest.mark.parametrize('lines', [1, 3, 6])
+def test_guest_order_query_count_is_independent_of_lines(application, client,
+                                                         verified_guest, query_budget, lines):
+    with application.app_context():
+        products = [backend.Product(name=f"Charm {i}", price=10, stock_quantity=5)
+                    for i in range(lines)]
+        backend.db.session.add_all(products)
+        backend.db.session.commit()
+        items = [{'id': product.id, 'name': product.name, 'quantity': 1, 'price': 10}
+                 for product in products]
+
+    with query_budget(5):
+        response = client.post('/api/orders/guest', json={
+            'orderNumber': f"BUDGET-{lines}",
+            'items': items,
+            'customerInfo': {'email': verified_guest, 'phone': '0712345678',
+                             'fullName': 'Guest'},
+            'totalAmount': 10 * lines,
+        })
+    assert response.status_code == 200
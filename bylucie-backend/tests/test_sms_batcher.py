@@ -0,0 +1,56 @@
+"""Tests for multi-recipient SMS sending."""
+
+import pytest
+
+from sms_batcher import SMSBatcher
+
+
+class StubSMS:
+    """Records provider calls and answers like Africa's Talking."""
+
+    def __init__(self, statuses=None, error=None):
+        self.calls = []
+        self.statuses = statuses or {}
+        self.error = error
+
+    def send(self, message, recipients, sender_id):
+        self.calls.append((message, list(recipients), sender_id))
+        if self.error is not None:
+            raise self.error
+        return {'SMSMessageData': {'Recipients': [
+            {'number': number, 'status': self.statuses.get(number, 'Success')}
+            for number in recipients
+        ]}}
+
+
+def test_recipients_share_provider_calls_up_to_the_batch_size():
+    client = StubSMS()
+    batcher = SMSBatcher(client, sender_id='BYLUCIE', max_recipients=2)
+
+    statuses = batcher.send('Sale today', ['0700000001', '700000002', '+254700000003'])
+
+    assert client.calls == [
+        ('Sale today', ['+254700000001', '+254700000002'], 'BYLUCIE'),
+        ('Sale today', ['+254700000003'], 'BYLUCIE'),
+    ]
+    assert statuses == {'0700000001': 'Success', '700000002': 'Success',
+                        '+254700000003': 'Success'}
+
+
+def test_each_caller_gets_its_own_recipient_status():
+    client = StubSMS(statuses={'+254700000002': 'InvalidPhoneNumber'})
+    batcher = SMSBatcher(client)
+
+    statuses = batcher.send('Sale today', ['0700000001', '+254700000001', '0700000002'])
+
+    # Two spellings of one number are coalesced into a single delivery
+    assert client.calls == [('Sale today', ['+254700000001', '+254700000002'], None)]
+    assert statuses == {'0700000001': 'Success', '+254700000001': 'Success',
+                        '0700000002': 'InvalidPhoneNumber'}
+
+
+def test_send_one_returns_the_status_and_raises_provider_errors():
+    assert SMSBatcher(StubSMS()).send_one('Code 123456', '0700000001') == 'Success'
+
+    with pytest.raises(ConnectionError):
+        SMSBatcher(StubSMS(error=ConnectionError('down'))).send_one('Code 1', '0700000001')
@@ -0,0 +1,131 @@
+"""Tests for the pooled SMTP sender."""
+
+import smtplib
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+import smtp_pool
+from smtp_pool import SMTPConnectionPool, SMTPPoolTimeout
+
+
+class StubSMTP:
+    """Stands in for smtplib.SMTP and records what each session did."""
+
+    sessions = []
+
+    def __init__(self, host, port, timeout=None):
+        self.address = (host, port)
+        self.calls = []
+        self.sent = []
+        self.alive = True
+        self.drop_next_send = False
+        self.block = None
+        self.sending = threading.Event()
+        StubSMTP.sessions.append(self)
+
+    def starttls(self):
+        self.calls.append('starttls')
+
+    def login(self, username, password):
+        self.calls.append(('login', username))
+
+    def noop(self):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        return 250, b'OK'
+
+    def send_message(self, msg):
+        self.sending.set()
+        if self.block is not None:
+            self.block.wait(5)
+        if self.drop_next_send or not self.alive:
+            self.alive = False
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.sent.append(msg['Subject'])
+
+    def rset(self):
+        self.calls.append('rset')
+
+    def quit(self):
+        self.calls.append('quit')
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+    def close(self):
+        self.calls.append('close')
+
+
+def message(subject):
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    return msg
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    StubSMTP.sessions = []
+    monkeypatch.setattr(smtp_pool.smtplib, 'SMTP', StubSMTP)
+    return StubSMTP.sessions
+
+
+def test_sessions_are_authenticated_once_and_reused(sessions):
+    pool = SMTPConnectionPool('smtp.example.com', 587, username='shop', password='secret')
+
+    pool.send_message(message('one'))
+    pool.send_message(message('two'))
+
+    assert len(sessions) == 1
+    assert sessions[0].calls == ['starttls', ('login', 'shop')]
+    assert sessions[0].sent == ['one', 'two']
+    assert pool.stats() == {'max_connections': 4, 'idle': 1}
+
+    pool.close()
+    assert sessions[0].calls[-1] == 'quit'
+
+
+def test_send_is_retried_on_a_new_session_after_a_server_side_close(sessions):
+    pool = SMTPConnectionPool('smtp.example.com', 587, use_tls=False)
+    pool.send_message(message('one'))
+
+    # Dropped mid-send without the idle health check noticing
+    sessions[0].drop_next_send = True
+    pool.send_message(message('two'))
+
+    assert len(sessions) == 2
+    assert sessions[0].calls[-1] == 'close'
+    assert sessions[1].sent == ['two']
+    assert pool.stats()['idle'] == 1
+
+
+def test_idle_session_failing_noop_is_replaced(sessions):
+    pool = SMTPConnectionPool('smtp.example.com', 587, use_tls=False, health_check_after=0)
+    pool.send_message(message('one'))
+
+    sessions[0].alive = False
+    pool.send_message(message('two'))
+
+    assert len(sessions) == 2
+    assert sessions[0].sent == ['one'] and sessions[1].sent == ['two']
+
+
+def test_open_sessions_never_exceed_the_pool_size(sessions):
+    pool = SMTPConnectionPool('smtp.example.com', 587, use_tls=False,
+                              max_connections=1, acquire_timeout=0.05)
+    pool.send_message(message('warm'))
+    sessions[0].block = threading.Event()
+    sessions[0].sending.clear()
+
+    sender = threading.Thread(target=pool.send_message, args=(message('slow'),))
+    sender.start()
+    assert sessions[0].sending.wait(5)
+    with pytest.raises(SMTPPoolTimeout):
+        pool.send_message(message('waiting'))
+
+    sessions[0].block.set()
+    sender.join(5)
+    pool.send_message(message('after'))
+
+    assert len(sessions) == 1
+    assert sessions[0].sent == ['warm', 'slow', 'after']
@@ -0,0 +1,71 @@
+"""Concurrency tests for the conditional-UPDATE stock reservation."""
+
+import threading
+
+import app as backend
+
+THREADS = 40
+STOCK = 10
+
+
+def guest_order(order_number, email, product_id, quantity=1):
+    """Guest order payload for ``quantity`` units of one product."""
+    return {
+        'orderNumber': order_number,
+        'items': [{'id': product_id, 'name': 'Ring', 'quantity': quantity, 'price': 10}],
+        'customerInfo': {'email': email, 'phone': '0712345678', 'fullName': 'Guest'},
+        'totalAmount': 10 * quantity,
+    }
+
+
+def test_concurrent_orders_never_oversell(application, verified_guest):
+    with application.app_context():
+        product = backend.Product(name='Ring', price=10, stock_quantity=STOCK)
+        backend.db.session.add(product)
+        backend.db.session.commit()
+        product_id = product.id
+
+    barrier = threading.Barrier(THREADS)
+    statuses = []
+    statuses_lock = threading.Lock()
+
+    def submit(index):
+        client = application.test_client()
+        barrier.wait()
+        response = client.post('/api/orders/guest',
+                               json=guest_order(f"RACE-{index}", verified_guest, product_id))
+        with statuses_lock:
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses.count(200) == STOCK
+    assert statuses.count(400) == THREADS - STOCK
+
+    with application.app_context():
+        assert backend.db.session.get(backend.Product, product_id).stock_quantity == 0
+        assert backend.Order.query.count() == STOCK
+
+
+def test_order_rejected_when_any_line_is_short(application, client, verified_guest):
+    with application.app_context():
+        plenty = backend.Product(name='Chain', price=10, stock_quantity=5)
+        scarce = backend.Product(name='Pendant', price=10, stock_quantity=1)
+        backend.db.session.add_all([plenty, scarce])
+        backend.db.session.commit()
+        plenty_id, scarce_id = plenty.id, scarce.id
+
+    payload = guest_order('SHORT-1', verified_guest, plenty_id, quantity=2)
+    payload['items'].append({'id': scarce_id, 'name': 'Pendant', 'quantity': 2, 'price': 10})
+    response = client.post('/api/orders/guest', json=payload)
+
+    assert response.status_code == 400
+    with application.app_context():
+        # The first line's decrement is rolled back with the rest of the order
+        assert backend.db.session.get(backend.Product, plenty_id).stock_quantity == 5
+        assert backend.db.session.get(backend.Product, scarce_id).stock_quantity == 1
+        assert backend.Order.query.count() == 0
@@ -0,0 +1,49 @@
+"""Tests for loading the stock snapshot while orders commit."""
+
+from stock_snapshot import MemoryStockLevels, StockSnapshot
+
+
+class OfflineRedis:
+    """ManagedRedis stand-in whose circuit is always open."""
+
+    def run(self, _operation, fallback):
+        return fallback()
+
+
+def test_load_racing_a_committed_order_is_not_installed():
+    stock = {1: 10, 2: 4}
+    loads = []
+
+    def load_levels():
+        levels = dict(stock)
+        if not loads:
+            # An order commits after this load read the table
+            stock[1] -= 3
+            snapshot.record({1: 3})
+        loads.append(levels)
+        return levels
+
+    snapshot = StockSnapshot(OfflineRedis(), MemoryStockLevels(), load_levels)
+
+    _version, levels = snapshot.lookup([1, 2])
+
+    assert levels == {1: 7, 2: 4}
+    assert len(loads) == 2
+    assert snapshot.cached([1])[1] == {1: 7}
+
+
+def test_lookup_serves_last_load_when_snapshot_keeps_moving():
+    stock = {1: 10}
+
+    def load_levels():
+        levels = dict(stock)
+        stock[1] -= 1
+        snapshot.record({1: 1})
+        return levels
+
+    snapshot = StockSnapshot(OfflineRedis(), MemoryStockLevels(), load_levels)
+
+    _version, levels = snapshot.lookup([1])
+
+    assert levels == {1: 8}
+    assert snapshot.cached([1]) is None
@@ -0,0 +1,61 @@
+"""Tests for the in-process TTL cache."""
+
+import sys
+import time
+
+from ttl_cache import TTLCache
+
+
+def test_least_recently_used_entry_is_evicted_when_full():
+    cache = TTLCache(max_entries=2, stripes=1, sweep_interval=0)
+    cache.set('a', 1, 60)
+    cache.set('b', 2, 60)
+    assert cache.get('a') == 1  # 'b' is now least recently used
+
+    cache.set('c', 3, 60)
+
+    assert 'b' not in cache
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_sweep_removes_expired_entries_that_are_never_read():
+    cache = TTLCache(stripes=4, sweep_interval=0)
+    for index in range(10):
+        cache.set(f"short:{index}", index, 0.01)
+    cache.set('long', 'kept', 60)
+    # Rewritten with a later expiry, so its first heap pair is stale
+    cache.set('short:0', 'renewed', 60)
+    time.sleep(0.02)
+
+    assert cache.sweep() == 9
+    assert len(cache) == 2
+    assert cache.get('short:0') == 'renewed'
+    assert cache.stats()['expirations'] == 9
+
+
+def test_stats_track_size_and_bytes_through_every_removal():
+    cache = TTLCache(max_entries=4, stripes=1, sweep_interval=0)
+
+    def size(key, value):
+        return sys.getsizeof(key) + sys.getsizeof(value)
+
+    cache.set('a', 'x' * 100, 60)
+    cache.set('a', 'y', 60)
+    cache.set('b', 'z', 0.01)
+    cache.set('c', 'w', 60)
+    assert cache.stats()['entries'] == 3
+    assert cache.stats()['approx_bytes'] == size('a', 'y') + size('b', 'z') + size('c', 'w')
+
+    cache.pop('c')
+    time.sleep(0.02)
+    assert cache.get('b') is None
+    assert cache.stats()['approx_bytes'] == size('a', 'y')
+
+    for key in 'defgh':
+        cache.set(key, key, 60)
+    assert cache.stats()['entries'] == 4
+    assert cache.stats()['approx_bytes'] == sum(size(key, key) for key in 'efgh')
+
+    cache.clear()
+    assert cache.stats()['entries'] == cache.stats()['approx_bytes'] == 0
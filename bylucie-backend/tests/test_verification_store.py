@@ -0,0 +1,96 @@
+"""Tests for verification code storage and account verification."""
+
+import time
+
+import pytest
+import sqlalchemy.exc
+from flask_jwt_extended import create_access_token
+
+import app as backend
+from ttl_cache import TTLCache
+from verification_store import (EXPIRED, INVALID, LOCKED, VERIFIED,
+                                MemoryVerificationStore, RedisVerificationStore)
+
+KEY = 'guest_verify:email:guest@example.com'
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def store(request):
+    """A verification store and the shortest TTL it supports, per backend."""
+    if request.param == 'memory':
+        return MemoryVerificationStore(TTLCache()), 0.05
+    fakeredis = pytest.importorskip('fakeredis')
+    # The Lua verify script needs fakeredis' scripting support
+    pytest.importorskip('lupa')
+    return RedisVerificationStore(fakeredis.FakeStrictRedis()), 1
+
+
+def test_wrong_code_counts_an_attempt_until_lockout(store):
+    store, _ttl = store
+    store.start(KEY, '123456', 600)
+
+    assert store.verify(KEY, '000000', 2, 600, 600) == INVALID
+    assert store.verify(KEY, '000000', 2, 600, 600) == INVALID
+    # Locked out even with the right code, and the session is gone
+    assert store.verify(KEY, '123456', 2, 600, 600) == LOCKED
+    assert store.verify(KEY, '123456', 2, 600, 600) == EXPIRED
+
+
+def test_code_is_single_use_without_a_verified_ttl(store):
+    store, _ttl = store
+    store.start(KEY, '123456', 600)
+
+    assert store.verify(KEY, '123456', 5, 0, 600) == VERIFIED
+    assert store.verify(KEY, '123456', 5, 0, 600) == EXPIRED
+    assert not store.is_verified(KEY)
+
+
+def test_verified_session_is_kept_for_the_verified_ttl(store):
+    store, _ttl = store
+    store.start(KEY, '123456', 600)
+
+    assert not store.is_verified(KEY)
+    assert store.verify(KEY, 123456, 5, 600, 600) == VERIFIED
+    assert store.is_verified(KEY)
+    store.delete(KEY)
+    assert not store.is_verified(KEY)
+
+
+def test_code_expires(store):
+    store, ttl = store
+    store.start(KEY, '123456', ttl)
+    time.sleep(ttl + 0.1)
+
+    assert store.verify(KEY, '123456', 5, 600, 600) == EXPIRED
+
+
+@pytest.fixture
+def unverified_user(application):
+    """Access token and verification key of an account awaiting its code."""
+    with application.app_context():
+        user = backend.User(email='buyer@example.com', phone='0712345678')
+        backend.db.session.add(user)
+        backend.db.session.commit()
+        key = f"account_verify:{user.id}:email"
+        backend.VERIFICATION_STORE.start(key, '123456', backend.CODE_TTL)
+        return create_access_token(identity=str(user.id)), key
+
+
+def test_code_survives_a_failed_commit(application, client, unverified_user, monkeypatch):
+    token, key = unverified_user
+    headers = {'Authorization': f"Bearer {token}"}
+    body = {'code': '123456', 'method': 'email'}
+
+    def fail_commit():
+        raise sqlalchemy.exc.OperationalError('UPDATE user', {}, Exception('database is locked'))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(backend.db.session, 'commit', fail_commit)
+        assert client.post('/api/auth/verify-account', json=body,
+                           headers=headers).status_code == 500
+
+    assert client.post('/api/auth/verify-account', json=body, headers=headers).status_code == 200
+    # Consumed once the account is verified
+    assert client.post('/api/auth/verify-account', json=body, headers=headers).status_code == 400
+    with application.app_context():
+        assert backend.db.session.get(backend.User, 1).is_verified
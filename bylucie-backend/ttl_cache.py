@@ -0,0 +1,204 @@
+"""
+Bounded, thread-safe in-process cache with per-entry expiry.
+
+Keys are spread over lock stripes so threads touching different keys rarely
+contend. Each stripe keeps its entries in LRU order and an expiry heap that
+a background sweeper drains, so abandoned entries are reclaimed even if
+they are never read again. Size and byte counts are kept as running totals
+so ``stats`` never walks the entries.
+"""
+
+import heapq
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class _Stripe:
+    """One lock-protected shard of the cache."""
+
+    __slots__ = ('lock', 'entries', 'expiry_heap', 'approx_bytes')
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries = OrderedDict()  # key -> (value, expires_at, size), LRU first
+        self.expiry_heap = []  # (expires_at, key); stale pairs are skipped
+        self.approx_bytes = 0
+
+    def remove(self, key):
+        """Delete ``key`` (which must be present) and return its entry."""
+        entry = self.entries.pop(key)
+        self.approx_bytes -= entry[2]
+        return entry
+
+    def purge_expired(self, now):
+        """Remove entries whose expiry has passed; return how many."""
+        removed = 0
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self.expiry_heap)
+            entry = self.entries.get(key)
+            # Only remove if the key was not rewritten with a later expiry
+            if entry is not None and entry[1] == expires_at:
+                self.remove(key)
+                removed += 1
+        return removed
+
+
+class TTLCache:
+    """
+    Mapping-like cache whose entries expire after a per-entry TTL.
+
+    Args:
+        max_entries (int): Upper bound on live entries; the least recently
+            used entry of a full stripe is evicted on insert
+        stripes (int): Number of lock stripes
+        sweep_interval (float): Seconds between background expiry sweeps
+    """
+
+    def __init__(self, max_entries=10000, stripes=16, sweep_interval=30):
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._stripes = [_Stripe() for _ in range(stripes)]
+        self._stripe_capacity = max(1, -(-max_entries // stripes))
+
+        self._counter_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+        self._sweeper = None
+        self._sweeper_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _stripe(self, key):
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def lock(self, key):
+        """
+        Return the lock guarding ``key``.
+
+        Holding it makes a read-modify-write on ``key`` atomic; the lock is
+        re-entrant so cache methods may be called while it is held.
+        """
+        return self._stripe(key).lock
+
+    def get(self, key, default=None):
+        """Return the live value for ``key`` or ``default``."""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[1] > time.monotonic():
+                stripe.entries.move_to_end(key)
+                self._count('_hits')
+                return entry[0]
+            if entry is not _MISSING:
+                stripe.remove(key)
+                self._count('_expirations')
+        self._count('_misses')
+        return default
+
+    def set(self, key, value, ttl):
+        """Store ``value`` under ``key`` for ``ttl`` seconds."""
+        self._ensure_sweeper()
+        expires_at = time.monotonic() + ttl
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        stripe = self._stripe(key)
+        evicted = 0
+        with stripe.lock:
+            if key in stripe.entries:
+                stripe.remove(key)
+            stripe.entries[key] = (value, expires_at, size)
+            stripe.approx_bytes += size
+            heapq.heappush(stripe.expiry_heap, (expires_at, key))
+            while len(stripe.entries) > self._stripe_capacity:
+                stripe.remove(next(iter(stripe.entries)))
+                evicted += 1
+            # Drop stale heap pairs left behind by overwrites and evictions
+            if len(stripe.expiry_heap) > 2 * len(stripe.entries) + 64:
+                stripe.expiry_heap = [(entry[1], k) for k, entry in stripe.entries.items()]
+                heapq.heapify(stripe.expiry_heap)
+        if evicted:
+            self._count('_evictions', evicted)
+
+    def pop(self, key, default=None):
+        """Remove ``key`` and return its live value, or ``default``."""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.remove(key) if key in stripe.entries else _MISSING
+        if entry is _MISSING or entry[1] <= time.monotonic():
+            return default
+        return entry[0]
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return sum(len(stripe.entries) for stripe in self._stripes)
+
+    def clear(self):
+        """Remove all entries."""
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.entries.clear()
+                stripe.expiry_heap = []
+                stripe.approx_bytes = 0
+
+    def sweep(self):
+        """
+        Remove every expired entry now.
+
+        Returns:
+            int: Number of entries removed
+        """
+        now = time.monotonic()
+        removed = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                removed += stripe.purge_expired(now)
+        if removed:
+            self._count('_expirations', removed)
+        return removed
+
+    def _ensure_sweeper(self):
+        if self._sweeper is not None or self.sweep_interval <= 0:
+            return
+        with self._sweeper_lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_loop,
+                                                 name='ttl-cache-sweeper', daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while not self._stopping.wait(self.sweep_interval):
+            self.sweep()
+
+    def stop(self):
+        """Stop the background sweeper."""
+        self._stopping.set()
+
+    def stats(self):
+        """
+        Return size, hit/miss and eviction counters.
+
+        ``approx_bytes`` is a shallow estimate of keys and values taken when
+        they were stored. Totals are read without the stripe locks, so under
+        concurrent writes they are a snapshot rather than an exact count.
+        """
+        with self._counter_lock:
+            return {
+                'entries': len(self),
+                'max_entries': self.max_entries,
+                'approx_bytes': sum(stripe.approx_bytes for stripe in self._stripes),
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations
+            }
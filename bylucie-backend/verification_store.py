@@ -0,0 +1,249 @@
+"""
+Storage for pending verification codes.
+
+Each backend exposes the same small interface, and checking a code
+(including the attempt increment) is a single atomic operation: a Lua script
+on Redis and a lock-protected update in memory. The async API uses
+awaitable counterparts of the Redis-backed stores.
+"""
+
+import json
+
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+_VERIFY_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return 'expired'
+end
+local data = cjson.decode(raw)
+if data['attempts'] >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return 'locked'
+end
+if tostring(data['code']) == ARGV[1] then
+    if tonumber(ARGV[3]) > 0 then
+        data['verified'] = true
+        redis.call('SETEX', KEYS[1], ARGV[3], cjson.encode(data))
+    else
+        redis.call('DEL', KEYS[1])
+    end
+    return 'verified'
+end
+data['attempts'] = data['attempts'] + 1
+redis.call('SETEX', KEYS[1], ARGV[4], cjson.encode(data))
+return 'invalid'
+"""
+
+
+class VerificationStore:
+    """
+    Interface for verification code storage.
+
+    Keys are opaque strings such as ``guest_verify:email:<address>``.
+    """
+
+    def start(self, key, code, ttl):
+        """Store a fresh code for ``key``, replacing any previous session."""
+        raise NotImplementedError
+
+    def verify(self, key, code, max_attempts, verified_ttl, retry_ttl):
+        """
+        Check ``code`` against the session stored under ``key``.
+
+        Args:
+            key (str): Session key
+            code (str): Code submitted by the user
+            max_attempts (int): Failed attempts allowed before lock-out
+            verified_ttl (int): Seconds to keep the session marked as
+                verified; 0 deletes it on success
+            retry_ttl (int): Seconds the session lives after a failed attempt
+
+        Returns:
+            str: VERIFIED, INVALID, EXPIRED or LOCKED
+        """
+        raise NotImplementedError
+
+    def is_verified(self, key):
+        """Return True if the session under ``key`` has been verified."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove the session under ``key``."""
+        raise NotImplementedError
+
+
+class RedisVerificationStore(VerificationStore):
+    """Verification sessions stored as JSON strings in Redis."""
+
+    def __init__(self, client):
+        self.client = client
+        self._verify = client.register_script(_VERIFY_SCRIPT)
+
+    def start(self, key, code, ttl):
+        self.client.setex(key, ttl, json.dumps({
+            "code": code,
+            "attempts": 0,
+            "verified": False
+        }))
+
+    def verify(self, key, code, max_attempts, verified_ttl, retry_ttl):
+        result = self._verify(keys=[key], args=[str(code), max_attempts, verified_ttl, retry_ttl])
+        return result.decode() if isinstance(result, bytes) else result
+
+    def is_verified(self, key):
+        raw = self.client.get(key)
+        return bool(raw) and bool(json.loads(raw).get("verified"))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+
+class MemoryVerificationStore(VerificationStore):
+    """
+    Verification sessions kept in a process-local TTL cache.
+
+    Args:
+        cache (TTLCache): Cache used for storage; its per-key lock makes
+            each verify atomic
+    """
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def start(self, key, code, ttl):
+        self._cache.set(key, {"code": code, "attempts": 0, "verified": False}, ttl)
+
+    def verify(self, key, code, max_attempts, verified_ttl, retry_ttl):
+        with self._cache.lock(key):
+            data = self._cache.get(key)
+            if data is None:
+                return EXPIRED
+            if data["attempts"] >= max_attempts:
+                self._cache.pop(key)
+                return LOCKED
+            if str(data["code"]) == str(code):
+                if verified_ttl > 0:
+                    self._cache.set(key, dict(data, verified=True), verified_ttl)
+                else:
+                    self._cache.pop(key)
+                return VERIFIED
+            self._cache.set(key, dict(data, attempts=data["attempts"] + 1), retry_ttl)
+            return INVALID
+
+    def is_verified(self, key):
+        data = self._cache.get(key)
+        return bool(data) and bool(data.get("verified"))
+
+    def delete(self, key):
+        self._cache.pop(key)
+
+
+class FailoverVerificationStore(VerificationStore):
+    """
+    Uses Redis through a ManagedRedis while it is healthy and falls back to
+    another store (normally memory) when Redis is unavailable.
+
+    Sessions started on one side are not visible on the other, so users
+    caught by a failover simply request a new code.
+    """
+
+    def __init__(self, managed_redis, fallback):
+        self._redis = managed_redis
+        self._fallback = fallback
+        self._primary = None
+
+    def _store(self, client):
+        if self._primary is None or self._primary.client is not client:
+            self._primary = RedisVerificationStore(client)
+        return self._primary
+
+    def _run(self, method, *args):
+        return self._redis.run(lambda client: getattr(self._store(client), method)(*args),
+                               lambda: getattr(self._fallback, method)(*args))
+
+    def start(self, key, code, ttl):
+        self._run('start', key, code, ttl)
+
+    def verify(self, key, code, max_attempts, verified_ttl, retry_ttl):
+        return self._run('verify', key, code, max_attempts, verified_ttl, retry_ttl)
+
+    def is_verified(self, key):
+        return self._run('is_verified', key)
+
+    def delete(self, key):
+        self._run('delete', key)
+
+
+class AsyncRedisVerificationStore:
+    """Awaitable RedisVerificationStore over a ``redis.asyncio`` client."""
+
+    def __init__(self, client):
+        self.client = client
+        self._verify = client.register_script(_VERIFY_SCRIPT)
+
+    async def start(self, key, code, ttl):
+        """Store a fresh code for ``key``, replacing any previous session."""
+        await self.client.setex(key, ttl, json.dumps({
+            "code": code,
+            "attempts": 0,
+            "verified": False
+        }))
+
+    async def verify(self, key, code, max_attempts, verified_ttl, retry_ttl):
+        """Check ``code`` against the session stored under ``key``."""
+        result = await self._verify(keys=[key],
+                                    args=[str(code), max_attempts, verified_ttl, retry_ttl])
+        return result.decode() if isinstance(result, bytes) else result
+
+    async def is_verified(self, key):
+        """Return True if the session under ``key`` has been verified."""
+        raw = await self.client.get(key)
+        return bool(raw) and bool(json.loads(raw).get("verified"))
+
+    async def delete(self, key):
+        """Remove the session under ``key``."""
+        await self.client.delete(key)
+
+
+class AsyncFailoverVerificationStore:
+    """
+    Awaitable FailoverVerificationStore: Redis through the ManagedRedis
+    asyncio client while it is healthy, otherwise a synchronous fallback
+    store (memory operations never block on I/O).
+    """
+
+    def __init__(self, managed_redis, fallback):
+        self._redis = managed_redis
+        self._fallback = fallback
+        self._primary = None
+
+    def _store(self, client):
+        if self._primary is None or self._primary.client is not client:
+            self._primary = AsyncRedisVerificationStore(client)
+        return self._primary
+
+    async def _run(self, method, *args):
+        return await self._redis.run_async(
+            lambda client: getattr(self._store(client), method)(*args),
+            lambda: getattr(self._fallback, method)(*args)
+        )
+
+    async def start(self, key, code, ttl):
+        """Store a fresh code for ``key``, replacing any previous session."""
+        await self._run('start', key, code, ttl)
+
+    async def verify(self, key, code, max_attempts, verified_ttl, retry_ttl):
+        """Check ``code`` against the session stored under ``key``."""
+        return await self._run('verify', key, code, max_attempts, verified_ttl, retry_ttl)
+
+    async def is_verified(self, key):
+        """Return True if the session under ``key`` has been verified."""
+        return await self._run('is_verified', key)
+
+    async def delete(self, key):
+        """Remove the session under ``key``."""
+        await self._run('delete', key)
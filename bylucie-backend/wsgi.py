@@ -0,0 +1,8 @@
+"""
+WSGI entry point for production servers.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import app  # noqa: F401  pylint: disable=unused-import